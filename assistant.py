@@ -1,8 +1,18 @@
+import asyncio
 import json
+import threading
 import time
-from openai import OpenAI
+from openai import AsyncOpenAI, BadRequestError, NotFoundError, OpenAI
 from openai.types.shared_params import Reasoning
-from openai.types.responses import Response, ResponseUsage, ResponseReasoningItem, ResponseFunctionToolCall
+from openai.types.responses import Response, ResponseUsage
+
+from compressor import ScreenCompressor
+from history import History, TruncateScreens, default_policies
+from journal import restore_item
+from memory_store import MemoryStore
+from request_executor import RequestExecutor, shared_async_http_client, shared_http_client
+from token_estimator import ContextTokenEstimator, estimate_text_tokens
+from tracing import traced, tracer
 
 tools = [
     {
@@ -38,77 +48,314 @@ tools = [
             },
             "required": ["key"]
         }
+    },
+    {
+        "type": "function",
+        "name": "lookup_memory",
+        "description": "Look up memories that are not shown this turn. Returns every memory whose key starts with the prefix.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "prefix": {
+                    "type": "string",
+                    "description": "The start of the keys to look up, such as \"tips_\". An empty prefix returns every memory."
+                }
+            },
+            "required": ["prefix"]
+        }
     }
 ]
 
 class AssistantPlayer:
-    def __init__(self, api_key: str, model_name: str, system_prompt: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model_name: str, system_prompt: str, base_url: str | None = None,
+                 chain_responses: bool = False, summary_path: str = "summary.txt",
+                 summary_prompt_path: str = "summary_prompt.txt", clear_summary: bool = True, history_policies=None,
+                 compress_screens: bool = True, router=None, executor: RequestExecutor | None = None):
+        # retries are left to the executor, which learns timeouts per model, hedges slow requests and keeps a budget
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=shared_http_client(), max_retries=0)
+        self.api_key = api_key
+        self.base_url = base_url
+        self._async_client = None  # for the async engine, see async_client
+        self.executor = executor or RequestExecutor()
         self.model = model_name
         self.system_prompt = system_prompt
-        self.history = []  # List of message dicts
-        # Add system prompt as the first message
-        self.history.append({"role": "system", "content": self.system_prompt})
-        self.memory = {}  # Dictionary to store memories
-        #delete the summary file if it exists, to start fresh
-        try:
-            with open("summary.txt", "w") as f:
-                f.write("")
-        except FileNotFoundError:
-            pass
+        # when chaining, each turn only sends what's new since the last response and points at it with previous_response_id
+        # the local history is then just a shadow copy, used for summaries and to recover if the chain breaks
+        self.chain_responses = chain_responses
+        self.last_response_id = None
+        self.pending_input = []  # input items not yet sent to the server, only used when chaining
+        self.cache_stats = CacheStats()
+        self.summary_stats = SummaryStats()
+        self.summary_job = None  # the background summary in progress, if any
+        self.token_estimator = ContextTokenEstimator(fixed_tokens=estimate_text_tokens(json.dumps(tools)))
+        self.projected_input_tokens = 0
+        # where summaries are written, so several sessions can run side by side
+        self.summary_path = summary_path
+        self.summary_prompt_path = summary_prompt_path
+        # old reasoning and memory tool calls are pruned from the history, see history.py
+        policies = default_policies() if history_policies is None else history_policies
+        self.history = History([{"role": "system", "content": self.system_prompt}], policies=policies)
+        # repeated screen text is replaced by references to where the model saw it, see compressor.py
+        # references can't point at screens old enough to be cut down by the pruning
+        max_age = min((policy.after_turns for policy in policies if isinstance(policy, TruncateScreens)), default=50)
+        self.compressor = ScreenCompressor(max_age=max_age) if compress_screens else None
+        self.memory = MemoryStore()
+        self.current_screen = ''  # the last screen, used to pick the memories shown with it
+        # picks the model and reasoning effort for each turn, see router.py; without one every turn uses model_name
+        self.router = router
+        self.tier = None  # the tier chosen for the turn in progress
+        self.request_start = 0.0
+        self.journal = None  # the crash-safe journal every change is written to, see attach_journal
+        self.replaying = False
+        #delete the summary file if it exists, to start fresh (not when resuming, it has the earlier summaries)
+        if clear_summary:
+            try:
+                with open(self.summary_path, "w") as f:
+                    f.write("")
+            except FileNotFoundError:
+                pass
 
+    @traced()
     def get_response(self, game_text: str) -> 'AssistantResponse':
         """
         Add the current turn, send the full message list to the Responses API, and return the assistant's reply as an AssistantResponse object.
         """
-        # Remove old memory messages from history
-        self.remove_old_memories_from_history(self.history)
-        #self.remove_old_reasoning_from_history(self.history)
-        self.history.append({"role": "system", "content": "Memory: " + json.dumps(self.memory)})  # Add the memory as the last message
-        if game_text:
-            self.history.append({"role": "user", "content": game_text})
-        response = self.client.responses.create(
-                model=self.model,
-                input=self.history,  # type: ignore
-                tools=tools,  # type: ignore
-                tool_choice="auto",
-                reasoning=Reasoning(effort="medium", summary="auto") if self.model.startswith("o") else None,
-                timeout=30,
-                store=True
-            )
+        self.add_turn_to_history(game_text)
+        self.route(game_text)
+        response = self.create_response()
         return self.handle_response(response)
-    
-    def remove_old_memories_from_history(self, history: list):
+
+    @traced()
+    async def get_response_async(self, game_text: str) -> 'AssistantResponse':
+        """
+        get_response on the async client, for the async engine (see async_engine.py).
+        """
+        self.add_turn_to_history(game_text)
+        self.route(game_text)
+        response = await self.create_response_async()
+        return self.handle_response(response)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # made on first use, from inside the event loop its connections will belong to
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                             http_client=shared_async_http_client(), max_retries=0)
+        return self._async_client
+
+    @traced()
+    def get_response_streaming(self, game_text: str, on_command=None, on_message=None, on_reasoning=None) -> 'AssistantResponse':
+        """
+        Same as get_response, but streams the reply. on_command is called with the command as soon as the
+        <command> block is complete and no memory tool call is still streaming, so the caller can start running it
+        while the rest of the reply arrives. on_message and on_reasoning get the text received so far.
+        """
+        self.add_turn_to_history(game_text)
+        self.route(game_text)
+        stream = self.create_response(stream=True)
+        text = ''
+        reasoning = ''
+        open_calls = set()
+        command_ready = False
+        dispatched = False
+        response = None
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                text += event.delta
+                if not command_ready and "</command>" in text:
+                    command_ready = True
+                if on_message:
+                    on_message(self.extract_command(text)[1])
+            elif event.type == "response.reasoning_summary_text.delta":
+                reasoning += event.delta
+                if on_reasoning:
+                    on_reasoning(reasoning)
+            elif event.type == "response.reasoning_summary_part.done":
+                reasoning += '\n'
+            elif event.type == "response.output_item.added" and event.item.type == "function_call":
+                open_calls.add(event.item.id)
+            elif event.type == "response.output_item.done" and event.item.type == "function_call":
+                open_calls.discard(event.item.id)
+            elif event.type == "response.completed":
+                response = event.response
+            elif event.type in ("response.failed", "response.incomplete", "error"):
+                raise RuntimeError(f"Streaming response ended with {event.type}")
+            if command_ready and not dispatched and not open_calls:
+                dispatched = True
+                command, _ = self.extract_command(text)
+                if on_command and command is not None:
+                    on_command(command)
+        if response is None:
+            raise RuntimeError("Stream ended without a completed response")
+        result = self.handle_response(response)
+        result.dispatched = dispatched and on_command is not None and result.command is not None
+        return result
+
+    def add_turn_to_history(self, game_text: str):
+        self.prune_history()
+        self.log("turn", screen=game_text)
+        self.history.start_turn()
+        self.memory.next_turn()
+        self.current_screen = game_text
+        screen = self.compress_screen(game_text)
+        if screen:
+            self.add_input({"role": "user", "content": screen})
+        if self.chain_responses:
+            # the server keeps every input of a chain, so the memory snapshot has to go into the delta
+            self.pending_input.append(self.memory_message())
+
+    def add_local_turn(self, game_text: str, command: str):
+        """
+        Record a turn answered without the model, so the model still sees the screen and what was sent.
         """
-        Remove old memory messages from the history, so only the latest memory is used.
-        This is necessary to avoid cluttering the history with multiple memory messages.
+        self.log("local_turn", screen=game_text, command=command)
+        self.history.start_turn()
+        screen = self.compress_screen(game_text)
+        if screen:
+            self.add_input({"role": "user", "content": screen})
+        self.add_input({"role": "assistant", "content": f"<command>{command}</command>"})
+
+    def route(self, game_text: str):
+        if self.router is not None:
+            self.tier = self.router.choose(game_text)
+
+    def compress_screen(self, game_text: str) -> str:
+        if self.compressor is None:
+            return game_text
+        with tracer.span("compress"):
+            return self.compressor.compress(game_text)
+
+    def forget_summarized_screens(self):
+        """
+        The screens so far are about to be summarized, so later screens must not refer back to them.
+        """
+        if self.compressor is not None:
+            self.log("forget", turn=self.compressor.turn + 1)
+            self.compressor.forget_before(self.compressor.turn + 1)
+
+    def prune_history(self):
+        """
+        Run the history pruning policies when a batch is due. Not while a summary is running, since the summary
+        replaces the history up to the length it had when it started.
+        """
+        if self.history.prune_due and self.summary_job is None and not self.replaying:
+            self.log("prune")
+            self.history.prune()
+
+    def memory_message(self) -> dict:
+        # only the memories relevant to the current screen, the model can look up the rest
+        return {"role": "system", "content": "Memory: " + self.memory.render(self.current_screen)}
+
+    def full_memory_message(self) -> dict:
+        return {"role": "system", "content": "Memory: " + json.dumps(self.memory.to_dict())}
+
+    def build_input(self) -> list:
+        """
+        Build the full request input. The history is append-only between pruning batches, so most requests start
+        with the previous one and the provider's prompt cache can be reused. The volatile parts (the current screen, which is the last history
+        item, and the memory snapshot) always sit at the end, and the memory is never stored in the history.
+        """
+        return self.history + [self.memory_message()]
+
+    def add_input(self, item: dict):
+        """
+        Add a new input item to the history, and to the pending delta when chaining responses.
         """
-        for message in history:
-            if isinstance(message, dict) and message.get("role") == "system" and message.get("content", "").startswith("Memory: "):
-                history.remove(message)
+        self.history.append(item)
+        if self.chain_responses:
+            self.pending_input.append(item)
 
-    def remove_old_reasoning_from_history(self, history: list):
+    def estimate_context_tokens(self) -> int:
         """
-        Remove old reasoning messages from the history, preserving only the reasoning from the last user message onward.
+        Locally estimated input tokens for the next request: the history (including the system prompt), memory and tools.
         """
-        user_message_found = False
-        for message in reversed(history):
-            if isinstance(message, dict) and message.get("role") == "user":
-                user_message_found = True
-            elif user_message_found and isinstance(message, ResponseReasoningItem):
-                # Remove reasoning messages that are before the last user message
-                history.remove(message)
-            elif user_message_found and isinstance(message, ResponseFunctionToolCall):
-                # Remove function call messages that are before the last user message
-                history.remove(message)
-            elif user_message_found and isinstance(message, dict) and message.get("type") == "function_call_output":
-                # Remove function call output messages that are before the last user message
-                history.remove(message)
+        return self.token_estimator.estimate(self.history, self.memory_message()["content"])
 
+    def over_token_budget(self, budget: int) -> bool:
+        return self.estimate_context_tokens() >= budget
+
+    def request_arguments(self) -> dict:
+        model, effort = (self.tier.model, self.tier.effort) if self.tier else (self.model, "medium")
+        arguments = dict(
+            model=model,
+            input=self.build_input(),
+            tools=tools,
+            tool_choice="auto",
+            reasoning=Reasoning(effort=effort, summary="auto") if effort and model.startswith("o") else None,
+            timeout=30,
+            store=True
+        )
+        if self.chain_responses and self.last_response_id:
+            arguments["input"] = self.pending_input
+            arguments["previous_response_id"] = self.last_response_id
+        return arguments
+
+    @traced()
+    def create_response(self, stream: bool = False):
+        """
+        Send the request. If a chained request is rejected (such as the previous response having expired),
+        the chain is restarted by sending the full local history.
+        """
+        self.projected_input_tokens = self.estimate_context_tokens()
+        self.request_start = time.monotonic()
+        arguments = self.request_arguments()
+        try:
+            return self.send_request(arguments, stream)
+        except (BadRequestError, NotFoundError) as e:
+            if "previous_response_id" not in arguments:
+                raise
+            print(f"Chained request failed, resending full history: {e}")
+            self.last_response_id = None
+            return self.send_request(self.request_arguments(), stream)
+
+    @traced()
+    async def create_response_async(self):
+        """
+        create_response on the async client, without streaming.
+        """
+        self.projected_input_tokens = self.estimate_context_tokens()
+        self.request_start = time.monotonic()
+        arguments = self.request_arguments()
+        try:
+            return await self.send_request_async(arguments)
+        except (BadRequestError, NotFoundError) as e:
+            if "previous_response_id" not in arguments:
+                raise
+            print(f"Chained request failed, resending full history: {e}")
+            self.last_response_id = None
+            return await self.send_request_async(self.request_arguments())
+
+    @staticmethod
+    def request_key(arguments: dict) -> str:
+        # timeouts and hedging are learned separately for every model and reasoning effort
+        reasoning = arguments.get("reasoning")
+        return f"{arguments['model']}:{reasoning['effort'] if reasoning else None}"
+
+    def send_request(self, arguments: dict, stream: bool = False):
+        return self.executor.call(
+            self.request_key(arguments),
+            lambda timeout: self.client.responses.create(**dict(arguments, timeout=timeout), stream=stream),
+            default_timeout=arguments["timeout"],
+            stream=stream
+        )
+
+    def send_request_async(self, arguments: dict):
+        return self.executor.call_async(
+            self.request_key(arguments),
+            lambda timeout: self.async_client.responses.create(**dict(arguments, timeout=timeout)),
+            default_timeout=arguments["timeout"]
+        )
+    
+    @traced()
     def handle_response(self, response: Response) -> 'AssistantResponse':
         """
         Handle the response from the LLM, extracting the command and message.
         """
+        # memory changes are journaled through the function calls in the response, replaying it repeats them
+        self.log("response", response=response)
+        # everything pending is now part of the server side conversation
+        self.last_response_id = response.id
+        self.pending_input = []
         # Process the response
         command = None
         final_message = ''
@@ -136,8 +383,19 @@ class AssistantPlayer:
                     "call_id": message.call_id,
                     "output": function_response_text
                 }
-                self.history.append(function_response)
-        return AssistantResponse(command, final_message, reasoning, response.usage)
+                self.add_input(function_response)
+        result = AssistantResponse(command, final_message, reasoning, response.usage)
+        result.projected_input_tokens = self.projected_input_tokens
+        if self.tier is not None and not self.replaying:
+            result.tier = self.tier.name
+            self.router.record(self.tier, time.monotonic() - self.request_start, response.usage)
+            self.router.observe_command(command)
+        self.cache_stats.record(result.input_tokens, result.cached_input_tokens)
+        tracer.add_tokens(result.input_tokens, result.output_tokens)
+        self.token_estimator.calibrate(result.input_tokens)
+        if self.journal is not None and self.journal.snapshot_due:
+            self.journal.snapshot(self.state())
+        return result
     
     def handle_function_call(self, function_name: str, arguments: dict) -> str:
         """
@@ -146,15 +404,21 @@ class AssistantPlayer:
         if function_name == "store_memory":
             key = arguments.get("key")
             value = arguments.get("value")
-            self.memory[key] = value
+            if not isinstance(key, str) or not key or not isinstance(value, str):
+                return f"Memory not stored, store_memory needs a key and a value as strings: {json.dumps(arguments)}"
+            self.memory.set(key, value)
             return f"Memory stored: {key} = {value}"
         elif function_name == "delete_memory":
             key = arguments.get("key")
-            if key in self.memory:
-                del self.memory[key]
+            if self.memory.delete(key):
                 return f"Memory deleted: {key}"
             else:
                 return f"Memory not found: {key}"
+        elif function_name == "lookup_memory":
+            found = self.memory.lookup(arguments.get("prefix", ""))
+            if not found:
+                return f"No memories found starting with: {arguments.get('prefix', '')}"
+            return json.dumps(found)
         else:
             return f"Unknown function call: {function_name}"
 
@@ -172,53 +436,314 @@ class AssistantPlayer:
                 return command, message.strip()
         return None, message.strip()  # Return empty command if not found
     
-    def perform_summary(self, game_text: str) -> None:
+    @traced()
+    def perform_summary(self, game_text: str) -> bool:
         """
         Call an agent to summarize the entire history of the game and produce a smaller, simplified version of the history.
-        This is useful for reducing the context size for future turns.
+        This is useful for reducing the context size for future turns. This blocks until the summary is done,
+        see start_background_summary to keep playing while it runs. Returns True if a summary was applied.
+        """
+        summary_input = self.build_summary_input(game_text)
+        upto = len(self.history)
+        self.forget_summarized_screens()
+        start = time.monotonic()
+        summary = self.request_summary(summary_input)
+        self.summary_stats.record(time.monotonic() - start, summary is not None)
+        if summary:
+            self.apply_summary(summary, upto)
+        return bool(summary)
+
+    @traced()
+    async def perform_summary_async(self, game_text: str) -> bool:
         """
+        perform_summary on the async client. Other games on the event loop keep playing while it waits.
+        """
+        summary_input = self.build_summary_input(game_text)
+        upto = len(self.history)
+        self.forget_summarized_screens()
+        start = time.monotonic()
+        summary = await self.request_summary_async(summary_input)
+        self.summary_stats.record(time.monotonic() - start, summary is not None)
+        if summary:
+            self.apply_summary(summary, upto)
+        return bool(summary)
+
+    def build_summary_input(self, game_text: str) -> list:
         summary_prompt = ''
-        with open("summary_prompt.txt", "r") as f:
+        with open(self.summary_prompt_path, "r") as f:
             summary_prompt = f.read().strip()
         
-        self.remove_old_memories_from_history(self.history)
-        #self.remove_old_reasoning_from_history(self.history)
         history_copy = self.history.copy()  # Make a copy of the history to avoid modifying it
         if game_text:
             history_copy.append({"role": "user", "content": game_text})
-        history_copy.append({"role": "system", "content": "Memory: " + json.dumps(self.memory)})  # Add the memory as the last message
+        history_copy.append(self.full_memory_message())  # Add the whole memory as the last message
         history_copy.append({"role": "user", "content": summary_prompt})
+        return history_copy
 
-        success = False
+    @traced()
+    def request_summary(self, summary_input: list, max_attempts: int = 6) -> str | None:
+        """
+        Ask the summary model for a summary, retrying with jittered backoff within the executor's budget.
+        Summaries are long and not on the turn's critical path, so they are never hedged.
+        Returns None if no summary could be produced.
+        """
         response = None
-        while not success:
-            try:
-                response = self.client.responses.create(
-                    model="o3",
-                    input=history_copy,  # type: ignore
-                    tools=[],  # type: ignore
-                    tool_choice="none",
-                    reasoning=Reasoning(effort="medium", summary=None),
-                    timeout=300,
-                    store=False
-                )
-                success = True
-            except Exception as e:
-                print(f"Error occurred: {e}")
-                time.sleep(1)  # Wait before retrying
+        try:
+            response = self.executor.call(
+                "o3:summary",
+                lambda timeout: self.client.responses.create(**self.summary_arguments(summary_input), timeout=timeout),
+                default_timeout=300, hedge=False, max_attempts=max_attempts
+            )
+        except Exception as e:
+            print(f"Error occurred: {e}")
+        return self.summary_text(response)
+
+    @traced()
+    async def request_summary_async(self, summary_input: list, max_attempts: int = 6) -> str | None:
+        """
+        request_summary on the async client.
+        """
+        response = None
+        try:
+            response = await self.executor.call_async(
+                "o3:summary",
+                lambda timeout: self.async_client.responses.create(**self.summary_arguments(summary_input),
+                                                                   timeout=timeout),
+                default_timeout=300, hedge=False, max_attempts=max_attempts
+            )
+        except Exception as e:
+            print(f"Error occurred: {e}")
+        return self.summary_text(response)
+
+    @staticmethod
+    def summary_arguments(summary_input: list) -> dict:
+        return dict(
+            model="o3",
+            input=summary_input,
+            tools=[],
+            tool_choice="none",
+            reasoning=Reasoning(effort="medium", summary=None),
+            store=False
+        )
+
+    @staticmethod
+    def summary_text(response) -> str | None:
         if not response or not response.output_text:
-            # no summary is available, so we just return and will keep our current history
+            # no summary is available, so we will keep our current history
             print("No summary available, keeping current history.")
+            return None
+        return response.output_text
+
+    def apply_summary(self, summary: str, upto: int):
+        """
+        Replace the first upto history items with the summary, keeping everything after them.
+        """
+        self.log("summary", summary=summary, upto=upto)
+        if not self.replaying:
+            # Replace unsupported characters
+            safe_summary = summary.encode("ascii", errors="replace").decode("ascii")
+            # dump out the summary to a file for debugging purposes, appending to the file
+            with open(self.summary_path, "a") as f:
+                f.write("\n--- Summary ---\n")
+                f.write(safe_summary)
+        # Start fresh with the summary, followed by any turns played since the summary started
+        self.history.replace_prefix(upto, [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": summary}])
+        # start a new chain from the summarized history
+        self.last_response_id = None
+        self.pending_input = []
+
+    def start_background_summary(self) -> bool:
+        """
+        Summarize a snapshot of the history on a worker thread while play continues.
+        Call poll_background_summary between turns to splice the result in. Returns False if one is already running.
+        """
+        if self.summary_job is not None:
+            return False
+        job = self.new_summary_job()
+        def worker():
+            job["summary"] = self.request_summary(job["input"])
+            job["latency"] = time.monotonic() - job["start"]
+        job["thread"] = threading.Thread(target=worker, daemon=True)
+        self.summary_job = job
+        job["thread"].start()
+        return True
+
+    def start_async_summary(self) -> bool:
+        """
+        start_background_summary as a task on the running event loop, for the async engine.
+        """
+        if self.summary_job is not None:
+            return False
+        job = self.new_summary_job()
+        async def worker():
+            job["summary"] = await self.request_summary_async(job["input"])
+            job["latency"] = time.monotonic() - job["start"]
+        job["task"] = asyncio.get_running_loop().create_task(worker())
+        self.summary_job = job
+        return True
+
+    def new_summary_job(self) -> dict:
+        job = {"input": self.build_summary_input(''), "upto": len(self.history), "start": time.monotonic()}
+        self.forget_summarized_screens()
+        return job
+
+    async def wait_for_summary_async(self) -> bool:
+        """
+        poll_background_summary(wait=True) for a summary started with start_async_summary.
+        """
+        job = self.summary_job
+        if job is not None and "task" in job:
+            await job["task"]
+        return self.poll_background_summary(wait=True)
+
+    async def cancel_summary_async(self):
+        """
+        Stop a summary started with start_async_summary without applying it, when the game is shut down.
+        """
+        job = self.summary_job
+        if job is None or "task" not in job:
             return
-        summary = response.output_text
-        # Replace unsupported characters
-        safe_summary = summary.encode("ascii", errors="replace").decode("ascii")
-        # dump out the summary to a file for debugging purposes, appending to the file
-        with open("summary.txt", "a") as f:
-            f.write("\n--- Summary ---\n")
-            f.write(safe_summary)
-        # Clear the history and start fresh with the summary
-        self.history = [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": summary}]
+        job["task"].cancel()
+        try:
+            await job["task"]
+        except asyncio.CancelledError:
+            pass
+        self.summary_job = None
+
+    @property
+    def summary_running(self) -> bool:
+        return self.summary_job is not None
+
+    def poll_background_summary(self, wait: bool = False) -> bool:
+        """
+        Splice in the background summary if it has finished. Only call this from the thread that plays the game,
+        so the history never changes under a running turn. Returns True if a summary was applied.
+        """
+        job = self.summary_job
+        if job is None:
+            return False
+        if "task" in job:
+            # started with start_async_summary, which is awaited rather than joined
+            if not job["task"].done():
+                return False
+        elif wait:
+            job["thread"].join()
+        elif job["thread"].is_alive():
+            return False
+        self.summary_job = None
+        self.summary_stats.record(job["latency"], job["summary"] is not None)
+        if not job["summary"]:
+            return False
+        self.apply_summary(job["summary"], job["upto"])
+        return True
+
+    def log(self, op: str, **fields):
+        if self.journal is not None:
+            self.journal.append(dict(op=op, **fields))
+
+    def attach_journal(self, journal):
+        """
+        Write every change from now on to the journal, starting with a snapshot of the current state.
+        """
+        self.journal = journal
+        journal.snapshot(self.state())
+
+    def state(self) -> dict:
+        """
+        Everything needed to pick the game back up, as JSON-ready data.
+        """
+        return {
+            "history": self.history,
+            "turn_starts": self.history.turn_starts,
+            # where each pruning policy got to, in policy order, so pruning carries on as if never stopped
+            "aged_upto": [self.history.aged_upto[id(policy)] for policy in self.history.policies],
+            "turns_since_prune": self.history.turns_since_prune,
+            "pending_input": self.pending_input,
+            "last_response_id": self.last_response_id,
+            "current_screen": self.current_screen,
+            "compressor": self.compressor.state() if self.compressor else None,
+            "memory_turn": self.memory.turn,
+            "memory": [{"key": entry.key, "value": entry.value, "touched": entry.touched}
+                       for entry in self.memory.entries.values()],
+        }
+
+    def load_state(self, state: dict):
+        self.history = History([restore_item(item) for item in state["history"]], state.get("turn_starts"),
+                               policies=self.history.policies, prune_every=self.history.prune_every)
+        aged_upto = state.get("aged_upto")
+        if aged_upto is not None and len(aged_upto) == len(self.history.policies):
+            self.history.aged_upto = {id(policy): turn for policy, turn in zip(self.history.policies, aged_upto)}
+        self.history.turns_since_prune = state.get("turns_since_prune", 0)
+        self.pending_input = [restore_item(item) for item in state["pending_input"]]
+        self.last_response_id = state["last_response_id"]
+        self.current_screen = state["current_screen"]
+        if self.compressor is not None and state.get("compressor"):
+            self.compressor.load_state(state["compressor"])
+        self.memory = MemoryStore()
+        for entry in state["memory"]:
+            self.memory.turn = entry["touched"]
+            self.memory.set(entry["key"], entry["value"])
+        self.memory.turn = state["memory_turn"]
+
+    def resume(self, journal) -> int:
+        """
+        Rebuild the state from the journal's snapshot and the records after it, then keep journaling to it.
+        Returns the number of records replayed.
+        """
+        snapshot, records = journal.read()
+        if snapshot:
+            self.load_state(snapshot["state"])
+        self.replaying = True
+        try:
+            for record in records:
+                op = record["op"]
+                if op == "turn":
+                    self.add_turn_to_history(record["screen"])
+                elif op == "local_turn":
+                    self.add_local_turn(record["screen"], record["command"])
+                elif op == "response":
+                    self.handle_response(Response.construct(**record["response"]))
+                elif op == "summary":
+                    self.apply_summary(record["summary"], record["upto"])
+                elif op == "prune":
+                    self.history.prune()
+                elif op == "forget":
+                    if self.compressor is not None:
+                        self.compressor.forget_before(record["turn"])
+        finally:
+            self.replaying = False
+        self.attach_journal(journal)
+        return len(records)
+
+class SummaryStats:
+    """
+    Summary latency, how many turns had to wait on a summary before they could be played, and how often a
+    summary left the context over budget or a due summary was held back after a failed or ineffective one.
+    """
+    def __init__(self):
+        self.summaries = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.stalled_turns = 0
+        self.ineffective = 0
+        self.deferred_turns = 0
+
+    def record(self, latency: float, success: bool):
+        self.summaries += 1
+        if not success:
+            self.failures += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.summaries if self.summaries else 0.0
+
+    def summary(self) -> str:
+        return (f"summaries: {self.summaries} ({self.failures} failed), mean latency: {self.mean_latency:.1f}s, "
+                f"max latency: {self.max_latency:.1f}s, stalled turns: {self.stalled_turns}, "
+                f"still over budget: {self.ineffective}, deferred turns: {self.deferred_turns}")
 
 class AssistantResponse:
     def __init__(self, command: str | None, message: str, reasoning: str, usage: ResponseUsage | None):
@@ -230,4 +755,42 @@ class AssistantResponse:
         self.output_tokens = usage.output_tokens if usage else 0
         self.input_tokens = usage.input_tokens if usage else 0
         self.cached_input_tokens = usage.input_tokens_details.cached_tokens if usage and usage.input_tokens_details else 0
+        # set when the command was already sent to the game while the response was streaming
+        self.dispatched = False
+        # the local estimate of input_tokens made before the request was sent
+        self.projected_input_tokens = 0
+        # the router tier that answered, if routing
+        self.tier = None
+
+    @property
+    def cache_hit_rate(self) -> float:
+        return self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
+
+class CacheStats:
+    """
+    Tracks how much of the input was served from the provider's prompt cache, per turn and overall.
+    """
+    def __init__(self):
+        self.turns = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.rate_sum = 0.0
+        self.last_rate = 0.0
+
+    def record(self, input_tokens: int, cached_input_tokens: int):
+        self.turns += 1
+        self.input_tokens += input_tokens
+        self.cached_input_tokens += cached_input_tokens
+        self.last_rate = cached_input_tokens / input_tokens if input_tokens else 0.0
+        self.rate_sum += self.last_rate
+
+    @property
+    def average_rate(self) -> float:
+        # mean of the per-turn rates
+        return self.rate_sum / self.turns if self.turns else 0.0
+
+    @property
+    def overall_rate(self) -> float:
+        # share of all input tokens that were cached
+        return self.cached_input_tokens / self.input_tokens if self.input_tokens else 0.0
 
@@ -0,0 +1,214 @@
+"""
+The game loop on asyncio. GameLoop blocks its thread on every model request and every wait for the game, so a turn
+is think, act, wait for the screen, update the window, one after the other. AsyncGameLoop plays the same turns with
+the async OpenAI client and an async game backend (see backends.py), and overlaps what doesn't depend on each other:
+- the command starts running in the game before the window is updated with the response,
+- background summaries are tasks on the loop, and journal writes go through the journal's writer thread,
+- several games can be played at once on one loop with play_games, sharing one connection pool.
+Cancelling play_async is the way to stop a game: see EngineThread for running it next to a window.
+"""
+import asyncio
+import threading
+import time
+
+from game_loop import GameLoop
+from request_executor import close_async_http_client
+from tracing import tracer
+
+
+class AsyncGameLoop(GameLoop):
+    """
+    GameLoop for an AsyncGameBackend, played with play_async. Takes the same options, except streaming.
+    Combats run on the game's blocking backend through run_sync, since each lick only waits for the game.
+    """
+    def __init__(self, player, game, ui, **kwargs):
+        super().__init__(player, game, ui, **kwargs)
+        if self.stream:
+            raise ValueError("The async engine doesn't stream responses, use GameLoop to stream")
+        self.combat.send = lambda command: self._game_call(self.game.backend.send_command, command)
+
+    async def _game_call_async(self, send, *args) -> str:
+        start = time.monotonic()
+        settle_before = self._settle_seconds()
+        with tracer.span("game." + send.__name__, args=args):
+            text = await send(*args)
+        settle = self._settle_seconds() - settle_before
+        self._add_time("settle", settle)
+        self._add_time("extract", max(0.0, time.monotonic() - start - settle))
+        return text
+
+    async def send_and_refresh_async(self, cmd):
+        self._ui_call(self.ui.set_last_command, cmd)
+        if cmd.strip() == '':
+            new_text = await self._game_call_async(self.game.send_enter)
+        else:
+            new_text = await self._game_call_async(self.game.send_command, cmd)
+        self.observe(new_text)
+        self.show_output(new_text)
+        self._ui_call(self.ui.reset_status)
+        return new_text
+
+    async def lick_loop_async(self):
+        self._ui_call(self.ui.set_status, "Licking until combat ends...")
+        try:
+            # the combat's timings and router events are applied here, the loop updates the turn meanwhile
+            (new_text, reason), turn, events = await self.game.run_sync(self.run_apart, self.combat.run)
+        except asyncio.CancelledError:
+            # the combat is on another thread, which can't be cancelled, so tell it to stop
+            self.combat.stop()
+            raise
+        self.apply_apart(turn, events)
+        if reason == "ended":
+            self._ui_call(self.ui.reset_status)
+        else:
+            self._ui_call(self.ui.set_status, f"Stopped licking after hitting the combat {reason}")
+        return new_text
+
+    async def run_command_async(self, command):
+        if command.lower() == 'lick_loop':
+            return await self.lick_loop_async()
+        return await self.send_and_refresh_async(command)
+
+    async def answer_locally_async(self, game_text):
+        rule = self.reflex.match(game_text) if self.reflex else None
+        if rule is None:
+            return None
+        seconds_saved, tokens_saved = self.model_call_cost()
+        with tracer.span("reflex", rule=rule):
+            self.player.add_local_turn(game_text, '')
+            new_text = await self.send_and_refresh_async('')
+        self.reflex.stats.record(rule, seconds_saved, tokens_saved)
+        self._ui_call(self.ui.set_reflex_stats, self.reflex.stats)
+        return new_text
+
+    async def finish_game_async(self, game_text):
+        self.report_stats(game_text)
+        if self.final_summary:
+            # Run a final summary, after any background summary has been applied
+            self.ui.set_status("Generating final summary...")
+            await self.player.wait_for_summary_async()
+            await self.player.perform_summary_async(game_text)
+        self.report_summaries()
+
+    async def play_async(self):
+        """
+        play, on the running event loop. When cancelled, a combat in progress stops after its current lick and a
+        background summary is cancelled; closing the game and the journal is left to the caller.
+        """
+        player = self.player
+        ui = self.ui
+        self.timings.start_time = time.monotonic()
+        try:
+            # get the initial game state
+            game_text = await self._game_call_async(self.game.get_current_screen)
+            self.observe(game_text)
+            self.show_output(game_text)
+
+            summarize_after = self.summarize_after
+            summary_counter = 0
+            turns = 0
+            while True:
+                if self.parser.over:
+                    await self.finish_game_async(game_text)
+                    break
+                if self.max_turns is not None and turns >= self.max_turns:
+                    break
+                turn_start = time.monotonic()
+                self.turn = {}
+                start = time.monotonic()
+                self.poll_summary()
+                if self.summary_due(summary_counter):
+                    if self.blocking_summary:
+                        ui.set_status("Summarizing game state...")
+                        player.summary_stats.stalled_turns += 1
+                        self.summary_finished(await player.perform_summary_async(game_text))
+                        summary_counter = 0
+                        continue
+                    if player.start_async_summary():
+                        summary_counter = 0
+                self._add_time("summary", time.monotonic() - start)
+                local_text = await self.answer_locally_async(game_text)
+                if local_text is not None:
+                    game_text = local_text
+                    summary_counter += 1
+                    turns += 1
+                    self.record_turn(turn_start)
+                    continue
+                self._ui_call(ui.set_status, "Player thinking...")
+                start = time.monotonic()
+                response = await player.get_response_async(game_text)
+                self._add_time("model", time.monotonic() - start)
+                self.model_turns += 1
+                self.model_seconds += time.monotonic() - start
+                self.output_tokens += response.output_tokens or 0
+                turns_until_summary = summarize_after - summary_counter - 1 if summarize_after else None
+                if response.command is not None:
+                    # send the command first and let it reach the game, then update the window while it plays
+                    screen = asyncio.ensure_future(self.run_command_async(response.command))
+                    await asyncio.sleep(0)
+                    self.update_turn_ui(response, turns_until_summary)
+                    game_text = await screen
+                    summary_counter += 1
+                else:
+                    self.update_turn_ui(response, turns_until_summary)
+                    ui.set_status("No command generated by LLM, waiting for next turn...")
+                    game_text = ''
+                turns += 1
+                self.record_turn(turn_start)
+        finally:
+            self.timings.end_time = time.monotonic()
+            await player.cancel_summary_async()
+
+
+async def play_games(loops: list[AsyncGameLoop]) -> list[BaseException | None]:
+    """
+    Play several games at once on the running event loop. One game failing doesn't stop the others; returns what
+    each game raised, or None. Cancelling it cancels every game.
+    """
+    results = await asyncio.gather(*(loop.play_async() for loop in loops), return_exceptions=True)
+    return [result if isinstance(result, BaseException) else None for result in results]
+
+
+class EngineThread(threading.Thread):
+    """
+    Runs main, a coroutine function, on an event loop of its own thread, so a window can keep the main thread.
+    The thread isn't a daemon: stop() cancels main from any thread, and the thread ends once main has cleaned up.
+    """
+    def __init__(self, main):
+        super().__init__(name="engine")
+        self.main = main
+        self.loop = None
+        self.task = None
+        self.started_loop = threading.Event()
+        self.stopping = False
+
+    def run(self):
+        try:
+            asyncio.run(self._run())
+        finally:
+            self.started_loop.set()
+
+    async def _run(self):
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.started_loop.set()
+        try:
+            await self.main()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await close_async_http_client()
+
+    def stop(self):
+        """
+        Cancel main, once. Returns right away, join the thread to wait for it to finish.
+        """
+        self.started_loop.wait()
+        if self.stopping or self.loop is None:
+            return
+        self.stopping = True
+        try:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+        except RuntimeError:
+            # the loop has already finished
+            pass
@@ -0,0 +1,119 @@
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# what the game prints when the light switch is flicked, the start of the new text on that screen
+LIGHTS_TEXT = "*Click* You flick the lights"
+
+
+class GameBackend(ABC):
+    """
+    Interface for anything that can run the game: a GUI terminal window, a winpty process or a native PTY.
+    Every method that sends input returns the new text shown by the game in response.
+    A backend missing one of the abstract methods fails when it is created, not partway through a game.
+    """
+    COMMAND_INPUT_PROMPT = "What do you do?:"
+
+    @abstractmethod
+    def get_current_screen(self) -> str:
+        ...
+
+    @abstractmethod
+    def send_command(self, command: str) -> str:
+        ...
+
+    @abstractmethod
+    def send_enter(self) -> str:
+        ...
+
+    def close(self):
+        pass
+
+
+class AsyncGameBackend(ABC):
+    """
+    GameBackend for the async engine (see async_engine.py): the same methods, as coroutines.
+    backend is a blocking GameBackend for the same game, and run_sync runs a function that uses it, such as a whole
+    combat, off the event loop.
+    """
+    backend: GameBackend
+
+    @abstractmethod
+    async def get_current_screen(self) -> str:
+        ...
+
+    @abstractmethod
+    async def send_command(self, command: str) -> str:
+        ...
+
+    @abstractmethod
+    async def send_enter(self) -> str:
+        ...
+
+    @abstractmethod
+    async def run_sync(self, function, *args):
+        ...
+
+    async def close(self):
+        pass
+
+
+class ThreadedBackend(AsyncGameBackend):
+    """
+    Runs a blocking GameBackend on a thread of its own, so backends that can only block (the window, winpty and
+    the simulator) can be played by the async engine. Every call goes through that one thread, in order.
+    Anything else, such as settle_stats, is read from the wrapped backend.
+    """
+    def __init__(self, backend: GameBackend):
+        self.backend = backend
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game")
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def run_sync(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+
+    async def get_current_screen(self) -> str:
+        return await self.run_sync(self.backend.get_current_screen)
+
+    async def send_command(self, command: str) -> str:
+        return await self.run_sync(self.backend.send_command, command)
+
+    async def send_enter(self) -> str:
+        return await self.run_sync(self.backend.send_enter)
+
+    async def close(self):
+        await self.run_sync(self.backend.close)
+        self.pool.shutdown()
+
+
+def create_backend(name: str, game_command: list[str] | None = None, cwd: str | None = None) -> GameBackend:
+    """
+    Create a game backend by name. Imports are done lazily, since each backend only works on some platforms.
+    cwd is the working directory to start the game in, for the pty and winpty backends.
+    """
+    if name == "window":
+        from terminal_wrapper import TootsieTerminalWrapper
+        return TootsieTerminalWrapper()
+    if name == "winpty":
+        from pty_backend import TootsieWrapper
+        return TootsieWrapper(cwd=cwd)
+    if name == "sim":
+        from simulator import SimulatedGame
+        return SimulatedGame()
+    if name == "pty":
+        from pty_backend import PtyGameBackend
+        return PtyGameBackend(game_command or ["./tootsie"], cwd=cwd)
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def create_async_backend(name: str, game_command: list[str] | None = None, cwd: str | None = None) -> AsyncGameBackend:
+    """
+    create_backend for the async engine. The pty backend waits for output on the event loop, the others are run
+    on a thread.
+    """
+    if name == "pty":
+        from pty_backend import AsyncPtyBackend
+        return AsyncPtyBackend(game_command or ["./tootsie"], cwd=cwd)
+    return ThreadedBackend(create_backend(name, game_command, cwd))
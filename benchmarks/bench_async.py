@@ -0,0 +1,131 @@
+"""
+Plays several simulated games against local mock endpoints, first one after another with GameLoop, then all at once
+on one event loop with the async engine, and reports wall time and turns/sec for each. Every game journals its
+state. Then plays them again on an EngineThread, stops it partway through like closing the window does, and checks
+that the shutdown was clean: how long it took, and that every journal resumes to the state its game was left in.
+Run with: python benchmarks/bench_async.py [--games 8] [--backend sim|pty] [--model-latency 0.1] [--stop-after 1.0]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assistant import AssistantPlayer
+from async_engine import AsyncGameLoop, EngineThread, play_games
+from backends import ThreadedBackend
+from game_loop import GameLoop, HeadlessUI
+from journal import Journal
+from mock_server import MockResponsesServer, command_responder
+from pty_backend import AsyncPtyBackend, PtyGameBackend
+from recorder import to_json
+from simulator import WALKTHROUGH, SimulatedGame
+
+
+def make_player(server, workdir: str, index: int) -> AssistantPlayer:
+    with open(os.path.join(ROOT, "system_prompt.txt"), "r") as f:
+        system_prompt = f.read().strip()
+    return AssistantPlayer("mock", "o4-mini", system_prompt, base_url=server.base_url,
+                           summary_path=os.path.join(workdir, f"summary_{index}.txt"),
+                           summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"))
+
+
+def make_game(args, index: int, asynchronous: bool = False):
+    if args.backend == "pty":
+        command = [sys.executable, "-u", os.path.join(ROOT, "simulator.py"), str(index)]
+        return (AsyncPtyBackend if asynchronous else PtyGameBackend)(command, quiet_period=0.2)
+    game = SimulatedGame(seed=index, latency=args.game_latency)
+    return ThreadedBackend(game) if asynchronous else game
+
+
+def run(name: str, args, workdir: str) -> dict:
+    commands = [command for command in WALKTHROUGH if command]
+    with contextlib.ExitStack() as stack:
+        # a server per game, so the scripted commands of different games don't mix
+        servers = [stack.enter_context(MockResponsesServer(command_responder(commands), latency=args.model_latency))
+                   for _ in range(args.games)]
+        loops = []
+        journals = []
+        for index, server in enumerate(servers):
+            player = make_player(server, workdir, index)
+            journal = Journal(os.path.join(workdir, f"{name}_{index}.jsonl"), background=name != "sequential")
+            player.attach_journal(journal)
+            journals.append(journal)
+            if name == "sequential":
+                loops.append(GameLoop(player, make_game(args, index), HeadlessUI(),
+                                      summarize_after=args.summarize_after))
+            else:
+                loops.append(AsyncGameLoop(player, make_game(args, index, asynchronous=True), HeadlessUI(),
+                                           summarize_after=args.summarize_after))
+
+        async def main():
+            try:
+                return await play_games(loops)
+            finally:
+                for loop, journal in zip(loops, journals):
+                    await loop.game.close()
+                    journal.close()
+
+        start = time.monotonic()
+        stopped = None
+        with contextlib.redirect_stdout(sys.stderr):
+            if name == "sequential":
+                for loop, journal in zip(loops, journals):
+                    loop.play()
+                    loop.game.close()
+                    journal.close()
+            elif name == "concurrent":
+                engine = EngineThread(main)
+                engine.start()
+                engine.join()
+            else:
+                engine = EngineThread(main)
+                engine.start()
+                time.sleep(args.stop_after)
+                stopped = time.monotonic()
+                engine.stop()
+                engine.join()
+                stopped = time.monotonic() - stopped
+        wall = time.monotonic() - start
+    turns = sum(len(loop.timings.turns) for loop in loops)
+    result = {
+        "config": name,
+        "games": len(loops),
+        "finished": sum(1 for loop in loops if loop.finished),
+        "turns": turns,
+        "wall_seconds": round(wall, 2),
+        "turns_per_second": round(turns / wall, 1),
+    }
+    if stopped is not None:
+        result["shutdown_seconds"] = round(stopped, 3)
+        result["journals_resumed"] = sum(resumes(loop.player, journal.path, workdir) for loop, journal in zip(loops, journals))
+    return result
+
+
+def resumes(player: AssistantPlayer, path: str, workdir: str) -> bool:
+    # a fresh player resumed from the journal must have the history the game was left with
+    with MockResponsesServer() as server:
+        resumed = make_player(server, workdir, 99)
+        journal = Journal(path)
+        resumed.resume(journal)
+        journal.close()
+    return json.dumps(to_json(resumed.state()), sort_keys=True) == json.dumps(to_json(player.state()), sort_keys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--backend", choices=["sim", "pty"], default="sim",
+                        help="the simulator in-process (run on a thread by the async engine), or in a PTY")
+    parser.add_argument("--model-latency", type=float, default=0.1)
+    parser.add_argument("--game-latency", type=float, default=0.02, help="delay per command of the in-process simulator")
+    parser.add_argument("--summarize-after", type=int, default=20)
+    parser.add_argument("--stop-after", type=float, default=1.0, help="seconds before stopping the engine")
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix="tootsie_async_")
+    print(json.dumps([run(name, args, workdir) for name in ("sequential", "concurrent", "stopped")], indent=2))
@@ -0,0 +1,68 @@
+"""
+Throughput and round-trip benchmark for the game backends, driven against benchmarks/echo_game.py.
+"legacy" reproduces the old read_all_available loop (1s select timeout, 1024 byte reads) on the same PTY.
+Run with: python benchmarks/bench_backends.py [--commands N] [--dump BYTES]
+"""
+import argparse
+import os
+import select
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pty_backend import PtyGameBackend, strip_ansi
+
+ECHO_GAME = [sys.executable, "-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "echo_game.py")]
+
+
+class LegacyPtyBackend(PtyGameBackend):
+    def send_text(self, text, label=None):
+        os.write(self.fd, text.encode())
+        chunks = []
+        while True:
+            rlist, _, _ = select.select([self.fd], [], [], 1)
+            if not rlist:
+                break
+            try:
+                data = os.read(self.fd, 1024)
+            except (BlockingIOError, OSError):
+                break
+            if not data:
+                break
+            chunks.append(data)
+            self.bytes_read += len(data)
+        return strip_ansi(b''.join(chunks).decode(errors="ignore"))
+
+
+def bench(backend, commands: int, dump: int) -> dict:
+    backend.get_current_screen()
+    latencies = []
+    for i in range(commands):
+        start = time.perf_counter()
+        backend.send_command(f"LOOK {i}")
+        latencies.append(time.perf_counter() - start)
+    start_bytes = backend.bytes_read
+    start = time.perf_counter()
+    backend.send_command(f"DUMP {dump}")
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "round_trip_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "round_trip_max_ms": latencies[-1] * 1000,
+        "dump_mb_per_sec": (backend.bytes_read - start_bytes) / elapsed / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--dump", type=int, default=4_000_000)
+    args = parser.parse_args()
+    for name, backend_class in (("pty", PtyGameBackend), ("legacy", LegacyPtyBackend)):
+        backend = backend_class(ECHO_GAME)
+        try:
+            result = bench(backend, args.commands, args.dump)
+        finally:
+            backend.close()
+        print(f"{name:<8} " + "  ".join(f"{key}: {value:.2f}" for key, value in result.items()))
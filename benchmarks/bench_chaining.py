@@ -0,0 +1,65 @@
+"""
+Request payload size per turn with and without previous_response_id chaining, against the local mock server.
+Also checks that chained requests only carry the delta: the memory snapshot, the new screen and tool outputs.
+Run with: python benchmarks/bench_chaining.py [--turns 30]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant import AssistantPlayer
+from mock_server import MockResponsesServer, function_call_item, message_item, reasoning_item
+
+SCREEN = "You are in the LIBRARY. Dusty books line the walls, and a LADDER leans against a shelf.\nWhat do you do?:"
+
+
+def responder(body):
+    turn = len(body.get("input", []))
+    return [
+        reasoning_item("Reading the room description carefully. " * 5),
+        function_call_item("store_memory", {"key": f"room_{turn}", "value": "LIBRARY"}),
+        message_item("Searching the library. <command>SEARCH</command>"),
+    ]
+
+
+def check_delta(body: dict):
+    # a chained request must not resend anything the server already has
+    for item in body["input"]:
+        assert item.get("type") == "function_call_output" or item.get("role") in ("system", "user"), item
+    roles = [item.get("role") or item.get("type") for item in body["input"]]
+    assert roles.count("system") == 1 and roles.count("user") == 1, roles
+    assert "function_call_output" in roles, roles
+
+
+def run(chain: bool, turns: int) -> tuple[list[int], float]:
+    with MockResponsesServer(responder) as server:
+        player = AssistantPlayer("mock", "o4-mini", "You are testing.", base_url=server.base_url, chain_responses=chain)
+        serialize_time = 0.0
+        for turn in range(turns):
+            player.add_turn_to_history(SCREEN)
+            # roughly what the client does to build the request body
+            start = time.perf_counter()
+            arguments = player.request_arguments()
+            json.dumps([item if isinstance(item, dict) else item.model_dump() for item in arguments["input"]])
+            serialize_time += time.perf_counter() - start
+            player.handle_response(player.create_response())
+        if chain:
+            for body in server.requests[1:]:
+                check_delta(body)
+        return list(server.request_sizes), serialize_time / turns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    args = parser.parse_args()
+    for chain in (False, True):
+        sizes, serialize = run(chain, args.turns)
+        name = "chained" if chain else "full history"
+        print(f"{name:<13} first: {sizes[0]} B, last: {sizes[-1]} B, total: {sum(sizes) / 1e3:.0f} kB, "
+              f"serialize per turn: {serialize * 1e6:.0f} us")
+    print("chained request deltas ok")
@@ -0,0 +1,52 @@
+"""
+Runs LICK_LOOP combats against the simulator in a real PTY and reports licks/sec and combat wall time,
+rendering every lick (as the old lick_loop did) versus the throttled rendering of CombatRunner.
+A slow UI is imitated with a fixed cost per screen update.
+Run with: python benchmarks/bench_combat.py [--combats 5] [--ui-cost 0.005]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from combat import CombatRunner, CombatStats
+from pty_backend import PtyGameBackend
+
+
+def run_combats(combats: int, ui_interval: float, ui_cost: float) -> CombatStats:
+    stats = CombatStats()
+    renders = 0
+    def render(text):
+        nonlocal renders
+        renders += 1
+        time.sleep(ui_cost)
+    for _ in range(combats):
+        game = PtyGameBackend([sys.executable, "-u", os.path.join(ROOT, "simulator.py")], quiet_period=0.2)
+        try:
+            game.get_current_screen()
+            game.send_enter()
+            game.send_enter()
+            # the BISHOP takes 20 licks without any items
+            game.send_command("MOVE BASEMENT")
+            runner = CombatRunner(game.send_command, on_output=render, ui_interval=ui_interval, stats=stats)
+            text, reason = runner.run()
+            if reason != "ended":
+                print(f"combat stopped early: {reason}")
+        finally:
+            game.close()
+    print(f"  renders: {renders}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--combats", type=int, default=5)
+    parser.add_argument("--ui-cost", type=float, default=0.005)
+    args = parser.parse_args()
+    for name, ui_interval in (("render every lick", 0.0), ("throttled rendering", 0.25)):
+        print(name)
+        stats = run_combats(args.combats, ui_interval, args.ui_cost)
+        print(f"  {stats.summary()}")
@@ -0,0 +1,54 @@
+"""
+Compresses the screens of a long simulated game the way the player does before adding them to the history, and
+reports the characters and estimated tokens saved and how long compressing takes, for a few safety thresholds.
+Run with: python benchmarks/bench_compress.py [--turns 400] [--max-age 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compressor import ScreenCompressor
+from simulator import ROOMS, TootsieSimulator
+
+COMMANDS = ["SEARCH", "MAP", "SUGAR", "HINT", "USE TOOL BELT", "LICK", ""] + [f"MOVE {room}" for room in ROOMS] + \
+           [f"GET {item}" for room in ROOMS.values() for item in room["items"]]
+
+
+def run(turns: int, seed: int, min_chars: int, max_age: int) -> dict:
+    rng = random.Random(seed)
+    sim = TootsieSimulator(seed)
+    compressor = ScreenCompressor(min_chars=min_chars, max_age=max_age)
+    seconds = 0.0
+    screen = sim.opening()
+    for turn in range(turns):
+        start = time.perf_counter()
+        compressor.compress(screen)
+        seconds += time.perf_counter() - start
+        screen = sim.step(rng.choice(COMMANDS))
+        if sim.over:
+            sim = TootsieSimulator(rng.randrange(1000))
+            screen = sim.opening()
+    stats = compressor.stats
+    return {
+        "min_chars": min_chars,
+        "references": stats.references,
+        "chars_saved": stats.chars_in - stats.chars_out,
+        "chars_ratio": stats.ratio,
+        "tokens_saved": stats.tokens_saved,
+        "tokens_saved_per_turn": stats.tokens_saved / turns,
+        "compress_microseconds_per_turn": seconds / turns * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-age", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps([run(args.turns, args.seed, min_chars, args.max_age) for min_chars in (30, 60, 120)], indent=2))
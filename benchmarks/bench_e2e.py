@@ -0,0 +1,116 @@
+"""
+End-to-end benchmark: runs the real GameLoop against the simulated game and the local mock Responses API,
+and prints machine-readable JSON with turns/sec, per-turn latency percentiles and a per-stage time breakdown.
+Run with: python benchmarks/bench_e2e.py [--games 5] [--backend sim|pty] [--model-latency 0.05] [--output results.json]
+Add --trace trace.json to also write a Chrome trace of every span in the run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assistant import AssistantPlayer
+from game_loop import GameLoop, HeadlessUI, TurnTimings
+from mock_server import MockResponsesServer, command_responder
+from pty_backend import PtyGameBackend
+from simulator import WALKTHROUGH, SimulatedGame
+from tracing import tracer
+
+
+def make_game(backend: str, game_latency: float):
+    if backend == "pty":
+        return PtyGameBackend([sys.executable, "-u", os.path.join(ROOT, "simulator.py")], quiet_period=0.2)
+    return SimulatedGame(latency=game_latency)
+
+
+def run(args) -> dict:
+    with open(os.path.join(ROOT, "system_prompt.txt"), "r") as f:
+        system_prompt = f.read().strip()
+    combined = TurnTimings()
+    # keep the summaries written by the player out of the repo
+    workdir = tempfile.mkdtemp(prefix="tootsie_bench_")
+    completed = 0
+    licks = 0
+    combat_seconds = 0.0
+    skipped = 0
+    tokens_saved = 0
+    screen_tokens_saved = 0
+    with MockResponsesServer(latency=args.model_latency, delta_delay=args.delta_delay) as server:
+        for game_index in range(args.games):
+            # with the reflex on, press enter screens never reach the model
+            commands = WALKTHROUGH if args.no_reflex else [command for command in WALKTHROUGH if command]
+            server.responder = command_responder(commands, memory_every=3)
+            player = AssistantPlayer("mock", "o4-mini", system_prompt, base_url=server.base_url, chain_responses=args.chain,
+                                     summary_path=os.path.join(workdir, "summary.txt"),
+                                     summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"),
+                                     compress_screens=not args.no_compress)
+            game = make_game(args.backend, args.game_latency)
+            loop = GameLoop(player, game, HeadlessUI(), stream=args.stream, summarize_after=args.summarize_after,
+                            max_turns=len(WALKTHROUGH) + 5, final_summary=False, reflex=not args.no_reflex)
+            try:
+                loop.play()
+            finally:
+                game.close()
+            completed += loop.finished
+            licks += loop.combat.stats.licks
+            combat_seconds += loop.combat.stats.total_seconds
+            if loop.reflex:
+                skipped += loop.reflex.stats.skipped
+                tokens_saved += loop.reflex.stats.tokens_saved
+            if player.compressor:
+                screen_tokens_saved += player.compressor.stats.tokens_saved
+            for turn in loop.timings.turns:
+                combined.record(turn)
+            combined.start_time = combined.start_time or loop.timings.start_time
+            combined.end_time = loop.timings.end_time
+    report = combined.report()
+    report.update({
+        "games": args.games,
+        "games_completed": completed,
+        "backend": args.backend,
+        "stream": args.stream,
+        "chain": args.chain,
+        "model_latency": args.model_latency,
+        "licks": licks,
+        "combat_seconds": combat_seconds,
+        "licks_per_second": licks / combat_seconds if combat_seconds else 0.0,
+        "model_calls_skipped": skipped,
+        "tokens_saved": tokens_saved,
+        "screen_tokens_saved": screen_tokens_saved,
+        "model_requests": len(server.requests),
+    })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--backend", choices=["sim", "pty"], default="sim")
+    parser.add_argument("--model-latency", type=float, default=0.05)
+    parser.add_argument("--delta-delay", type=float, default=0.0)
+    parser.add_argument("--game-latency", type=float, default=0.0)
+    parser.add_argument("--summarize-after", type=int, default=5)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--chain", action="store_true")
+    parser.add_argument("--no-reflex", action="store_true")
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--trace", default=None)
+    args = parser.parse_args()
+    if args.trace:
+        tracer.enable()
+    # progress and stats printed by the loop go to stderr, so stdout is only the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.trace:
+        tracer.export_chrome(args.trace)
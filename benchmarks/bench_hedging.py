@@ -0,0 +1,114 @@
+"""
+Sends requests to a local mock server whose latency is usually short but sometimes spikes, and that sometimes
+fails with a server error. Compares plain requests (a fixed timeout and the client's own retries) with the
+RequestExecutor (learned timeouts, hedging, jittered retries within a budget), on the blocking client and on the
+async client, where the slower of two hedged requests is cancelled. Reports latency percentiles.
+Run with: python benchmarks/bench_hedging.py [--requests 400] [--spike-rate 0.05] [--spike 1.0] [--error-rate 0.02]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import AsyncOpenAI, OpenAI
+
+from mock_server import MockResponsesServer, message_item
+from request_executor import RequestExecutor, close_async_http_client, shared_async_http_client, shared_http_client
+from tracing import percentile
+
+
+class SpikyServer(MockResponsesServer):
+    def __init__(self, base: float, spike: float, spike_rate: float, error_rate: float, seed: int):
+        super().__init__(lambda body: [message_item("<command>LOOK</command>")])
+        self.base = base
+        self.spike = spike
+        self.spike_rate = spike_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def get_latency(self, body: dict) -> float:
+        with self.random_lock:
+            jitter = self.random.uniform(0.5, 1.5)
+            spiked = self.random.random() < self.spike_rate
+        return self.spike if spiked else self.base * jitter
+
+    def get_error(self, body: dict) -> int | None:
+        with self.random_lock:
+            return 500 if self.random.random() < self.error_rate else None
+
+
+async def run_async(server, executor: RequestExecutor, requests: int) -> tuple[list[float], int]:
+    client = AsyncOpenAI(api_key="mock", base_url=server.base_url, http_client=shared_async_http_client(),
+                         max_retries=0)
+    latencies = []
+    failures = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            await executor.call_async(
+                "o4-mini:None", lambda timeout: client.responses.create(model="o4-mini", input="Look around.",
+                                                                        timeout=timeout), default_timeout=30)
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    await close_async_http_client()
+    return latencies, failures
+
+
+def run(name: str, args) -> dict:
+    with SpikyServer(args.base, args.spike, args.spike_rate, args.error_rate, args.seed) as server:
+        if name == "plain":
+            client = OpenAI(api_key="mock", base_url=server.base_url)
+            send = lambda: client.responses.create(model="o4-mini", input="Look around.", timeout=30)
+        elif name == "executor":
+            client = OpenAI(api_key="mock", base_url=server.base_url, http_client=shared_http_client(), max_retries=0)
+            executor = RequestExecutor()
+            send = lambda: executor.call(
+                "o4-mini:None", lambda timeout: client.responses.create(model="o4-mini", input="Look around.",
+                                                                        timeout=timeout), default_timeout=30)
+        if name == "async":
+            executor = RequestExecutor()
+            latencies, failures = asyncio.run(run_async(server, executor, args.requests))
+        else:
+            latencies = []
+            failures = 0
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                try:
+                    send()
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - start)
+        sent = len(server.requests)
+    result = {
+        "config": name,
+        "failures": failures,
+        "requests_sent": sent,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+    }
+    if name != "plain":
+        result["executor"] = executor.stats.summary()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--base", type=float, default=0.02)
+    parser.add_argument("--spike", type=float, default=1.0)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps([run(name, args) for name in ("plain", "executor", "async")], indent=2))
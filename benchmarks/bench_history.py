@@ -0,0 +1,105 @@
+"""
+Input tokens, cache hit rate and request latency per turn for each history pruning policy, over a long game
+without summaries against the local mock server. The mock's latency grows with the input size (prefill time),
+so smaller requests are also faster. Every policy plays the same scripted game: the model stores a memory every
+few turns and otherwise just answers, and each screen is the full terminal window, as a screen grab shows it.
+Run with: python benchmarks/bench_history.py [--turns 60] [--ms-per-1k-tokens 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assistant import AssistantPlayer
+from history import CollapseMemoryCalls, KeepRecentReasoning, TruncateScreens, default_policies
+from mock_server import MockResponsesServer, function_call_item, message_item, reasoning_item
+from simulator import WALKTHROUGH, TootsieSimulator
+
+POLICIES = {
+    "none": lambda: [],
+    "reasoning(3)": lambda: [KeepRecentReasoning(3)],
+    "memory calls(5)": lambda: [CollapseMemoryCalls(5)],
+    "screens(20)": lambda: [TruncateScreens(20)],
+    "default": default_policies,
+    "all": lambda: default_policies() + [TruncateScreens(20)],
+}
+
+
+class PrefillServer(MockResponsesServer):
+    def __init__(self, responder, seconds_per_token: float):
+        super().__init__(responder)
+        self.seconds_per_token = seconds_per_token
+
+    def get_latency(self, body: dict) -> float:
+        # request_sizes has the size of the request being answered
+        return self.request_sizes[-1] / 4 * self.seconds_per_token if self.request_sizes else 0.0
+
+
+# rows of the game's terminal window, each screen is the last ROWS lines of everything the game printed
+ROWS = 30
+MEMORY_EVERY = 4
+
+
+def responder(body):
+    if body.get("tool_choice") == "none":
+        return [message_item("Summary.")]
+    # pruning never drops a screen and a hedged request sees the same input, so every policy plays the same game
+    turn = sum(1 for item in body.get("input", []) if isinstance(item, dict) and item.get("role") == "user") - 1
+    command = WALKTHROUGH[turn % len(WALKTHROUGH)] or "MAP"
+    output = [reasoning_item("Looking at the screen and thinking about which command gets me closer to the BISHOP. " * 4)]
+    if turn % MEMORY_EVERY == 0:
+        # reasoning before a function call has to stay, so only these turns keep theirs
+        output.append(function_call_item("store_memory", {"key": f"notes_{turn % 20}",
+                                                          "value": f"Tried {command} on turn {turn}"}))
+    output.append(message_item(f"Trying {command}. <command>{command}</command>"))
+    return output
+
+
+def run(name: str, turns: int, seconds_per_token: float) -> dict:
+    with PrefillServer(responder, seconds_per_token) as server:
+        # the screen compressor would already cut the rows repeated from earlier screens, leave that to the policies
+        player = AssistantPlayer("mock", "o4-mini", "You are testing.", base_url=server.base_url,
+                                 summary_path=os.devnull, summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"),
+                                 history_policies=POLICIES[name](), compress_screens=False)
+        sim = TootsieSimulator()
+        printed = sim.opening().splitlines()
+        screen = "\n".join(printed[-ROWS:])
+        request_seconds = 0.0
+        input_tokens = 0
+        cached_tokens = 0
+        for turn in range(turns):
+            start = time.perf_counter()
+            response = player.get_response(screen)
+            request_seconds += time.perf_counter() - start
+            input_tokens += response.input_tokens
+            cached_tokens += response.cached_input_tokens
+            printed += sim.step(response.command or '').splitlines()
+            if sim.over:
+                sim = TootsieSimulator(turn)
+                printed += sim.opening().splitlines()
+            screen = "\n".join(printed[-ROWS:])
+    return {
+        "policy": name,
+        "input_tokens_per_turn": input_tokens / turns,
+        "cached": cached_tokens / input_tokens if input_tokens else 0.0,
+        "latency_ms": request_seconds / turns * 1000,
+        "history_items": len(player.history),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=5.0)
+    args = parser.parse_args()
+    print(f"{'policy':<16} {'input tokens/turn':>18} {'saved':>6} {'cached':>7} {'latency':>10} {'items':>6}")
+    baseline = None
+    for name in POLICIES:
+        result = run(name, args.turns, args.ms_per_1k_tokens / 1000 / 1000)
+        baseline = baseline or result["input_tokens_per_turn"]
+        saved = 1 - result["input_tokens_per_turn"] / baseline
+        print(f"{name:<16} {result['input_tokens_per_turn']:>18.0f} {saved:>6.0%} {result['cached']:>7.0%} "
+              f"{result['latency_ms']:>8.1f}ms {result['history_items']:>6}", flush=True)
@@ -0,0 +1,77 @@
+"""
+Plays turns against the local mock server with a journal, "crashes" without closing it, and resumes a new player
+from the journal. Checks the resumed state matches, including reasoning and function call items in the history,
+and reports the journaling cost per turn and how long resuming takes.
+Run with: python benchmarks/bench_journal.py [--turns 230] [--snapshot-every 100]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assistant import AssistantPlayer
+from journal import Journal
+from mock_server import MockResponsesServer, command_responder
+from recorder import to_json
+from simulator import WALKTHROUGH, TootsieSimulator
+
+
+def make_player(server, workdir: str, clear_summary: bool = True) -> AssistantPlayer:
+    return AssistantPlayer("mock", "o4-mini", "You are testing.", base_url=server.base_url,
+                           summary_path=os.path.join(workdir, "summary.txt"),
+                           summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"), clear_summary=clear_summary)
+
+
+def play(player: AssistantPlayer, turns: int) -> float:
+    # returns the seconds spent journaling
+    sim = TootsieSimulator()
+    screen = sim.opening()
+    journal_seconds = 0.0
+    append = player.journal.append
+    def timed_append(record):
+        nonlocal journal_seconds
+        start = time.perf_counter()
+        append(record)
+        journal_seconds += time.perf_counter() - start
+    player.journal.append = timed_append
+    for turn in range(turns):
+        if turn % 50 == 49:
+            player.perform_summary(screen)
+        response = player.get_response(screen)
+        screen = sim.step(response.command or '')
+        if sim.over:
+            sim = TootsieSimulator(turn)
+            screen = sim.opening()
+    return journal_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=230)
+    parser.add_argument("--snapshot-every", type=int, default=100)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix="tootsie_journal_")
+    path = os.path.join(workdir, "journal.jsonl")
+    with MockResponsesServer(command_responder(WALKTHROUGH * 50, memory_every=2)) as server:
+        player = make_player(server, workdir)
+        player.attach_journal(Journal(path, snapshot_every=args.snapshot_every))
+        journal_seconds = play(player, args.turns)
+        # crash: the journal is never closed, only what was flushed survives
+        expected = json.dumps(to_json(player.state()), sort_keys=True)
+        resumed = make_player(server, workdir, clear_summary=False)
+        start = time.perf_counter()
+        replayed = resumed.resume(Journal(path))
+        resume_seconds = time.perf_counter() - start
+    actual = json.dumps(to_json(resumed.state()), sort_keys=True)
+    assert actual == expected, "resumed state differs"
+    assert any(getattr(item, "type", None) == "reasoning" for item in resumed.history)
+    assert any(getattr(item, "type", None) == "function_call" for item in resumed.history)
+    print(f"turns: {args.turns}, history items: {len(resumed.history)}, memories: {len(resumed.memory)}")
+    print(f"journaling: {journal_seconds / args.turns * 1e6:.0f} us per turn")
+    print(f"resume: {resume_seconds * 1000:.1f} ms, replayed {replayed} records after the snapshot")
+    print("resumed state matches")
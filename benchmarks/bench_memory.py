@@ -0,0 +1,70 @@
+"""
+Compares the memory tokens sent each turn when dumping the whole memory against MemoryStore's selection,
+over a long simulated game where the memory keeps growing the way the model grows it: tips, rooms, items and goals.
+Run with: python benchmarks/bench_memory.py [--turns 400]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_store import MemoryStore
+from simulator import ROOMS, TootsieSimulator
+from token_estimator import estimate_text_tokens
+
+COMMANDS = ["SEARCH", "MAP", "SUGAR", "HINT", "USE TOOL BELT", "LICK"] + [f"MOVE {room}" for room in ROOMS] + \
+           [f"GET {item}" for room in ROOMS.values() for item in room["items"]] + \
+           [f"USE {thing}" for room in ROOMS.values() for thing in room["interactables"]]
+
+
+def run(turns: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    sim = TootsieSimulator(seed)
+    store = MemoryStore()
+    full_tokens = 0
+    selected_tokens = 0
+    select_seconds = 0.0
+    screen = sim.opening()
+    for turn in range(turns):
+        store.next_turn()
+        full_tokens += estimate_text_tokens(json.dumps(store.to_dict()))
+        start = time.perf_counter()
+        text = store.render(screen)
+        select_seconds += time.perf_counter() - start
+        selected_tokens += estimate_text_tokens(text)
+        # write memories the way the model does, a few per turn
+        store.set("current_room", sim.room)
+        store.set("goals_primary", f"Reach the center of the BISHOP in the BASEMENT, turn {turn}")
+        store.set("inventory_items", ", ".join(sim.inventory) or "empty")
+        room = sim.rooms[sim.room]
+        store.set(f"room_{sim.room.lower()}", room["description"] + " Interactables: " + ", ".join(room["interactables"]))
+        if turn % 3 == 0:
+            store.set(f"tips_{turn}", f"Tip number {turn}: remember that {rng.choice(COMMANDS)} might help with "
+                                      f"the {rng.choice(list(ROOMS))} puzzle.")
+        if turn % 7 == 0:
+            thing = rng.choice(ROOMS[sim.room]["interactables"])
+            store.set(f"puzzle_{thing.lower().replace(' ', '_')}_{turn}", f"The {thing} in the {sim.room} did nothing yet.")
+        screen = sim.step(rng.choice(COMMANDS))
+        if sim.over:
+            sim = TootsieSimulator(rng.randrange(1000))
+            screen = sim.opening()
+    return {
+        "turns": turns,
+        "entries": len(store),
+        "memory_tokens_full": full_tokens,
+        "memory_tokens_selected": selected_tokens,
+        "reduction": 1 - selected_tokens / full_tokens if full_tokens else 0.0,
+        "select_microseconds_per_turn": select_seconds / turns * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.turns, args.seed), indent=2))
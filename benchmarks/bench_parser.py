@@ -0,0 +1,130 @@
+"""
+Checks and times the screen parser on recorded transcripts. Simulated games are recorded to a session log (or pass
+--log to use logs recorded with run.py --record), and:
+- on simulated games, the parser's room, tool belt and end of game must match the simulator after every screen,
+- fuzzed screens (cut, spliced, with ANSI codes, stray bytes or repeated many times) must never make it raise,
+  and parsing them must stay linear in their size,
+- throughput is reported in MB/s and screens/sec.
+Run with: python benchmarks/bench_parser.py [--games 50] [--fuzz 20000] [--log session.jsonl ...]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import SessionRecorder, read_log
+from screen_parser import ScreenParser
+from simulator import ROOMS, WALKTHROUGH, TootsieSimulator
+
+COMMANDS = ["SEARCH", "MAP", "SUGAR", "USE TOOL BELT", "LICK", "LICK", "LICK", "", "USE LIGHT SWITCH", "QUIT"] + \
+           [f"MOVE {room}" for room in ROOMS] + [f"GET {item}" for room in ROOMS.values() for item in room["items"]]
+
+
+def record_games(path: str, games: int, seed: int) -> int:
+    # plays simulated games, checking the parser against the simulator as it goes; returns the screens checked
+    rng = random.Random(seed)
+    recorder = SessionRecorder(path)
+    checked = 0
+    for game in range(games):
+        sim = TootsieSimulator(game)
+        parser = ScreenParser()
+        screen = sim.opening()
+        recorder.record_screen(screen)
+        # the walkthrough first half the time, so games also end by beating the BISHOP, not only by QUIT
+        commands = iter(WALKTHROUGH if game % 2 else [])
+        for step in range(300):
+            list(parser.parse(screen))
+            if parser.room is not None:
+                assert parser.room == sim.room, (game, step, parser.room, sim.room)
+                assert set(parser.tool_belt) == set(sim.inventory), (game, step, parser.tool_belt, sim.inventory)
+            assert parser.over == sim.over, (game, step, screen)
+            checked += 1
+            if sim.over:
+                break
+            command = next(commands, None)
+            if command == "LICK_LOOP":
+                command = "LICK"
+                commands = iter(["LICK"] * 30 + list(commands))
+            if command is None:
+                command = rng.choice(COMMANDS)
+            recorder.record_command(command)
+            screen = sim.step(command)
+            recorder.record_screen(screen)
+    recorder.close()
+    return checked
+
+
+def mutate(rng: random.Random, screens: list[str]) -> str:
+    screen = rng.choice(screens)
+    kind = rng.randrange(6)
+    if kind == 0:
+        cut = rng.randrange(len(screen) + 1)
+        return screen[:cut] if rng.random() < 0.5 else screen[cut:]
+    if kind == 1:
+        other = rng.choice(screens)
+        return screen[:rng.randrange(len(screen) + 1)] + other[rng.randrange(len(other) + 1):]
+    if kind == 2:
+        return "".join(f"\x1b[{rng.randrange(40)}m" + ch if rng.random() < 0.1 else ch for ch in screen)
+    if kind == 3:
+        return "".join(chr(rng.randrange(1, 0x2fff)) if rng.random() < 0.05 else ch for ch in screen)
+    if kind == 4:
+        return screen.replace(" ", "\n" if rng.random() < 0.5 else "  ")
+    return screen * rng.randrange(50, 200)
+
+
+def fuzz(screens: list[str], runs: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    parser = ScreenParser()
+    events = 0
+    worst = 0.0  # the slowest parse, in microseconds per character
+    for run in range(runs):
+        text = mutate(rng, screens)
+        start = time.perf_counter()
+        events += sum(1 for _ in parser.parse(text))
+        seconds = time.perf_counter() - start
+        if len(text) >= 1000:
+            worst = max(worst, seconds / len(text) * 1e6)
+    return {"runs": runs, "events": events, "worst_us_per_char": worst}
+
+
+def throughput(screens: list[str], repeat: int) -> dict:
+    chars = sum(len(screen) for screen in screens) * repeat
+    events = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser = ScreenParser()
+        for screen in screens:
+            for _ in parser.parse(screen):
+                events += 1
+    seconds = time.perf_counter() - start
+    return {
+        "screens_per_second": len(screens) * repeat / seconds,
+        "mb_per_second": chars / seconds / 1e6,
+        "events_per_screen": events / (len(screens) * repeat),
+    }
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--games", type=int, default=50)
+    argparser.add_argument("--fuzz", type=int, default=20000)
+    argparser.add_argument("--repeat", type=int, default=20)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--log", nargs="*", default=[], help="session logs recorded with run.py --record")
+    args = argparser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix="tootsie_parser_"), "session.jsonl")
+    checked = record_games(path, args.games, args.seed)
+    print(f"simulated games: {args.games}, screens matching the simulator: {checked}")
+    for log in [path] + args.log:
+        screens = [record["text"] for record in read_log(log) if record["type"] == "screen" and record["text"]]
+        result = fuzz(screens, args.fuzz, args.seed)
+        print(f"{os.path.basename(log)}: {len(screens)} screens")
+        print(f"  fuzz: {result['runs']} mutated screens, {result['events']} events, no errors, "
+              f"slowest {result['worst_us_per_char']:.3f} us/char")
+        result = throughput(screens, args.repeat)
+        print(f"  throughput: {result['mb_per_second']:.1f} MB/s, {result['screens_per_second']:.0f} screens/sec, "
+              f"{result['events_per_screen']:.2f} events/screen")
@@ -0,0 +1,80 @@
+"""
+Plays the simulated game against a mock endpoint whose tiers answer at different speeds and differ in skill: the fast
+tier can't get past the LADDER, the standard tier can't work out the BOOKSHELF, and only the strong tier plays every
+step. Compares each fixed tier with the router, reporting whether the game was finished, turns, model time and
+turns per tier.
+Run with: python benchmarks/bench_router.py [--latencies 0.02,0.08,0.3] [--max-turns 80]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from assistant import AssistantPlayer
+from game_loop import GameLoop, HeadlessUI
+from mock_server import MockResponsesServer, message_item, reasoning_item
+from router import DEFAULT_TIERS, ModelRouter
+from simulator import WALKTHROUGH, SimulatedGame
+
+# the tier level each step needs, and what a weaker tier sends instead
+PUZZLES = {"GET LADDER": (1, "SEARCH"), "USE BOOKSHELF": (2, "USE PIANO")}
+
+
+def tier_responder(tiers):
+    levels = {f"{tier.model}:{tier.effort}": level for level, tier in enumerate(tiers)}
+    commands = [command for command in WALKTHROUGH if command]
+    state = {"step": 0}
+
+    def respond(body: dict) -> list[dict]:
+        if body.get("tool_choice") == "none":
+            return [message_item("Summary.")]
+        level = levels.get(f"{body.get('model')}:{(body.get('reasoning') or {}).get('effort')}", 0)
+        command = commands[min(state["step"], len(commands) - 1)]
+        needed, fallback = PUZZLES.get(command, (0, None))
+        if level < needed:
+            command = fallback
+        else:
+            state["step"] += 1
+        return [reasoning_item(f"Level {level} thinks about {command}."), message_item(f"<command>{command}</command>")]
+    return respond
+
+
+def run(name: str, tiers, latencies, max_turns: int, workdir: str) -> dict:
+    model_latencies = {f"{tier.model}:{tier.effort}": latency for tier, latency in zip(tiers, latencies)}
+    fixed = None if name == "router" else next(tier for tier in tiers if tier.name == name)
+    with MockResponsesServer(tier_responder(tiers), model_latencies=model_latencies) as server:
+        player = AssistantPlayer("mock", "o4-mini", "You are testing.", base_url=server.base_url,
+                                 summary_path=os.path.join(workdir, "summary.txt"),
+                                 summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"),
+                                 router=ModelRouter(tiers) if fixed is None else ModelRouter([fixed]))
+        loop = GameLoop(player, SimulatedGame(), HeadlessUI(), max_turns=max_turns, final_summary=False)
+        with contextlib.redirect_stdout(sys.stderr):
+            loop.play()
+    stats = player.router.stats
+    return {
+        "config": name,
+        "finished": loop.finished,
+        "model_turns": loop.model_turns,
+        "model_seconds": round(loop.model_seconds, 2),
+        "tier_turns": {tier: tier_stats.turns for tier, tier_stats in stats.tiers.items()},
+        "escalations": stats.escalations,
+        "reasons": stats.reasons,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latencies", default="0.02,0.08,0.3",
+                        help="seconds per request for the fast, standard and strong tiers")
+    parser.add_argument("--max-turns", type=int, default=80)
+    args = parser.parse_args()
+    latencies = [float(latency) for latency in args.latencies.split(",")]
+    workdir = tempfile.mkdtemp(prefix="tootsie_router_")
+    results = [run(name, DEFAULT_TIERS, latencies, args.max_turns, workdir)
+               for name in [tier.name for tier in DEFAULT_TIERS] + ["router"]]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,60 @@
+"""
+Compare the old fixed 1 second polling against ScreenSettler on scripted screens, using a virtual clock.
+Run with: python benchmarks/bench_settle.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settle import ScreenSettler, ScriptedScreenSource
+
+PROMPT = "What do you do?:"
+BEFORE = "You are in the KITCHEN.\n" + PROMPT
+
+# name -> frames after the command is sent, as (seconds, text)
+SCENARIOS = {
+    "fast prompt": [(0.02, BEFORE + " MAP\nKITCHEN - HALL - LIBRARY\n" + PROMPT)],
+    "streamed output": [
+        (0.05, BEFORE + " SEARCH\nYou look around"),
+        (0.30, BEFORE + " SEARCH\nYou look around\nThere is a FRIDGE."),
+        (0.60, BEFORE + " SEARCH\nYou look around\nThere is a FRIDGE.\n" + PROMPT),
+    ],
+    "press enter screen": [(0.05, BEFORE + " HELP\nPress enter to continue...")],
+    "slow game": [(2.5, BEFORE + " MOVE HALL\nYou walk into the HALL.\n" + PROMPT)],
+    "no output": [],
+    "read screen": None,  # reading the screen without sending anything, it already shows the prompt
+}
+
+
+def legacy_settle(source: ScriptedScreenSource, timeout: float = 120) -> str:
+    # the original get_current_screen loop: sleep 1s, return once two grabs match
+    start = source.clock()
+    prev_text = source.grab()
+    current_text = prev_text
+    while source.clock() - start < timeout:
+        source.sleep(1)
+        current_text = source.grab().rstrip()
+        if current_text != prev_text:
+            prev_text = current_text
+        else:
+            return current_text
+    return current_text
+
+
+def run_scenario(frames, use_settler: bool) -> tuple[float, int, str]:
+    source = ScriptedScreenSource([(0.0, BEFORE)] + (frames or []))
+    if use_settler:
+        settler = ScreenSettler(source.grab, markers=(PROMPT, "Bye!"), clock=source.clock, sleep=source.sleep)
+        text = settler.settle(BEFORE if frames is not None else None)
+    else:
+        text = legacy_settle(source)
+    return source.now, source.grabs, text
+
+
+if __name__ == "__main__":
+    print(f"{'scenario':<20} {'legacy s':>9} {'settler s':>10} {'grabs':>6}  same output")
+    for name, frames in SCENARIOS.items():
+        legacy_time, _, legacy_text = run_scenario(frames, use_settler=False)
+        settle_time, grabs, settle_text = run_scenario(frames, use_settler=True)
+        print(f"{name:<20} {legacy_time:>9.2f} {settle_time:>10.2f} {grabs:>6}  {legacy_text == settle_text}")
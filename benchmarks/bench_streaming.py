@@ -0,0 +1,45 @@
+"""
+Time-to-action with and without streaming, against the local mock Responses server.
+The mock reply has the command early and a long viewer message after it, like the real model tends to write.
+Run with: python benchmarks/bench_streaming.py [--turns 10] [--delta-delay 0.005]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant import AssistantPlayer
+from mock_server import MockResponsesServer, function_call_item, message_item, reasoning_item
+
+VIEWER_TEXT = "The kitchen looks promising, so I'm checking the map before moving on. " * 4
+
+
+def responder(body):
+    return [
+        reasoning_item("The map will show which rooms are left."),
+        function_call_item("store_memory", {"key": "room_current", "value": "KITCHEN"}),
+        message_item("<command>MAP</command> " + VIEWER_TEXT),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--delta-delay", type=float, default=0.005)
+    args = parser.parse_args()
+    with MockResponsesServer(responder, delta_delay=args.delta_delay) as server:
+        player = AssistantPlayer("mock", "o4-mini", "You are testing.", base_url=server.base_url)
+        player.get_response("warm up")
+        blocking, streamed = [], []
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            player.get_response(f"turn {turn}")
+            blocking.append(time.perf_counter() - start)
+            dispatch_time = {}
+            start = time.perf_counter()
+            player.get_response_streaming(f"turn {turn}", on_command=lambda command: dispatch_time.setdefault("t", time.perf_counter() - start))
+            streamed.append(dispatch_time["t"])
+    print(f"blocking time-to-action: {sum(blocking) / len(blocking) * 1000:.1f} ms")
+    print(f"streamed time-to-action: {sum(streamed) / len(streamed) * 1000:.1f} ms")
@@ -0,0 +1,75 @@
+"""
+Per-turn cost of extracting new output from a large scrollback: the old whole-buffer approach
+(strip_ansi over everything, then get_new_text) against the streaming TerminalModel.
+Run with: python benchmarks/bench_terminal_model.py [--scrollback-mb 2] [--turns 200]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from terminal_model import TerminalModel
+
+
+def legacy_strip_ansi(text):
+    ansi_escape = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1b\][^\x07]*\x07')
+    no_ansi = ansi_escape.sub('', text)
+    lines = no_ansi.splitlines()
+    filtered = [line for line in lines if line.strip() != '']
+    return '\n'.join(filtered)
+
+
+def legacy_get_new_text(previous_text, current_text):
+    if not previous_text:
+        return current_text
+    if current_text.startswith(previous_text):
+        return current_text[len(previous_text):].lstrip("\n")
+    idx = current_text.find(previous_text)
+    if idx != -1:
+        return current_text[idx + len(previous_text):].lstrip("\n")
+    return current_text
+
+
+def turn_output(turn: int) -> str:
+    return (f"\x1b[1;33mTurn {turn}\x1b[0m You lick the pop.\r\n"
+            f"\x1b[32mThe candy coating cracks a little more.\x1b[0m\r\n\r\nWhat do you do?: ")
+
+
+def run_legacy(history: str, turns: int) -> float:
+    raw = history
+    previous = legacy_strip_ansi(raw)
+    start = time.perf_counter()
+    for turn in range(turns):
+        raw += turn_output(turn)
+        current = legacy_strip_ansi(raw)
+        legacy_get_new_text(previous, current)
+        previous = current
+    return (time.perf_counter() - start) / turns
+
+
+def run_model(history: str, turns: int) -> float:
+    model = TerminalModel(max_chars=len(history))
+    model.feed(history)
+    model.consume()
+    start = time.perf_counter()
+    for turn in range(turns):
+        model.feed(turn_output(turn).encode())
+        model.consume()
+    return (time.perf_counter() - start) / turns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scrollback-mb", type=float, default=2)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    line = "\x1b[36mYou are in the LIBRARY. Dusty books line the walls.\x1b[0m\r\n"
+    history = line * int(args.scrollback_mb * 1_000_000 / len(line))
+    legacy = run_legacy(history, args.turns)
+    model = run_model(history, args.turns)
+    print(f"scrollback: {len(history) / 1e6:.1f} MB, turns: {args.turns}")
+    print(f"legacy per turn: {legacy * 1e3:.3f} ms")
+    print(f"model per turn:  {model * 1e3:.3f} ms ({legacy / model:.0f}x faster)")
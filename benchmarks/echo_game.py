@@ -0,0 +1,29 @@
+"""
+A tiny stand-in for the game: prints the prompt, answers each command, and can dump a large block of text.
+Commands: DUMP <bytes>, QUIT, anything else is echoed back.
+"""
+import sys
+
+PROMPT = "What do you do?:"
+
+def main():
+    out = sys.stdout
+    out.write("Welcome to the echo game.\n" + PROMPT + " ")
+    out.flush()
+    for line in sys.stdin:
+        command = line.strip()
+        if command.upper() == "QUIT":
+            out.write("Bye!\n")
+            out.flush()
+            break
+        if command.upper().startswith("DUMP"):
+            size = int(command.split()[1])
+            row = "\x1b[32mThe candy coating glistens in the light.\x1b[0m\n"
+            out.write(row * (size // len(row) + 1))
+        else:
+            out.write(f"You said {command}.\n")
+        out.write(PROMPT + " ")
+        out.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import time
+
+from screen_parser import CombatEnded, GameOver, ScreenParser
+from tracing import tracer
+
+
+class CombatStats:
+    """
+    Keeps totals over every combat so long runs can report licks/sec and how long combat takes.
+    """
+    def __init__(self):
+        self.combats = 0
+        self.licks = 0
+        self.total_seconds = 0.0
+        self.reasons = {}
+
+    def record(self, licks: int, seconds: float, reason: str):
+        self.combats += 1
+        self.licks += licks
+        self.total_seconds += seconds
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    @property
+    def licks_per_second(self) -> float:
+        return self.licks / self.total_seconds if self.total_seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"combats: {self.combats}, licks: {self.licks}, combat time: {self.total_seconds:.1f}s, "
+                f"licks/sec: {self.licks_per_second:.1f}, reasons: {self.reasons}")
+
+
+class CombatRunner:
+    """
+    Licks until the combat ends. Every lick is sent as soon as the previous one returned the prompt, and only
+    the new text of each lick is checked for the end of the combat, never the whole transcript.
+    The screen is refreshed at most every ui_interval seconds, plus once at the end.
+    Stops early after max_licks licks or timeout seconds, so a misdetected combat can't lick forever.
+    The combat ends when the parser sees it end (the pop is defeated, the sugar level blocks licking, there is
+    nothing to lick, or failing those the text names the center or sugar) or the game end; pass the game loop's
+    parser so its state follows the licks too.
+    stop() ends it after the lick in progress, from any thread.
+    """
+    def __init__(self, send, on_output=None, command: str = "LICK", max_licks: int = 200, timeout: float = 300,
+                 ui_interval: float = 0.25, stats: CombatStats | None = None, clock=time.monotonic,
+                 parser: ScreenParser | None = None, on_events=None):
+        self.send = send  # sends a command to the game and returns the new text
+        self.on_output = on_output
+        self.command = command
+        self.max_licks = max_licks
+        self.timeout = timeout
+        self.ui_interval = ui_interval
+        self.stats = stats or CombatStats()
+        self.clock = clock
+        self.parser = parser or ScreenParser()
+        self.on_events = on_events  # called with the events of each lick
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self) -> tuple[str, str]:
+        """
+        Returns the text of the last lick and why the combat stopped: "ended", "cap", "timeout" or "stopped".
+        """
+        self.stopped = False
+        start_time = self.clock()
+        last_render = start_time
+        new_text = ''
+        licks = 0
+        reason = "cap"
+        with tracer.span("combat") as span:
+            while licks < self.max_licks:
+                if self.clock() - start_time >= self.timeout:
+                    reason = "timeout"
+                    break
+                if self.stopped:
+                    reason = "stopped"
+                    break
+                licks += 1
+                with tracer.span("lick", lick=licks):
+                    new_text = self.send(self.command)
+                # every event is consumed, so the parser's state is complete even past the end of the combat
+                events = list(self.parser.parse(new_text))
+                if self.on_events:
+                    self.on_events(events)
+                if any(isinstance(event, (CombatEnded, GameOver)) for event in events):
+                    reason = "ended"
+                    break
+                now = self.clock()
+                if self.on_output and now - last_render >= self.ui_interval:
+                    self.on_output(new_text)
+                    last_render = now
+            span.set(licks=licks, reason=reason)
+        if self.on_output:
+            self.on_output(new_text)
+        self.stats.record(licks, self.clock() - start_time, reason)
+        return new_text, reason
@@ -0,0 +1,162 @@
+"""
+Shortens the screens added to the model's history. Runs of lines the model has already been shown, such as a room
+description it has seen before, are replaced by a short back-reference quoting their first words, and known
+boilerplate is stripped. A reference only ever points at a screen that is still in the history in full: screens
+forgotten by a summary, or old enough to be cut down by the history pruning, are sent in full again.
+"""
+import hashlib
+import re
+
+from token_estimator import estimate_text_tokens
+
+# (name, pattern, replacement) applied to every screen, in order
+BOILERPLATE = [
+    ("carriage_returns", re.compile(r"\r"), ""),
+    ("trailing_spaces", re.compile(r"[ \t]+$", re.MULTILINE), ""),
+    ("dividers", re.compile(r"^[-=*_~#]{4,}$", re.MULTILINE), ""),
+    ("blank_lines", re.compile(r"\n{3,}"), "\n\n"),
+]
+PREVIEW_WORDS = 6
+
+
+def fingerprint(line: str) -> str:
+    # whitespace and case don't make a line new; not hash(), so fingerprints are the same in every process
+    normalized = " ".join(line.split()).lower()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def reference(lines: list[str]) -> str:
+    words = " ".join(lines).split()
+    preview = " ".join(words[:PREVIEW_WORDS]) + ("..." if len(words) > PREVIEW_WORDS else "")
+    count = f" {len(lines)} lines" if len(lines) > 1 else ""
+    return f'[repeated{count}: "{preview}"]'
+
+
+class CompressionStats:
+    """
+    Characters and estimated tokens saved, for the last screen and over the whole game.
+    """
+    def __init__(self):
+        self.screens = 0
+        self.references = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.last_chars_saved = 0
+        self.last_tokens_saved = 0
+
+    def record(self, original: str, compressed: str, references: int):
+        tokens_in = estimate_text_tokens(original)
+        tokens_out = estimate_text_tokens(compressed) if compressed != original else tokens_in
+        self.screens += 1
+        self.references += references
+        self.chars_in += len(original)
+        self.chars_out += len(compressed)
+        self.tokens_in += tokens_in
+        self.tokens_out += tokens_out
+        self.last_chars_saved = len(original) - len(compressed)
+        self.last_tokens_saved = tokens_in - tokens_out
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    @property
+    def ratio(self) -> float:
+        return self.chars_out / self.chars_in if self.chars_in else 1.0
+
+    def summary(self) -> str:
+        return (f"screens: {self.screens}, references: {self.references}, "
+                f"chars: {self.chars_in} -> {self.chars_out} ({1 - self.ratio:.0%} saved), "
+                f"est. tokens saved: {self.tokens_saved}")
+
+
+class ScreenCompressor:
+    """
+    Compresses one screen per turn, in order. Lines are fingerprinted as they are sent in full, and a run of lines
+    that were sent together before, in the same order, becomes one reference if it totals at least min_chars characters.
+    min_chars is the safety threshold: shorter repeats (prompts, one-line results) are always sent as they are,
+    since a reference would save little and make the screen harder to read. References only point back at most
+    max_age turns, and never before the turn passed to forget_before.
+    """
+    def __init__(self, min_chars: int = 60, max_age: int = 20, boilerplate=BOILERPLATE):
+        self.min_chars = min_chars
+        self.max_age = max_age
+        self.boilerplate = boilerplate
+        self.turn = 0
+        self.first_turn = 0  # screens before this turn are no longer in the history
+        self.seen = {}  # fingerprint -> (turn, position) where the line was last sent in full
+        self.stats = CompressionStats()
+
+    def live(self, turn: int) -> bool:
+        return turn >= self.first_turn and self.turn - turn < self.max_age
+
+    def compress(self, screen: str) -> str:
+        """
+        The screen as it should be added to the history for this turn.
+        """
+        self.turn += 1
+        if self.turn % self.max_age == 0:
+            self._sweep()
+        text = screen
+        for _, pattern, replacement in self.boilerplate:
+            text = pattern.sub(replacement, text)
+        lines = text.split("\n")
+        prints = [fingerprint(line) if line.strip() else None for line in lines]
+        out = []
+        references = 0
+        index = 0
+        ordinal = 0  # the position of the line among the screen's non-blank lines
+        while index < len(lines):
+            if prints[index] is None:
+                out.append(lines[index])
+                index += 1
+                continue
+            # the longest run of lines sent together before, in the same order and from the same turn
+            source = self.seen.get(prints[index])
+            end = index
+            if source is not None and self.live(source[0]):
+                expected = source[1]
+                while end < len(lines):
+                    if prints[end] is not None:
+                        match = self.seen.get(prints[end])
+                        if match is None or match[0] != source[0] or match[1] != expected:
+                            break
+                        expected += 1
+                    end += 1
+                while end > index and prints[end - 1] is None:
+                    end -= 1
+            run = [line for line in lines[index:end] if line.strip()]
+            if run and sum(len(line) for line in run) >= self.min_chars:
+                out.append(reference(run))
+                references += 1
+                ordinal += len(run)
+                index = end
+                continue
+            # not worth a reference, send this line and look again from the next one
+            self.seen[prints[index]] = (self.turn, ordinal)
+            out.append(lines[index])
+            ordinal += 1
+            index += 1
+        compressed = "\n".join(out).strip("\n")
+        self.stats.record(screen, compressed, references)
+        return compressed
+
+    def forget_before(self, turn: int):
+        """
+        Stop referring to screens from before turn, such as once they are replaced by a summary.
+        """
+        self.first_turn = max(self.first_turn, turn)
+        self._sweep()
+
+    def _sweep(self):
+        self.seen = {key: source for key, source in self.seen.items() if self.live(source[0])}
+
+    def state(self) -> dict:
+        return {"turn": self.turn, "first_turn": self.first_turn, "seen": self.seen}
+
+    def load_state(self, state: dict):
+        self.turn = state["turn"]
+        self.first_turn = state["first_turn"]
+        self.seen = {key: tuple(source) for key, source in state["seen"].items()}
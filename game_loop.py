@@ -0,0 +1,389 @@
+import threading
+import time
+
+from combat import CombatRunner
+from reflex import Reflex
+from screen_parser import ScreenParser
+from tracing import percentile, tracer
+
+
+class TurnTimings:
+    """
+    Wall time of every turn, broken down into model call, terminal settle, text extraction, UI updates and summarization.
+    With streaming the model call and the game overlap, so the stages can add up to more than the turn.
+    """
+    STAGES = ("model", "settle", "extract", "ui", "summary")
+
+    def __init__(self):
+        self.turns = []  # one dict per turn, with "total" and every stage in seconds
+        self.start_time = None
+        self.end_time = None
+
+    def record(self, turn: dict):
+        self.turns.append(turn)
+
+    def report(self) -> dict:
+        totals = [turn["total"] for turn in self.turns]
+        elapsed = (self.end_time or time.monotonic()) - (self.start_time or time.monotonic())
+        return {
+            "turns": len(self.turns),
+            "wall_seconds": elapsed,
+            "turns_per_second": len(self.turns) / elapsed if elapsed > 0 else 0.0,
+            "latency_p50": percentile(totals, 50),
+            "latency_p95": percentile(totals, 95),
+            "latency_p99": percentile(totals, 99),
+            "stage_seconds": {stage: sum(turn.get(stage, 0.0) for turn in self.turns) for stage in self.STAGES},
+        }
+
+
+class HeadlessUI:
+    """
+    Does nothing with the updates TootsieGUI would show, for running without a window.
+    """
+    def update_output(self, text): pass
+    def set_last_command(self, cmd): pass
+    def set_status(self, text): pass
+    def reset_status(self): pass
+    def set_llm_message(self, message): pass
+    def set_reasoning(self, reasoning): pass
+    def set_memory(self, memory_dict): pass
+    def set_token_usage(self, *args, **kwargs): pass
+    def set_reflex_stats(self, stats): pass
+    def set_game_state(self, text): pass
+
+
+class GameLoop:
+    """
+    Plays the game: ask the player for a command, run it in the game, show the results in the UI, repeat until the game ends.
+    """
+    def __init__(self, player, game, ui, stream: bool = False, blocking_summary: bool = False,
+                 summary_token_budget: int = 50000, summarize_after: int | None = None, max_turns: int | None = None,
+                 final_summary: bool = True, max_licks: int = 200, combat_timeout: float = 300, reflex: bool = True,
+                 summary_cooldown: int = 10):
+        self.player = player
+        self.game = game
+        self.ui = ui
+        self.stream = stream
+        self.blocking_summary = blocking_summary
+        self.summary_token_budget = summary_token_budget
+        self.summarize_after = summarize_after
+        self.max_turns = max_turns
+        self.final_summary = final_summary
+        # after a failed summary, or one that leaves the context over budget, don't summarize again for this many turns
+        self.summary_cooldown = summary_cooldown
+        self.cooldown_left = 0
+        self.timings = TurnTimings()
+        self.reflex = Reflex() if reflex else None
+        self.model_turns = 0
+        self.model_seconds = 0.0
+        self.output_tokens = 0
+        # turns everything the game prints into events, see screen_parser.py; the combat runner shares it
+        self.parser = ScreenParser()
+        self.combat = CombatRunner(
+            send=lambda command: self._game_call(self.game.send_command, command),
+            on_output=self.show_output,
+            max_licks=max_licks,
+            timeout=combat_timeout,
+            parser=self.parser,
+            on_events=self.route_events
+        )
+        if player.router is not None:
+            player.router.use_parser(self.parser)
+        self.turn = {}  # timings of the turn in progress
+        # a command run off the loop's thread keeps its timings and router events here, see run_apart
+        self.apart = threading.local()
+        self.finished = False
+
+    def _add_time(self, stage: str, seconds: float):
+        turn = getattr(self.apart, "turn", self.turn)
+        turn[stage] = turn.get(stage, 0.0) + seconds
+
+    def run_apart(self, function, *args):
+        """
+        Run function on a thread other than the loop's. The turn timings and router events it produces are kept
+        apart instead of changing the loop's, and returned with its result for apply_apart on the loop's thread.
+        The parser is the command's alone until then: the loop doesn't look at it while waiting for the command.
+        """
+        self.apart.turn = {}
+        self.apart.events = []
+        try:
+            return function(*args), self.apart.turn, self.apart.events
+        finally:
+            del self.apart.turn, self.apart.events
+
+    def apply_apart(self, turn: dict, events: list):
+        for stage, seconds in turn.items():
+            self._add_time(stage, seconds)
+        self.route_events(events)
+
+    def _settle_seconds(self) -> float:
+        settle_stats = getattr(self.game, "settle_stats", None)
+        return settle_stats.total_seconds if settle_stats else 0.0
+
+    def _game_call(self, send, *args) -> str:
+        # time a call into the game, splitting it into settling and extracting the new text
+        start = time.monotonic()
+        settle_before = self._settle_seconds()
+        with tracer.span("game." + send.__name__, args=args):
+            text = send(*args)
+        settle = self._settle_seconds() - settle_before
+        self._add_time("settle", settle)
+        self._add_time("extract", max(0.0, time.monotonic() - start - settle))
+        return text
+
+    def _ui_call(self, method, *args, **kwargs):
+        start = time.monotonic()
+        with tracer.span("ui." + method.__name__):
+            method(*args, **kwargs)
+        self._add_time("ui", time.monotonic() - start)
+
+    def show_output(self, text):
+        self._ui_call(self.ui.update_output, text)
+        self._ui_call(self.ui.set_game_state, self.parser.summary())
+
+    def observe(self, text) -> list:
+        """
+        Parse new game text into events, updating the parser's state. Every piece of text is parsed exactly once:
+        here, or by the combat runner for licks.
+        """
+        with tracer.span("parse"):
+            events = list(self.parser.parse(text))
+        self.route_events(events)
+        return events
+
+    def route_events(self, events: list):
+        # the router follows the game through this loop's parser instead of parsing every screen again
+        pending = getattr(self.apart, "events", None)
+        if pending is not None:
+            pending.extend(events)
+        elif self.player.router is not None:
+            self.player.router.observe(events)
+
+    def send_and_refresh(self, cmd):
+        self._ui_call(self.ui.set_last_command, cmd)
+        if cmd.strip() == '':
+            new_text = self._game_call(self.game.send_enter)
+        else:
+            new_text = self._game_call(self.game.send_command, cmd)
+        self.observe(new_text)
+        self.show_output(new_text)
+        self._ui_call(self.ui.reset_status)
+        return new_text
+
+    def lick_loop(self):
+        # repeatedly send the lick command until the combat ends
+        self._ui_call(self.ui.set_status, "Licking until combat ends...")
+        new_text, reason = self.combat.run()
+        if reason == "ended":
+            self._ui_call(self.ui.reset_status)
+        else:
+            self._ui_call(self.ui.set_status, f"Stopped licking after hitting the combat {reason}")
+        return new_text
+
+    def run_command(self, command):
+        if command.lower() == 'lick_loop':
+            return self.lick_loop()
+        return self.send_and_refresh(command)
+
+    def get_streamed_response(self, game_text):
+        # the command starts running in the game while the rest of the response streams in
+        dispatched = {}
+        def dispatch(command):
+            def worker():
+                try:
+                    dispatched["result"] = self.run_apart(self.run_command, command)
+                except Exception as e:
+                    dispatched["error"] = e
+            dispatched["thread"] = threading.Thread(target=worker, daemon=True)
+            dispatched["thread"].start()
+        try:
+            response = self.player.get_response_streaming(
+                game_text,
+                on_command=dispatch,
+                on_message=self.ui.set_llm_message,
+                on_reasoning=self.ui.set_reasoning
+            )
+        finally:
+            # even if the stream failed, the command has to finish before anything else is sent to the game
+            if "thread" in dispatched:
+                dispatched["thread"].join()
+        if "error" in dispatched:
+            raise dispatched["error"]
+        if "result" not in dispatched:
+            return response, ''
+        text, turn, events = dispatched["result"]
+        self.apply_apart(turn, events)
+        return response, text
+
+    def answer_locally(self, game_text):
+        """
+        Answer a trivial screen with Enter, without asking the model. Returns the new game text, or None if the
+        screen needs the model.
+        """
+        rule = self.reflex.match(game_text) if self.reflex else None
+        if rule is None:
+            return None
+        seconds_saved, tokens_saved = self.model_call_cost()
+        with tracer.span("reflex", rule=rule):
+            self.player.add_local_turn(game_text, '')
+            new_text = self.send_and_refresh('')
+        self.reflex.stats.record(rule, seconds_saved, tokens_saved)
+        self._ui_call(self.ui.set_reflex_stats, self.reflex.stats)
+        return new_text
+
+    def model_call_cost(self) -> tuple[float, int]:
+        # what the model call would have cost, going by the turns so far
+        seconds = self.model_seconds / self.model_turns if self.model_turns else 0.0
+        tokens = self.player.estimate_context_tokens()
+        if self.model_turns:
+            tokens += self.output_tokens // self.model_turns
+        return seconds, tokens
+
+    def finish_game(self, game_text):
+        self.report_stats(game_text)
+        if self.final_summary:
+            # Run a final summary, after any background summary has been applied
+            self.ui.set_status("Generating final summary...")
+            self.player.poll_background_summary(wait=True)
+            self.player.perform_summary(game_text)
+        self.report_summaries()
+
+    def report_stats(self, game_text):
+        self.finished = True
+        self.ui.update_output(game_text)
+        settle_stats = getattr(self.game, "settle_stats", None)
+        if settle_stats:
+            print(f"Screen {settle_stats.summary()}")
+        if self.combat.stats.combats:
+            print(f"Combat {self.combat.stats.summary()}")
+        if self.reflex and self.reflex.stats.skipped:
+            print(f"Reflex {self.reflex.stats.summary()}")
+        print(f"Requests {self.player.executor.stats.summary()}")
+        if self.player.router:
+            print(f"Router {self.player.router.stats.summary()}")
+        if self.player.compressor and self.player.compressor.stats.screens:
+            print(f"Compression {self.player.compressor.stats.summary()}")
+
+    def report_summaries(self):
+        print(f"Summary {self.player.summary_stats.summary()}")
+        divergences = getattr(self.game, "divergences", None)
+        if divergences:
+            print(f"Replay diverged from the recording {len(divergences)} times, first at step {divergences[0][0]}")
+
+    def summary_due(self, summary_counter: int) -> bool:
+        """
+        Whether to start a summary this turn: the context is over budget or summarize_after turns have passed,
+        and no failed or ineffective summary is cooling down. Call once per turn.
+        """
+        due = (self.player.over_token_budget(self.summary_token_budget) or
+               bool(self.summarize_after and summary_counter >= self.summarize_after))
+        if self.cooldown_left:
+            self.cooldown_left -= 1
+            if due:
+                self.player.summary_stats.deferred_turns += 1
+            return False
+        return due
+
+    def summary_finished(self, applied: bool):
+        # without a cooldown a failed summary is retried, and one that can't get under budget repeated, every turn
+        if applied and not self.player.over_token_budget(self.summary_token_budget):
+            return
+        if applied:
+            self.player.summary_stats.ineffective += 1
+        self.cooldown_left = self.summary_cooldown
+
+    def poll_summary(self):
+        # splice in a background summary once it is done
+        running = self.player.summary_job is not None
+        applied = self.player.poll_background_summary()
+        if running and self.player.summary_job is None:
+            self.summary_finished(applied)
+
+    def record_turn(self, turn_start: float):
+        self.turn["total"] = time.monotonic() - turn_start
+        self.timings.record(self.turn)
+
+    def update_turn_ui(self, response, turns_until_summary):
+        self._ui_call(self.ui.set_llm_message, response.message)
+        self._ui_call(self.ui.set_reasoning, response.reasoning)
+        self._ui_call(self.ui.set_memory, self.player.memory)
+        self._ui_call(
+            self.ui.set_token_usage,
+            input_tokens=response.input_tokens,
+            cached_input_tokens=response.cached_input_tokens,
+            output_tokens=response.output_tokens,
+            turns_until_summary="running" if self.player.summary_running else turns_until_summary,
+            average_cache_rate=self.player.cache_stats.average_rate,
+            projected_input_tokens=response.projected_input_tokens,
+            token_budget=self.summary_token_budget,
+            screen_tokens_saved=self.player.compressor.stats.last_tokens_saved if self.player.compressor else None,
+            tier=response.tier
+        )
+
+    def play(self):
+        player = self.player
+        ui = self.ui
+        self.timings.start_time = time.monotonic()
+        # get the initial game state
+        game_text = self._game_call(self.game.get_current_screen)
+        self.observe(game_text)
+        self.show_output(game_text)
+
+        summarize_after = self.summarize_after
+        summary_counter = 0
+        turns = 0
+        while True:
+            # check if we have finished the game
+            if self.parser.over:
+                self.finish_game(game_text)
+                break
+            if self.max_turns is not None and turns >= self.max_turns:
+                break
+            turn_start = time.monotonic()
+            self.turn = {}
+            start = time.monotonic()
+            self.poll_summary()
+            # check if we need to summarize the game state, based on the context size
+            if self.summary_due(summary_counter):
+                if self.blocking_summary:
+                    ui.set_status("Summarizing game state...")
+                    player.summary_stats.stalled_turns += 1
+                    self.summary_finished(player.perform_summary(game_text))
+                    summary_counter = 0
+                    continue
+                # if the last summary is still running, try again next turn
+                if player.start_background_summary():
+                    summary_counter = 0
+            self._add_time("summary", time.monotonic() - start)
+            local_text = self.answer_locally(game_text)
+            if local_text is not None:
+                game_text = local_text
+                summary_counter += 1
+                turns += 1
+                self.record_turn(turn_start)
+                continue
+            self._ui_call(ui.set_status, "Player thinking...")
+            start = time.monotonic()
+            if self.stream:
+                response, dispatched_text = self.get_streamed_response(game_text)
+            else:
+                response, dispatched_text = player.get_response(game_text), ''
+            self._add_time("model", time.monotonic() - start)
+            self.model_turns += 1
+            self.model_seconds += time.monotonic() - start
+            self.output_tokens += response.output_tokens or 0
+            self.update_turn_ui(response, summarize_after - summary_counter - 1 if summarize_after else None)
+            # execute the command in the game
+            # if command is None, skip. If command is empty, send Enter.
+            if response.dispatched:
+                game_text = dispatched_text
+                summary_counter += 1
+            elif response.command is not None:
+                game_text = self.run_command(response.command)
+                summary_counter += 1
+            else:
+                ui.set_status("No command generated by LLM, waiting for next turn...")
+                game_text = ''
+            turns += 1
+            self.record_turn(turn_start)
+        self.timings.end_time = time.monotonic()
@@ -0,0 +1,174 @@
+"""
+Plays many independent sessions at once without a window, one per process in a process pool.
+Each session gets its own game, player, history, memory and working directory (with its own summary.txt),
+and the results are aggregated into one JSON report: completion rate, turns to completion, tokens and wall time.
+Run with: python headless.py --sessions 32 --backend sim --mock
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assistant import AssistantPlayer
+from backends import create_backend
+from game_loop import GameLoop, HeadlessUI
+from recorder import RecordingBackend, SessionRecorder
+from tracing import percentile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_api_key(base_url: str | None, mock: bool) -> str:
+    if mock or (base_url and not os.path.exists(os.path.join(ROOT, "api_key.txt"))):
+        # the mock server and local endpoints don't need a real key
+        return "local"
+    with open(os.path.join(ROOT, "api_key.txt"), "r") as f:
+        api_key = f.read().strip()
+    if not api_key:
+        raise ValueError("API key not found. Please create a file named 'api_key.txt' with your OpenAI API key.")
+    return api_key
+
+
+def run_session(index: int, options: dict) -> dict:
+    """
+    Play one session to the end (or to max_turns) in its own working directory and return its stats.
+    Runs in a pool worker, so everything it needs comes in through options.
+    """
+    workdir = os.path.join(options["output_dir"], f"session_{index:03d}")
+    os.makedirs(workdir, exist_ok=True)
+    with open(os.path.join(ROOT, "system_prompt.txt"), "r") as f:
+        system_prompt = f.read().strip()
+    with contextlib.ExitStack() as stack:
+        base_url = options["base_url"]
+        if options["mock"]:
+            # every session gets its own mock server, so the scripted commands of different sessions don't mix
+            from mock_server import MockResponsesServer, command_responder
+            from simulator import WALKTHROUGH
+            commands = WALKTHROUGH if options["no_reflex"] else [command for command in WALKTHROUGH if command]
+            server = stack.enter_context(MockResponsesServer(command_responder(commands, memory_every=3),
+                                                             latency=options["model_latency"]))
+            base_url = server.base_url
+        # the loop prints its stats, keep each session's output in its own log
+        log = stack.enter_context(open(os.path.join(workdir, "log.txt"), "w"))
+        stack.enter_context(contextlib.redirect_stdout(log))
+        player = AssistantPlayer(options["api_key"], options["model"], system_prompt, base_url=base_url,
+                                 chain_responses=options["chain"], summary_path=os.path.join(workdir, "summary.txt"),
+                                 summary_prompt_path=os.path.join(ROOT, "summary_prompt.txt"))
+        game = create_backend(options["backend"], options["game_command"], cwd=workdir)
+        stack.callback(game.close)
+        if options["record"]:
+            game = RecordingBackend(game, SessionRecorder(os.path.join(workdir, "session.jsonl")))
+        loop = GameLoop(player, game, HeadlessUI(), stream=options["stream"],
+                        summary_token_budget=options["summary_token_budget"],
+                        summarize_after=options["summarize_after"], max_turns=options["max_turns"],
+                        final_summary=options["final_summary"], reflex=not options["no_reflex"])
+        start = time.monotonic()
+        error = None
+        try:
+            loop.play()
+        except Exception as e:
+            # one broken session shouldn't take the whole run down
+            error = repr(e)
+            print(f"Session failed: {error}")
+        result = {
+            "session": index,
+            "finished": loop.finished,
+            "turns": len(loop.timings.turns),
+            "wall_seconds": time.monotonic() - start,
+            "input_tokens": player.cache_stats.input_tokens,
+            "cached_input_tokens": player.cache_stats.cached_input_tokens,
+            "output_tokens": loop.output_tokens,
+            "model_turns": loop.model_turns,
+            "summaries": player.summary_stats.summaries,
+            "error": error,
+        }
+    with open(os.path.join(workdir, "result.json"), "w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def aggregate(results: list[dict], wall_seconds: float) -> dict:
+    finished = [result for result in results if result["finished"]]
+    turns = [result["turns"] for result in finished]
+    session_seconds = [result["wall_seconds"] for result in results]
+    return {
+        "sessions": len(results),
+        "completed": len(finished),
+        "completion_rate": len(finished) / len(results) if results else 0.0,
+        "errors": sum(1 for result in results if result["error"]),
+        "turns_to_completion_mean": sum(turns) / len(turns) if turns else 0.0,
+        "turns_to_completion_p50": percentile(turns, 50),
+        "turns_to_completion_max": max(turns, default=0),
+        "input_tokens": sum(result["input_tokens"] for result in results),
+        "cached_input_tokens": sum(result["cached_input_tokens"] for result in results),
+        "output_tokens": sum(result["output_tokens"] for result in results),
+        "session_seconds_p50": percentile(session_seconds, 50),
+        "session_seconds_max": max(session_seconds, default=0.0),
+        "wall_seconds": wall_seconds,
+        "sessions_per_second": len(results) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many sessions in parallel without a window")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--backend", choices=["winpty", "pty", "sim"], default="sim")
+    parser.add_argument("--game-command", nargs="+", default=None)
+    parser.add_argument("--model", default="o4-mini")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--mock", action="store_true", help="play against a local mock model that plays the simulator's walkthrough")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="latency of the mock model")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--chain", action="store_true")
+    parser.add_argument("--no-reflex", action="store_true")
+    parser.add_argument("--summary-token-budget", type=int, default=50000)
+    parser.add_argument("--summarize-after", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--no-final-summary", action="store_true")
+    parser.add_argument("--record", action="store_true", help="record a session log in every session's directory")
+    parser.add_argument("--output-dir", default=None, help="where the session directories go, runs/<time> by default")
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir or os.path.join("runs", time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(output_dir, exist_ok=True)
+    options = {
+        "output_dir": output_dir,
+        "api_key": read_api_key(args.base_url, args.mock),
+        "model": args.model,
+        "base_url": args.base_url,
+        "mock": args.mock,
+        "model_latency": args.model_latency,
+        "backend": args.backend,
+        "game_command": args.game_command,
+        "stream": args.stream,
+        "chain": args.chain,
+        "no_reflex": args.no_reflex,
+        "summary_token_budget": args.summary_token_budget,
+        "summarize_after": args.summarize_after,
+        "max_turns": args.max_turns,
+        "final_summary": not args.no_final_summary,
+        "record": args.record,
+    }
+    start = time.monotonic()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_session, index, options) for index in range(args.sessions)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "finished" if result["finished"] else "stopped"
+            print(f"session {result['session']}: {status} after {result['turns']} turns "
+                  f"in {result['wall_seconds']:.1f}s", file=sys.stderr)
+    results.sort(key=lambda result: result["session"])
+    report = aggregate(results, time.monotonic() - start)
+    with open(os.path.join(output_dir, "results.json"), "w") as f:
+        json.dump({"report": report, "sessions": results}, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
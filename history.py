@@ -0,0 +1,202 @@
+"""
+The player's history, with an index of item positions by type and of where each turn starts, and pruning policies
+that drop or shorten old items: reasoning past the last few turns, old memory tool calls, old screens.
+Pruning rewrites the start of the history, which invalidates the provider's prompt cache from that point on,
+so it runs in batches (every prune_every turns) rather than every turn. Each policy only looks at the turns that
+aged past its limit since the last batch, and only the items from the first change on are rewritten and reindexed,
+so a batch costs the last few dozen turns of the history, not all of it.
+"""
+import bisect
+
+MEMORY_TOOLS = ("store_memory", "delete_memory", "lookup_memory")
+OUTPUT_TYPES = ("message", "function_call")
+
+
+def item_type(item) -> str:
+    """
+    The type of a history item: "reasoning", "message" or "function_call" for model output, "function_call_output",
+    or the role ("system", "user", "assistant") for the messages we add ourselves.
+    """
+    if isinstance(item, dict):
+        return item.get("type") or item.get("role", "")
+    return getattr(item, "type", "")
+
+
+class History(list):
+    """
+    A list of history items that also tracks item positions by type and the index each turn starts at.
+    Call start_turn before adding a turn's screen. Anything that works on a list of items works on it.
+    """
+    def __init__(self, items=(), turn_starts=None, policies=(), prune_every: int = 10):
+        super().__init__(items)
+        self.turn_starts = list(turn_starts or [])
+        self.policies = list(policies)
+        self.prune_every = prune_every
+        self.turns_since_prune = 0
+        self.aged_upto = {id(policy): 0 for policy in self.policies}  # policy -> first turn it hasn't pruned yet
+        self.positions = {}
+        self._reindex()
+
+    def _reindex(self, start: int = 0):
+        # positions before start are still right, redo the rest
+        for positions in self.positions.values():
+            del positions[bisect.bisect_left(positions, start):]
+        for index in range(start, len(self)):
+            self.positions.setdefault(item_type(self[index]), []).append(index)
+
+    def append(self, item):
+        self.positions.setdefault(item_type(item), []).append(len(self))
+        super().append(item)
+
+    def start_turn(self):
+        self.turn_starts.append(len(self))
+        self.turns_since_prune += 1
+
+    @property
+    def turns(self) -> int:
+        return len(self.turn_starts)
+
+    def turn_range(self, first_turn: int, end_turn: int) -> tuple[int, int]:
+        # item indices covering turns [first_turn, end_turn)
+        start = self.turn_starts[first_turn] if first_turn < self.turns else len(self)
+        end = self.turn_starts[end_turn] if end_turn < self.turns else len(self)
+        return start, end
+
+    def indices_of(self, kind: str, start: int, end: int) -> list[int]:
+        positions = self.positions.get(kind, [])
+        return positions[bisect.bisect_left(positions, start):bisect.bisect_left(positions, end)]
+
+    def replace_prefix(self, upto: int, items: list):
+        """
+        Replace the first upto items, such as with a summary. Turns that started before upto are forgotten.
+        """
+        self[:upto] = items
+        shift = len(items) - upto
+        forgotten = bisect.bisect_left(self.turn_starts, upto)
+        self.turn_starts = [start + shift for start in self.turn_starts[forgotten:]]
+        self.aged_upto = {key: max(0, turn - forgotten) for key, turn in self.aged_upto.items()}
+        self._reindex()
+
+    @property
+    def prune_due(self) -> bool:
+        return bool(self.policies) and self.turns_since_prune >= self.prune_every
+
+    def prune(self) -> int:
+        """
+        Run every policy over the turns that aged past its limit since the last prune. Returns the items removed.
+        Items before the first change keep their place, so only the rest of the history is moved and reindexed.
+        """
+        self.turns_since_prune = 0
+        changes = {}  # index -> replacement item, or None to drop it
+        for policy in self.policies:
+            end_turn = self.turns - policy.after_turns
+            first_turn = self.aged_upto[id(policy)]
+            if end_turn <= first_turn:
+                continue
+            start, end = self.turn_range(first_turn, end_turn)
+            policy.prune(self, start, end, changes)
+            self.aged_upto[id(policy)] = end_turn
+        if not changes:
+            return 0
+        self._pair_reasoning(changes)
+        if not changes:
+            return 0
+        first = min(changes)
+        kept = []
+        new_index = []  # old index - first -> new index, for moving the turn starts
+        for index in range(first, len(self)):
+            new_index.append(first + len(kept))
+            item = self[index]
+            if index in changes:
+                item = changes[index]
+                if item is None:
+                    continue
+            kept.append(item)
+        removed = len(self) - first - len(kept)
+        self[first:] = kept
+        moved = bisect.bisect_left(self.turn_starts, first)
+        self.turn_starts[moved:] = [new_index[start - first] if start - first < len(new_index) else len(self)
+                                    for start in self.turn_starts[moved:]]
+        self._reindex(first)
+        return removed
+
+    def _pair_reasoning(self, changes: dict):
+        # the API rejects a function call without the reasoning item before it, and a reasoning item with
+        # nothing after it, so reasoning items follow what happens to the output right after them
+        candidates = set()
+        for index in changes:
+            if item_type(self[index]) == "reasoning":
+                candidates.add(index)
+            elif index > 0 and item_type(self[index - 1]) == "reasoning":
+                candidates.add(index - 1)
+        for index in sorted(candidates):
+            following = index + 1
+            while following < len(self) and item_type(self[following]) == "reasoning":
+                following += 1
+            next_is_kept_output = (following < len(self) and item_type(self[following]) in OUTPUT_TYPES
+                                   and changes.get(following, self[following]) is not None)
+            if changes.get(index, self[index]) is None:
+                if next_is_kept_output and item_type(self[following]) == "function_call":
+                    del changes[index]
+            elif not next_is_kept_output:
+                changes[index] = None
+
+
+class KeepRecentReasoning:
+    """
+    Drops reasoning items older than the last after_turns turns.
+    """
+    def __init__(self, after_turns: int = 3):
+        self.after_turns = after_turns
+
+    def prune(self, history: History, start: int, end: int, changes: dict):
+        for index in history.indices_of("reasoning", start, end):
+            changes[index] = None
+
+
+class CollapseMemoryCalls:
+    """
+    Drops memory tool calls and their outputs older than after_turns turns. The memory itself is sent every turn,
+    so the old calls only repeat it.
+    """
+    def __init__(self, after_turns: int = 5, tools=MEMORY_TOOLS):
+        self.after_turns = after_turns
+        self.tools = set(tools)
+
+    def prune(self, history: History, start: int, end: int, changes: dict):
+        call_ids = set()
+        for index in history.indices_of("function_call", start, end):
+            call = history[index]
+            if call.name in self.tools:
+                changes[index] = None
+                call_ids.add(call.call_id)
+        if not call_ids:
+            return
+        # outputs directly follow their calls, so they are in the same turns
+        for index in history.indices_of("function_call_output", start, end):
+            if history[index].get("call_id") in call_ids:
+                changes[index] = None
+
+
+class TruncateScreens:
+    """
+    Shortens screens older than after_turns turns to their first head and last tail lines.
+    """
+    def __init__(self, after_turns: int = 20, head: int = 3, tail: int = 2):
+        self.after_turns = after_turns
+        self.head = head
+        self.tail = tail
+
+    def prune(self, history: History, start: int, end: int, changes: dict):
+        for index in history.indices_of("user", start, end):
+            item = history[index]
+            lines = item["content"].splitlines() if isinstance(item.get("content"), str) else []
+            cut = len(lines) - self.head - self.tail
+            if cut <= 1:
+                continue
+            content = "\n".join(lines[:self.head] + [f"[... {cut} lines cut ...]"] + lines[-self.tail:])
+            changes[index] = dict(item, content=content)
+
+
+def default_policies() -> list:
+    return [KeepRecentReasoning(3), CollapseMemoryCalls(5)]
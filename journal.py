@@ -0,0 +1,177 @@
+"""
+Crash-safe checkpoints of the player's state. Every change (history items, responses, memory writes, summaries) is
+appended to a JSONL journal as it happens, and fsynced in batches. Every so often the whole state is written to a
+compact snapshot and the journal starts over, so resuming only loads the snapshot and replays a short journal.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseReasoningItem
+
+from recorder import to_json
+
+# the typed items the Responses API puts in the history, rebuilt on load so they round-trip
+ITEM_TYPES = {
+    "message": ResponseOutputMessage,
+    "reasoning": ResponseReasoningItem,
+    "function_call": ResponseFunctionToolCall,
+}
+
+
+def restore_item(item: dict):
+    """
+    Rebuild a history item from its JSON. Items we create ourselves are plain dicts and stay that way.
+    """
+    item_type = ITEM_TYPES.get(item.get("type"))
+    if item_type is None:
+        return item
+    # construct, since the API's own output doesn't always pass its strict validation
+    return item_type.construct(**item)
+
+
+class Journal:
+    """
+    Appends records to path and snapshots to path + ".snapshot". Records are flushed to the OS right away, and
+    fsynced at most every fsync_interval seconds or fsync_batch records, so a crash loses at most that much.
+    Every record has a sequence number and the snapshot keeps the last one it covers, so a crash between writing
+    the snapshot and restarting the journal can't apply a record twice.
+    With background, records and snapshots are still numbered and serialized by the caller, in order, but written,
+    flushed and fsynced by a writer thread, so the game never waits on the disk. The writer also fsyncs once
+    fsync_interval has passed with nothing new to write. A crash can then also lose the records still queued; close
+    writes them all. Without background, records written just before a pause stay unsynced until the next write.
+    """
+    def __init__(self, path: str, fsync_interval: float = 1.0, fsync_batch: int = 50, snapshot_every: int = 500,
+                 background: bool = False):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.snapshot_every = snapshot_every
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.records_since_snapshot = 0
+        snapshot, records = self.read()
+        if snapshot:
+            self.seq = snapshot["seq"]
+        if records:
+            self.seq = max(self.seq, records[-1]["seq"])
+        self.file = open(path, "a", encoding="utf-8")
+        self.queue = None
+        self.error = None  # what stopped the writer thread, raised to the next caller
+        if background:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._write_loop, name="journal", daemon=True)
+            self.writer.start()
+
+    def read(self) -> tuple[dict | None, list[dict]]:
+        """
+        The last snapshot (or None) and the journal records written after it.
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        covered = snapshot["seq"] if snapshot else 0
+        records = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line can be cut short by a crash
+                        break
+                    if record["seq"] > covered:
+                        records.append(record)
+        return snapshot, records
+
+    def append(self, record: dict):
+        with self.lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            self.records_since_snapshot += 1
+            self._submit(self._write_record, json.dumps(to_json(record), separators=(",", ":")) + "\n")
+
+    def _submit(self, write, data: str):
+        if self.queue is None:
+            write(data)
+            return
+        if self.error is not None:
+            raise self.error
+        self.queue.put((write, data))
+
+    def _write_loop(self):
+        while True:
+            # with records waiting to be synced, wake up to sync them once the interval is over
+            timeout = None
+            if self.unsynced:
+                timeout = max(0.0, self.last_sync + self.fsync_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                try:
+                    self._sync(time.monotonic())
+                except Exception as e:
+                    self.error = e
+                    return
+                continue
+            if item is None:
+                return
+            write, data = item
+            try:
+                write(data)
+            except Exception as e:
+                self.error = e
+                return
+
+    def _write_record(self, line: str):
+        self.file.write(line)
+        self.file.flush()
+        self.unsynced += 1
+        now = time.monotonic()
+        if self.unsynced >= self.fsync_batch or now - self.last_sync >= self.fsync_interval:
+            self._sync(now)
+
+    def _sync(self, now: float):
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = now
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self.records_since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state: dict):
+        """
+        Write the whole state atomically, then start the journal over.
+        """
+        with self.lock:
+            data = {"seq": self.seq, "time": time.time(), "state": to_json(state)}
+            self.records_since_snapshot = 0
+            self._submit(self._write_snapshot, json.dumps(data, separators=(",", ":")))
+
+    def _write_snapshot(self, data: str):
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self.file.close()
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.unsynced = 0
+
+    def close(self):
+        if self.queue is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
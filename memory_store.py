@@ -0,0 +1,160 @@
+"""
+The player's memory. Keys are namespaced by their first word ("tips_lick" is in the "tips" namespace), and each turn
+only part of the memory is sent to the model: the pinned namespaces (goals, current room, inventory), entries touched
+in the last few turns, and entries that share a word with the current screen. The model can fetch the rest with the
+lookup_memory tool.
+"""
+import bisect
+import json
+import re
+
+from token_estimator import estimate_text_tokens
+
+NAMESPACE_SPLIT = re.compile(r"[_:./\- ]")
+WORD = re.compile(r"[A-Za-z]{3,}")
+# words too common to tell anything about relevance
+STOP_WORDS = frozenset({"the", "and", "you", "your", "for", "with", "that", "this", "are", "have", "has", "not", "was",
+                        "can", "what", "there", "from", "into", "use", "get", "out", "its", "but", "all"})
+PINNED_NAMESPACES = ("goal", "goals", "current", "inventory", "location", "objective", "objectives")
+
+
+def namespace(key: str) -> str:
+    return NAMESPACE_SPLIT.split(key, 1)[0].lower()
+
+
+def keywords(text: str) -> set[str]:
+    return {word for word in (match.lower() for match in WORD.findall(text)) if word not in STOP_WORDS}
+
+
+class MemoryEntry:
+    __slots__ = ("key", "value", "tokens", "touched", "keywords")
+
+    def __init__(self, key: str, value: str, turn: int):
+        self.key = key
+        self.value = value
+        self.tokens = estimate_text_tokens(f'"{key}": "{value}", ')
+        self.touched = turn
+        self.keywords = keywords(key.replace("_", " ")) | keywords(str(value))
+
+
+class MemoryStore:
+    """
+    Memory entries with a sorted key index for prefix lookups, a keyword index for matching entries to the screen,
+    per-entry token sizes and the turn each entry was last touched.
+    Iterating or calling items() goes over every entry, in the order they were first stored.
+    """
+    def __init__(self, pinned_namespaces=PINNED_NAMESPACES, recent_turns: int = 2, relevant_tokens: int = 1500):
+        self.entries = {}
+        self.sorted_keys = []  # every key in sorted order, for prefix lookups
+        self.keyword_index = {}  # keyword -> keys of the entries that mention it
+        self.pinned_namespaces = set(pinned_namespaces)
+        self.recent_turns = recent_turns
+        self.relevant_tokens = relevant_tokens  # budget for the relevant (not pinned or recent) entries in each turn
+        self.total_tokens = 0
+        self.turn = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        return self.entries[key].value
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def items(self):
+        return [(key, entry.value) for key, entry in self.entries.items()]
+
+    def to_dict(self) -> dict:
+        return {key: entry.value for key, entry in self.entries.items()}
+
+    def set(self, key: str, value: str):
+        old = self.entries.get(key)
+        if old is None:
+            bisect.insort(self.sorted_keys, key)
+        else:
+            self._unindex(old)
+        # overwriting a key keeps its place in the insertion order
+        entry = self.entries[key] = MemoryEntry(key, value, self.turn)
+        self.total_tokens += entry.tokens
+        for word in entry.keywords:
+            self.keyword_index.setdefault(word, set()).add(key)
+
+    def delete(self, key: str) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+        self._unindex(entry)
+        return True
+
+    def _unindex(self, entry: MemoryEntry):
+        self.total_tokens -= entry.tokens
+        for word in entry.keywords:
+            keys = self.keyword_index.get(word)
+            if keys is not None:
+                keys.discard(entry.key)
+                if not keys:
+                    del self.keyword_index[word]
+
+    def with_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        end = bisect.bisect_left(self.sorted_keys, prefix + "\uffff")
+        return self.sorted_keys[start:end]
+
+    def lookup(self, prefix: str) -> dict:
+        """
+        Every entry whose key starts with prefix, touching them so they stay in the context for the next turns.
+        """
+        found = {}
+        for key in self.with_prefix(prefix):
+            entry = self.entries[key]
+            entry.touched = self.turn
+            found[key] = entry.value
+        return found
+
+    def is_pinned(self, key: str) -> bool:
+        return namespace(key) in self.pinned_namespaces
+
+    def select(self, screen: str) -> list[str]:
+        """
+        Keys to show this turn: pinned and recently touched entries, then entries sharing a word with the screen,
+        most recently touched first, until the relevant_tokens budget is used up.
+        """
+        selected = [key for key, entry in self.entries.items()
+                    if self.is_pinned(key) or self.turn - entry.touched < self.recent_turns]
+        chosen = set(selected)
+        candidates = set()
+        for word in keywords(screen):
+            candidates.update(self.keyword_index.get(word, ()))
+        budget = self.relevant_tokens
+        # ties are broken by key, so the same state always gives the same request
+        for key in sorted(candidates - chosen, key=lambda key: (-self.entries[key].touched, key)):
+            entry = self.entries[key]
+            if entry.tokens > budget:
+                continue
+            budget -= entry.tokens
+            selected.append(key)
+        return selected
+
+    def render(self, screen: str) -> str:
+        """
+        The memory text for this turn. Entries left out are listed by namespace, so the model knows what it can look up.
+        """
+        selected = self.select(screen)
+        shown = {key: self.entries[key].value for key in selected}
+        text = json.dumps(shown)
+        hidden = {}
+        for key in self.entries:
+            if key not in shown:
+                name = namespace(key)
+                hidden[name] = hidden.get(name, 0) + 1
+        if hidden:
+            text += "\nNot shown (use lookup_memory with a key prefix to see them): " + json.dumps(hidden)
+        return text
+
+    def next_turn(self):
+        self.turn += 1
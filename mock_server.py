@@ -0,0 +1,270 @@
+"""
+A local stand-in for the OpenAI Responses API, for exercising the player without network access or an API key.
+It answers POST /v1/responses (plain and streamed) with canned output items and records every request it gets.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ids = itertools.count(1)
+
+
+def message_item(text: str) -> dict:
+    return {
+        "type": "message",
+        "id": f"msg_{next(_ids)}",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}]
+    }
+
+
+def reasoning_item(text: str) -> dict:
+    return {"type": "reasoning", "id": f"rs_{next(_ids)}", "summary": [{"type": "summary_text", "text": text}]}
+
+
+def function_call_item(name: str, arguments: dict) -> dict:
+    call_id = next(_ids)
+    return {
+        "type": "function_call",
+        "id": f"fc_{call_id}",
+        "call_id": f"call_{call_id}",
+        "name": name,
+        "arguments": json.dumps(arguments),
+        "status": "completed"
+    }
+
+
+def command_responder(commands, message: str = "Trying something new.", memory_every: int = 0):
+    """
+    Build a responder that plays the given commands in order (repeating the last one), with a short reasoning summary.
+    With memory_every, every nth turn also stores a memory. Summary requests (tool_choice "none") get a canned summary.
+    """
+    commands = list(commands)
+    state = {"turn": 0}
+
+    def respond(body: dict) -> list[dict]:
+        if body.get("tool_choice") == "none":
+            return [message_item(f"Summary: {state['turn']} turns played so far.")]
+        command = commands[min(state["turn"], len(commands) - 1)]
+        state["turn"] += 1
+        output = [reasoning_item(f"Turn {state['turn']}: deciding on {command}.")]
+        if memory_every and state["turn"] % memory_every == 0:
+            output.append(function_call_item("store_memory", {"key": f"note_{state['turn']}", "value": f"Sent {command}"}))
+        output.append(message_item(f"{message} <command>{command}</command>"))
+        return output
+    return respond
+
+
+def build_response(body: dict, output: list[dict], response_id: str | None = None, cached_chars: int = 0) -> dict:
+    input_chars = len(json.dumps(body.get("input", "")))
+    output_chars = len(json.dumps(output))
+    return {
+        "id": response_id or f"resp_{next(_ids)}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "mock"),
+        "status": "completed",
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": body.get("tool_choice", "auto"),
+        "tools": [],
+        "previous_response_id": body.get("previous_response_id"),
+        "usage": {
+            "input_tokens": input_chars // 4,
+            "input_tokens_details": {"cached_tokens": min(cached_chars, input_chars) // 4},
+            "output_tokens": output_chars // 4,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": (input_chars + output_chars) // 4
+        }
+    }
+
+
+def stream_events(response: dict, chunk_chars: int = 8):
+    """
+    Yield Responses API stream events for a finished response, splitting text into small deltas.
+    """
+    seq = itertools.count()
+    in_progress = dict(response, status="in_progress", output=[])
+    yield {"type": "response.created", "sequence_number": next(seq), "response": in_progress}
+    for index, item in enumerate(response["output"]):
+        if item["type"] == "message":
+            empty = dict(item, status="in_progress", content=[])
+            yield {"type": "response.output_item.added", "sequence_number": next(seq), "output_index": index, "item": empty}
+            text = item["content"][0]["text"]
+            for start in range(0, len(text), chunk_chars):
+                yield {"type": "response.output_text.delta", "sequence_number": next(seq), "output_index": index,
+                       "item_id": item["id"], "content_index": 0, "delta": text[start:start + chunk_chars], "logprobs": []}
+            yield {"type": "response.output_text.done", "sequence_number": next(seq), "output_index": index,
+                   "item_id": item["id"], "content_index": 0, "text": text, "logprobs": []}
+        elif item["type"] == "reasoning":
+            yield {"type": "response.output_item.added", "sequence_number": next(seq), "output_index": index,
+                   "item": dict(item, summary=[])}
+            for summary_index, summary in enumerate(item["summary"]):
+                text = summary["text"]
+                for start in range(0, len(text), chunk_chars):
+                    yield {"type": "response.reasoning_summary_text.delta", "sequence_number": next(seq),
+                           "output_index": index, "item_id": item["id"], "summary_index": summary_index,
+                           "delta": text[start:start + chunk_chars]}
+        elif item["type"] == "function_call":
+            yield {"type": "response.output_item.added", "sequence_number": next(seq), "output_index": index,
+                   "item": dict(item, arguments="", status="in_progress")}
+            yield {"type": "response.function_call_arguments.delta", "sequence_number": next(seq),
+                   "output_index": index, "item_id": item["id"], "delta": item["arguments"]}
+            yield {"type": "response.function_call_arguments.done", "sequence_number": next(seq),
+                   "output_index": index, "item_id": item["id"], "name": item["name"], "arguments": item["arguments"]}
+        yield {"type": "response.output_item.done", "sequence_number": next(seq), "output_index": index, "item": item}
+    yield {"type": "response.completed", "sequence_number": next(seq), "response": response}
+
+
+class MockResponsesServer:
+    """
+    Runs the fake Responses API on a background thread. Use base_url with OpenAI(base_url=...).
+    responder is called with each request body and returns the list of output items to send back.
+    latency is the delay before answering, and delta_delay the delay between streamed events.
+    model_latencies overrides latency per "model" or "model:effort", to imitate faster and slower model tiers.
+    """
+    def __init__(self, responder=None, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 delta_delay: float = 0.0, model_latencies: dict | None = None):
+        self.responder = responder or command_responder(["LOOK"])
+        self.latency = latency
+        self.model_latencies = model_latencies or {}
+        self.delta_delay = delta_delay
+        self.requests = []  # request bodies, in the order they arrived
+        self.request_sizes = []  # raw request body sizes in bytes
+        self.response_ids = set()  # responses that can be chained from with previous_response_id
+        self.cached_items = []  # serialized input items of the last request, to imitate prefix prompt caching
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockResponsesServer':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def get_latency(self, body: dict) -> float:
+        model = body.get("model", "")
+        effort = (body.get("reasoning") or {}).get("effort")
+        return self.model_latencies.get(f"{model}:{effort}", self.model_latencies.get(model, self.latency))
+
+    def get_error(self, body: dict) -> int | None:
+        """
+        An HTTP status to fail the request with instead of answering it, for injecting server errors.
+        """
+        return None
+
+    def cached_prefix_chars(self, body: dict) -> int:
+        """
+        Imitate prompt caching: the input items shared with the start of the previous request count as cached.
+        """
+        items = body.get("input", [])
+        items = [json.dumps(item, sort_keys=True) for item in items] if isinstance(items, list) else [items]
+        cached = 0
+        with self.lock:
+            for old, new in zip(self.cached_items, items):
+                if old != new:
+                    break
+                cached += len(new)
+            self.cached_items = items
+        return cached
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                body = json.loads(raw or b"{}")
+                with mock.lock:
+                    mock.requests.append(body)
+                    mock.request_sizes.append(len(raw))
+                if not self.path.rstrip("/").endswith("/responses"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+                    return
+                previous_id = body.get("previous_response_id")
+                if previous_id and previous_id not in mock.response_ids:
+                    self._send_json(400, {"error": {"message": f"Previous response with id '{previous_id}' not found.",
+                                                    "type": "invalid_request_error", "param": "previous_response_id"}})
+                    return
+                time.sleep(mock.get_latency(body))
+                status = mock.get_error(body)
+                if status:
+                    self._send_json(status, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+                response = build_response(body, mock.responder(body), cached_chars=mock.cached_prefix_chars(body))
+                if body.get("store", True):
+                    with mock.lock:
+                        mock.response_ids.add(response["id"])
+                if body.get("stream"):
+                    self._send_stream(response)
+                else:
+                    if mock.delta_delay:
+                        # a blocking call still has to wait for the whole response to be generated
+                        time.sleep(mock.delta_delay * sum(1 for _ in stream_events(response)))
+                    self._send_json(200, response)
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, response: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for event in stream_events(response):
+                        self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                        self.wfile.flush()
+                        if mock.delta_delay:
+                            time.sleep(mock.delta_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    from simulator import WALKTHROUGH
+    parser = argparse.ArgumentParser(description="Serve a fake Responses API that plays the simulator walkthrough")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    mock = MockResponsesServer(command_responder(WALKTHROUGH, memory_every=3), port=args.port, latency=args.latency)
+    print(f"Mock Responses API listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import re
+import select
+import time
+
+from backends import LIGHTS_TEXT, AsyncGameBackend, GameBackend
+from settle import SettleStats
+from terminal_model import TerminalModel, remove_empty_lines
+from tracing import tracer
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1b\][^\x07]*\x07')
+
+# Helper to read all available output from the process without blocking
+def read_all_available(proc, read_timeout=1, chunk_size=65536, prompt=GameBackend.COMMAND_INPUT_PROMPT):
+    output_lines = []
+    fd = proc.fd
+    while True:
+        rlist, _, _ = select.select([fd], [], [], read_timeout)
+        if not rlist:
+            break  # No data available within the timeout, assume done
+        try:
+            data = proc.read(chunk_size)
+        except Exception:
+            break
+        if not data:
+            break
+        output_lines.append(data.decode(errors="ignore") if isinstance(data, bytes) else data)
+        # the game is waiting for input, no need to wait out the timeout
+        if prompt and strip_ansi(output_lines[-1]).rstrip().endswith(prompt):
+            break
+    return ''.join(output_lines)
+
+# Remove ANSI escape sequences (color, cursor, etc.) and empty lines
+def strip_ansi(text):
+    # Remove lines that are completely empty (only a newline, no whitespace)
+    return remove_empty_lines(ANSI_ESCAPE.sub('', text))
+
+def new_text_after_command(text: str, command: str) -> str:
+    """
+    Trim the echoed command (and anything before it) from freshly read output, like TootsieTerminalWrapper does.
+    """
+    lights_index = text.rfind(LIGHTS_TEXT)
+    command_index = text.find(command) if command else -1
+    if lights_index > command_index:
+        return text[lights_index:].lstrip()
+    if command_index != -1:
+        return text[command_index + len(command):].lstrip()
+    return text
+
+# Start the tootsie.exe process and keep it open for interaction
+class TootsieWrapper(GameBackend):
+    def __init__(self, exe_path: str = "tootsie.exe", cwd: str | None = None):
+        import winpty
+        env = os.environ.copy()
+        env["DOTNET_Console_UseStdoutRedirection"] = "0"
+        if cwd and os.path.exists(exe_path):
+            # the game is next to where we were launched, not in cwd, which only keeps its save files apart
+            exe_path = os.path.abspath(exe_path)
+        self.proc = winpty.PtyProcess.spawn(
+            exe_path,
+            cwd=cwd or os.getcwd(),
+            dimensions=(30, 120),
+            env=env
+        )
+
+    def get_current_screen(self):
+        raw = read_all_available(self.proc)
+        return strip_ansi(raw)
+
+    def send_text(self, text):
+        self.proc.write(text)
+        raw = self.get_current_screen()
+        return raw
+
+    def send_command(self, command):
+        return new_text_after_command(self.send_text(command + "\r\n"), command)
+
+    def send_enter(self):
+        return self.send_text("\r\n")
+
+    def close(self):
+        self.proc.close()
+
+class PtyGameBackend(GameBackend):
+    """
+    Runs a console build of the game (or any stand-in binary) in a native Linux pseudo-terminal.
+    Output is read without blocking into a bounded TerminalModel, and waits end as soon as the prompt shows up.
+    """
+    def __init__(self, command: list[str], cwd: str | None = None, dimensions=(30, 120), chunk_size: int = 65536,
+                 scrollback_chars: int = 1_000_000,
+                 quiet_period: float = 1.0, no_change_period: float = 3.0, timeout: float = 120, env: dict | None = None):
+        import fcntl
+        import pty
+        import struct
+        import subprocess
+        import termios
+        self.chunk_size = chunk_size
+        self.quiet_period = quiet_period
+        self.no_change_period = no_change_period
+        self.timeout = timeout
+        self.terminal = TerminalModel(scrollback_chars)
+        self.eof = False
+        self.bytes_read = 0
+        self.settle_stats = SettleStats()
+        master, slave = pty.openpty()
+        rows, cols = dimensions
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+        proc_env = os.environ.copy() if env is None else env
+        proc_env["DOTNET_Console_UseStdoutRedirection"] = "0"
+        if cwd and os.sep in command[0]:
+            # a relative path to the game (./tootsie) is from where we were launched, not from cwd
+            command = [os.path.abspath(command[0])] + list(command[1:])
+        self.proc = subprocess.Popen(
+            command,
+            cwd=cwd or os.getcwd(),
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            env=proc_env,
+            start_new_session=True,
+            close_fds=True
+        )
+        os.close(slave)
+        self.fd = master
+        os.set_blocking(self.fd, False)
+
+    def _read_into_buffer(self) -> int:
+        # drain everything the pty has for us right now
+        total = 0
+        while True:
+            try:
+                data = os.read(self.fd, self.chunk_size)
+            except BlockingIOError:
+                break
+            except OSError:
+                # EIO means the child closed its side of the pty
+                self.eof = True
+                break
+            if not data:
+                self.eof = True
+                break
+            self.terminal.feed(data)
+            total += len(data)
+        self.bytes_read += total
+        return total
+
+    def _ends_with_prompt(self, start: int) -> bool:
+        return self.terminal.ends_with(self.COMMAND_INPUT_PROMPT, since=start)
+
+    def wait_for_output(self, start: int, label: str | None = None) -> str:
+        """
+        Wait until the game shows the prompt, goes quiet, or exits. Returns the reason it stopped waiting.
+        """
+        start_time = time.monotonic()
+        last_data = start_time
+        while True:
+            reason, wait = self._next_wait(start, start_time, last_data)
+            if reason:
+                break
+            rlist, _, _ = select.select([self.fd], [], [], wait)
+            reason, last_data = self._read_ready(start, bool(rlist), last_data)
+            if reason:
+                break
+        self.settle_stats.record(label, time.monotonic() - start_time, reason)
+        return reason
+
+    def _next_wait(self, start: int, start_time: float, last_data: float) -> tuple[str | None, float]:
+        # why to stop waiting, or how long to wait for more output
+        now = time.monotonic()
+        if now - start_time >= self.timeout:
+            return "timeout", 0.0
+        quiet_needed = self.quiet_period if self.terminal.offset > start else self.no_change_period
+        if now - last_data >= quiet_needed:
+            return "quiet", 0.0
+        return None, min(self.timeout - (now - start_time), quiet_needed - (now - last_data))
+
+    def _read_ready(self, start: int, ready: bool, last_data: float) -> tuple[str | None, float]:
+        # read what the pty has once it is ready; returns why to stop waiting, if it should, and when data last came
+        with tracer.span("pty.read"):
+            read = ready and self._read_into_buffer()
+        if read:
+            last_data = time.monotonic()
+            if self._ends_with_prompt(start):
+                return "marker", last_data
+        if self.eof:
+            return "eof", last_data
+        return None, last_data
+
+    def get_current_screen(self) -> str:
+        start = self.terminal.consumed
+        self._read_into_buffer()
+        if not self._ends_with_prompt(start):
+            self.wait_for_output(start)
+        return self.terminal.consume()
+
+    def send_text(self, text: str, label: str | None = None) -> str:
+        self._read_into_buffer()
+        start = self.terminal.offset
+        os.write(self.fd, text.encode())
+        self.wait_for_output(start, label=label)
+        return self.terminal.consume()
+
+    def send_command(self, command: str) -> str:
+        return new_text_after_command(self.send_text(command + "\r", label=command), command)
+
+    def send_enter(self) -> str:
+        return self.send_text("\r", label="<enter>")
+
+    def close(self):
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=5)
+        except Exception as e:
+            print(f"Failed to stop game process: {e}")
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class AsyncPtyBackend(AsyncGameBackend):
+    """
+    PtyGameBackend for the async engine. Waiting for output doesn't take a thread: the event loop watches the pty
+    and wakes the wait once it is readable, so many games can wait at once on one thread.
+    Takes the same arguments as PtyGameBackend.
+    """
+    def __init__(self, *args, **kwargs):
+        self.backend = PtyGameBackend(*args, **kwargs)
+        self.settle_stats = self.backend.settle_stats
+
+    async def wait_for_output(self, start: int, label: str | None = None) -> str:
+        pty = self.backend
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(pty.fd, readable.set)
+        try:
+            start_time = time.monotonic()
+            last_data = start_time
+            while True:
+                reason, wait = pty._next_wait(start, start_time, last_data)
+                if reason:
+                    break
+                readable.clear()
+                try:
+                    await asyncio.wait_for(readable.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                reason, last_data = pty._read_ready(start, readable.is_set(), last_data)
+                if reason:
+                    break
+        finally:
+            loop.remove_reader(pty.fd)
+        self.settle_stats.record(label, time.monotonic() - start_time, reason)
+        return reason
+
+    async def get_current_screen(self) -> str:
+        pty = self.backend
+        start = pty.terminal.consumed
+        pty._read_into_buffer()
+        if not pty._ends_with_prompt(start):
+            await self.wait_for_output(start)
+        return pty.terminal.consume()
+
+    async def send_text(self, text: str, label: str | None = None) -> str:
+        pty = self.backend
+        pty._read_into_buffer()
+        start = pty.terminal.offset
+        os.write(pty.fd, text.encode())
+        await self.wait_for_output(start, label=label)
+        return pty.terminal.consume()
+
+    async def send_command(self, command: str) -> str:
+        return new_text_after_command(await self.send_text(command + "\r", label=command), command)
+
+    async def send_enter(self) -> str:
+        return await self.send_text("\r", label="<enter>")
+
+    async def run_sync(self, function, *args):
+        # the event loop stops watching the pty between waits, so a blocking function can read it meanwhile
+        return await asyncio.to_thread(function, *args)
+
+    async def close(self):
+        await asyncio.to_thread(self.backend.close)
@@ -0,0 +1,322 @@
+"""
+Record and replay sessions. The recorder writes an append-only JSONL log of every screen, command, request and response.
+The response cache answers model requests from a content-addressed store keyed by a hash of the normalized request,
+so a recorded session can be replayed offline at full speed to regression test response handling and screen parsing.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from openai.types.responses import (Response, ResponseCompletedEvent, ResponseOutputItemAddedEvent,
+                                    ResponseOutputItemDoneEvent, ResponseReasoningSummaryTextDeltaEvent,
+                                    ResponseTextDeltaEvent)
+
+from backends import GameBackend
+
+# request arguments that don't change what the model answers
+IGNORED_ARGUMENTS = ("timeout", "stream")
+
+
+class ReplayMiss(Exception):
+    """
+    Raised in replay mode when a request isn't in the cache, meaning the replay has diverged from the recording.
+    """
+
+
+def to_json(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_unset=True)
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    return value
+
+
+def normalize_request(arguments: dict) -> dict:
+    return {key: to_json(value) for key, value in arguments.items() if key not in IGNORED_ARGUMENTS and value is not None}
+
+
+def request_key(arguments: dict) -> str:
+    normalized = json.dumps(normalize_request(arguments), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class SessionRecorder:
+    """
+    Appends one JSON object per line: screens, commands, and model requests with their responses.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.turn = 0
+        self.last_input = []  # input of the last recorded request
+        self.recorded_keys = set()
+
+    def write(self, record: dict):
+        record["time"] = time.time()
+        line = json.dumps(record, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def record_screen(self, text: str):
+        self.write({"type": "screen", "turn": self.turn, "text": text})
+
+    def record_command(self, command: str):
+        self.turn += 1
+        self.write({"type": "command", "turn": self.turn, "command": command})
+
+    def record_response(self, key: str, arguments: dict, response: Response):
+        """
+        Each request shares most of its input with the one before it, so only the input after the shared part is
+        written: the full input is the first input_shared items of the previous request's input, then input.
+        A hedged duplicate of a request that was already recorded is skipped.
+        """
+        request = normalize_request(arguments)
+        new_input = request.get("input")
+        with self.lock:
+            if key in self.recorded_keys:
+                return
+            self.recorded_keys.add(key)
+            if isinstance(new_input, list):
+                shared = 0
+                for previous, item in zip(self.last_input, new_input):
+                    if previous != item:
+                        break
+                    shared += 1
+                self.last_input = new_input
+                request = dict(request, input=new_input[shared:], input_shared=shared)
+        self.write({"type": "response", "turn": self.turn, "key": key, "request": request,
+                    "response": to_json(response)})
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_log(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ResponseCache:
+    """
+    Content-addressed response store, keyed by request_key. With a directory, entries are kept on disk
+    and the least recently used are evicted once max_bytes is exceeded. Without one it only lives in memory.
+    """
+    def __init__(self, directory: str | None = None, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = {}
+        self.index = {}  # key -> (size, last used), for the files on disk
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(directory, name))
+                    self.index[name[:-5]] = (stat.st_size, stat.st_mtime)
+                    self.total_bytes += stat.st_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            value = self.memory.get(key)
+            if value is None and key in self.index:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                self.index[key] = (self.index[key][0], time.time())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: dict):
+        with self.lock:
+            if not self.directory:
+                self.memory[key] = value
+                return
+            data = json.dumps(value, separators=(",", ":"))
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                f.write(data)
+            if key in self.index:
+                self.total_bytes -= self.index[key][0]
+            self.index[key] = (len(data), time.time())
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self.index.items(), key=lambda entry: entry[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self.index[key]
+            self.total_bytes -= size
+
+    def load_log(self, path: str) -> int:
+        """
+        Fill the cache with every response from a session log. Returns the number of responses loaded.
+        """
+        count = 0
+        for record in read_log(path):
+            if record["type"] == "response":
+                self.put(record["key"], record["response"])
+                count += 1
+        return count
+
+
+def replay_events(response: Response):
+    """
+    Stream events for a cached response, with enough detail for AssistantPlayer.get_response_streaming.
+    """
+    sequence = 0
+    for index, item in enumerate(response.output):
+        if item.type == "function_call":
+            yield ResponseOutputItemAddedEvent.construct(type="response.output_item.added", item=item, output_index=index, sequence_number=sequence)
+        elif item.type == "reasoning":
+            text = '\n'.join(summary.text for summary in item.summary)
+            yield ResponseReasoningSummaryTextDeltaEvent.construct(type="response.reasoning_summary_text.delta", delta=text,
+                                                                    item_id=item.id, output_index=index, summary_index=0, sequence_number=sequence)
+        elif item.type == "message":
+            text = ''.join(getattr(part, "text", '') for part in item.content)
+            yield ResponseTextDeltaEvent.construct(type="response.output_text.delta", delta=text, item_id=item.id,
+                                                   output_index=index, content_index=0, sequence_number=sequence)
+        yield ResponseOutputItemDoneEvent.construct(type="response.output_item.done", item=item, output_index=index, sequence_number=sequence)
+        sequence += 1
+    yield ResponseCompletedEvent.construct(type="response.completed", response=response, sequence_number=sequence)
+
+
+class CachingResponses:
+    """
+    Stands in for client.responses: answers from the cache when it can, otherwise calls the real API
+    (or raises ReplayMiss when replaying) and stores the result. Without a cache it only records.
+    """
+    def __init__(self, responses, cache: ResponseCache | None, recorder: SessionRecorder | None = None, replay: bool = False):
+        self.responses = responses
+        self.cache = cache
+        self.recorder = recorder
+        self.replay = replay
+
+    def create(self, **arguments):
+        key = request_key(arguments)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            response = Response.construct(**cached)
+        elif self.replay:
+            raise ReplayMiss(f"No recorded response for request {key[:12]}")
+        elif arguments.get("stream"):
+            return self._record_stream(key, arguments)
+        else:
+            response = self.responses.create(**arguments)
+            self._store(key, arguments, response)
+        if arguments.get("stream"):
+            return replay_events(response)
+        return response
+
+    def _store(self, key: str, arguments: dict, response: Response):
+        if self.cache:
+            self.cache.put(key, to_json(response))
+        if self.recorder:
+            self.recorder.record_response(key, arguments, response)
+
+    def _record_stream(self, key: str, arguments: dict):
+        for event in self.responses.create(**arguments):
+            if event.type == "response.completed":
+                self._store(key, arguments, event.response)
+            yield event
+
+
+class CachingClient:
+    """
+    Wraps an OpenAI client so that responses go through a ResponseCache, and are recorded if given a recorder.
+    """
+    def __init__(self, client, cache: ResponseCache | None, recorder: SessionRecorder | None = None, replay: bool = False):
+        self.client = client
+        self.responses = CachingResponses(client.responses, cache, recorder, replay)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class RecordingBackend(GameBackend):
+    """
+    Passes everything through to another backend, logging each command and the screen it produced.
+    """
+    def __init__(self, game: GameBackend, recorder: SessionRecorder):
+        self.game = game
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self.game, name)
+
+    def get_current_screen(self) -> str:
+        text = self.game.get_current_screen()
+        self.recorder.record_screen(text)
+        return text
+
+    def send_command(self, command: str) -> str:
+        self.recorder.record_command(command)
+        text = self.game.send_command(command)
+        self.recorder.record_screen(text)
+        return text
+
+    def send_enter(self) -> str:
+        self.recorder.record_command('')
+        text = self.game.send_enter()
+        self.recorder.record_screen(text)
+        return text
+
+    def close(self):
+        self.game.close()
+
+
+class ReplayGame(GameBackend):
+    """
+    Plays back the screens from a session log. Commands that differ from the recording are counted as divergences,
+    and the recorded screen is returned anyway so the replay can carry on.
+    """
+    def __init__(self, path: str):
+        self.steps = []  # (command, screen), the first command is None for the opening screen
+        command = None
+        for record in read_log(path):
+            if record["type"] == "command":
+                command = record["command"]
+            elif record["type"] == "screen":
+                self.steps.append((command, record["text"]))
+        self.position = 0
+        self.divergences = []
+
+    def _next(self, command: str | None) -> str:
+        if self.position >= len(self.steps):
+            return "Bye! (end of recording)"
+        expected, screen = self.steps[self.position]
+        if expected != command:
+            self.divergences.append((self.position, expected, command))
+        self.position += 1
+        return screen
+
+    def get_current_screen(self) -> str:
+        return self._next(None)
+
+    def send_command(self, command: str) -> str:
+        return self._next(command)
+
+    def send_enter(self) -> str:
+        return self._next('')
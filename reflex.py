@@ -0,0 +1,69 @@
+"""
+Answers trivial screens locally instead of asking the model: press enter screens, the light switch click, tutorial
+pages, and a screen repeating itself without asking for a command. All of these are answered with Enter.
+A screen that ends with the command prompt always goes to the model.
+"""
+import re
+
+from backends import LIGHTS_TEXT, GameBackend
+
+# (rule name, pattern) pairs, checked in order; the first match answers the screen
+RULES = [
+    ("tutorial", re.compile(r"TUTORIAL.*Press enter to continue\.*\s*\Z", re.IGNORECASE | re.DOTALL)),
+    ("lights", re.compile(re.escape(LIGHTS_TEXT))),
+    ("press_enter", re.compile(r"Press enter to continue\.*\s*\Z", re.IGNORECASE)),
+]
+
+
+class ReflexStats:
+    """
+    Counts the turns answered without the model, and estimates the model latency and tokens that saved.
+    """
+    def __init__(self):
+        self.skipped = 0
+        self.rules = {}
+        self.seconds_saved = 0.0
+        self.tokens_saved = 0
+
+    def record(self, rule: str, seconds_saved: float, tokens_saved: int):
+        self.skipped += 1
+        self.rules[rule] = self.rules.get(rule, 0) + 1
+        self.seconds_saved += seconds_saved
+        self.tokens_saved += tokens_saved
+
+    def summary(self) -> str:
+        return (f"skipped turns: {self.skipped}, est. time saved: {self.seconds_saved:.1f}s, "
+                f"est. tokens saved: {self.tokens_saved}, rules: {self.rules}")
+
+
+class Reflex:
+    """
+    Decides whether a screen can be answered locally. At most max_in_a_row screens are answered in a row,
+    after that the model gets the next one, in case the game is stuck on something the rules don't understand.
+    """
+    def __init__(self, rules=RULES, prompt: str = GameBackend.COMMAND_INPUT_PROMPT, max_in_a_row: int = 5):
+        self.rules = rules
+        self.prompt = prompt
+        self.max_in_a_row = max_in_a_row
+        self.in_a_row = 0
+        self.last_screen = None
+        self.stats = ReflexStats()
+
+    def match(self, game_text: str) -> str | None:
+        """
+        Returns the name of the rule answering this screen with Enter, or None if the model should answer it.
+        """
+        screen = game_text.rstrip()
+        repeated = screen == self.last_screen
+        self.last_screen = screen
+        rule = None
+        if screen and not screen.endswith(self.prompt) and self.in_a_row < self.max_in_a_row:
+            for name, pattern in self.rules:
+                if pattern.search(screen):
+                    rule = name
+                    break
+            else:
+                if repeated:
+                    rule = "repeated"
+        self.in_a_row = self.in_a_row + 1 if rule else 0
+        return rule
@@ -0,0 +1,312 @@
+"""
+Sends model requests with timeouts learned from recent latencies, hedging and bounded retries.
+Every request kind (a model and reasoning effort, or summaries) keeps a rolling window of how long its requests took.
+A request gets a timeout of a few times that window's p99, instead of one fixed timeout for everything. If it is
+still running past the window's hedge percentile, the same request is sent again and whichever answers first is used.
+Failed requests are retried with jittered backoff, and retries and hedges both spend from a budget that only refills
+as requests are made, so an outage can't turn into a flood of duplicate requests.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import (APIConnectionError, APITimeoutError, DefaultAsyncHttpxClient, DefaultHttpxClient,
+                    InternalServerError, RateLimitError)
+
+from tracing import percentile
+
+# errors worth trying again; anything else (such as a bad request) is raised right away
+RETRYABLE = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+_async_http_clients = weakref.WeakKeyDictionary()  # event loop -> its pooled client
+
+
+def shared_http_client():
+    """
+    One pooled HTTP client for every OpenAI client in the process, so the player, its summaries and hedged
+    duplicates reuse open connections instead of each opening their own.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = DefaultHttpxClient()
+        return _http_client
+
+
+def shared_async_http_client():
+    """
+    shared_http_client for the async client. Async connections belong to the event loop that opened them, so there
+    is one client per running loop, shared by every game played on it.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = _async_http_clients[loop] = DefaultAsyncHttpxClient()
+    return client
+
+
+async def close_async_http_client():
+    """
+    Close the running loop's shared client, before the loop itself is closed.
+    """
+    client = _async_http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, pct: float) -> float:
+        with self.lock:
+            samples = list(self.samples)
+        return percentile(samples, pct)
+
+
+class RetryBudget:
+    """
+    Every request deposits ratio of a token, up to max_tokens, and every retry or hedge spends a whole one.
+    So retries and hedges add at most about ratio extra requests once the initial tokens are used up.
+    """
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class ExecutorStats:
+    """
+    The game loop, a background summary and their hedges count at the same time, so counting goes through add.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.failures = 0
+        self.out_of_budget = 0
+
+    def add(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def summary(self) -> str:
+        return (f"requests: {self.requests}, hedges: {self.hedges} ({self.hedge_wins} won), retries: {self.retries}, "
+                f"failed attempts: {self.failures}, out of budget: {self.out_of_budget}")
+
+
+class RequestExecutor:
+    """
+    call(key, send, default_timeout) runs send(timeout) and returns its result. Until a key has min_samples
+    latencies, its requests use default_timeout and are not hedged. After that the timeout is timeout_factor times
+    the p99 (between min_timeout and default_timeout), and a hedge is sent once the first request runs past the
+    hedge_percentile latency. Python can't interrupt a blocking request on another thread, so the slower of two
+    hedged requests is left to finish (or time out) on its own, and a stream it returns is closed unread.
+    call_async does the same for coroutines, sharing the windows, budget and stats, and cancels the slower request.
+    A stream returns once its headers arrive, long before it has been read, so with stream=True a request gets
+    default_timeout, isn't hedged and leaves the window alone.
+    """
+    def __init__(self, hedge_percentile: float = 90, timeout_percentile: float = 99, timeout_factor: float = 3.0,
+                 min_timeout: float = 5.0, min_samples: int = 20, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, budget: RetryBudget | None = None, window: int = 200, max_workers: int = 8):
+        self.hedge_percentile = hedge_percentile
+        self.timeout_percentile = timeout_percentile
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.window = window
+        self.latencies = {}  # key -> LatencyWindow
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="request")
+        self.stats = ExecutorStats()
+
+    def latency_window(self, key: str) -> LatencyWindow:
+        with self.lock:
+            if key not in self.latencies:
+                self.latencies[key] = LatencyWindow(self.window)
+            return self.latencies[key]
+
+    def timeout_for(self, key: str, default_timeout: float) -> float:
+        window = self.latency_window(key)
+        if len(window) < self.min_samples:
+            return default_timeout
+        learned = window.percentile(self.timeout_percentile) * self.timeout_factor
+        return min(default_timeout, max(self.min_timeout, learned))
+
+    def hedge_delay(self, key: str) -> float | None:
+        window = self.latency_window(key)
+        if len(window) < self.min_samples:
+            return None
+        return window.percentile(self.hedge_percentile)
+
+    def call(self, key: str, send, default_timeout: float, hedge: bool = True, max_attempts: int | None = None,
+             stream: bool = False):
+        """
+        Send a request, hedging it and retrying it as needed. Raises the last error once the attempts or the budget
+        run out.
+        """
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            timeout = default_timeout if stream else self.timeout_for(key, default_timeout)
+            try:
+                return self._race(key, send, timeout, hedge and not stream, record=not stream)
+            except RETRYABLE as e:
+                delay = self._retry_delay(e, attempt, attempts)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(self, key: str, send, default_timeout: float, hedge: bool = True,
+                         max_attempts: int | None = None):
+        """
+        call, where send(timeout) returns an awaitable. Cancelling it cancels the requests in flight.
+        """
+        attempts = max_attempts or self.max_attempts
+        for attempt in range(attempts):
+            try:
+                return await self._race_async(key, send, self.timeout_for(key, default_timeout), hedge)
+            except RETRYABLE as e:
+                delay = self._retry_delay(e, attempt, attempts)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int, attempts: int) -> float | None:
+        # counts a failed attempt, returns how long to wait before retrying it or None to give up
+        self.stats.add("failures")
+        if attempt == attempts - 1:
+            return None
+        if not self.budget.spend():
+            self.stats.add("out_of_budget")
+            return None
+        self.stats.add("retries")
+        # full jitter, so requests that failed together don't retry together
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        print(f"Request failed ({type(error).__name__}: {error}), retrying in {delay:.1f}s")
+        return delay
+
+    def _attempt(self, key: str, send, timeout: float, record: bool = True):
+        start = time.monotonic()
+        try:
+            result = send(timeout)
+        except APITimeoutError:
+            # a timeout is a latency of at least the timeout, leaving it out would make the next timeouts shorter
+            if record:
+                self.latency_window(key).add(time.monotonic() - start)
+            raise
+        # losing hedges are recorded too, so the window keeps seeing the slow tail
+        if record:
+            self.latency_window(key).add(time.monotonic() - start)
+        return result
+
+    def _race(self, key: str, send, timeout: float, hedge: bool, record: bool = True):
+        self.stats.add("requests")
+        self.budget.deposit()
+        futures = [self.pool.submit(self._attempt, key, send, timeout, record)]
+        delay = self.hedge_delay(key) if hedge else None
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                if self.budget.spend():
+                    self.stats.add("hedges")
+                    futures.append(self.pool.submit(self._attempt, key, send, timeout, record))
+                else:
+                    self.stats.add("out_of_budget")
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is not futures[0]:
+                    self.stats.add("hedge_wins")
+                for loser in pending:
+                    if not loser.cancel():
+                        loser.add_done_callback(_discard)
+                return future.result()
+        raise error
+
+    async def _attempt_async(self, key: str, send, timeout: float):
+        start = time.monotonic()
+        try:
+            result = await send(timeout)
+        except (APITimeoutError, asyncio.CancelledError):
+            # a cancelled hedge took at least this long, like a timeout
+            self.latency_window(key).add(time.monotonic() - start)
+            raise
+        self.latency_window(key).add(time.monotonic() - start)
+        return result
+
+    async def _race_async(self, key: str, send, timeout: float, hedge: bool):
+        self.stats.add("requests")
+        self.budget.deposit()
+        tasks = [asyncio.ensure_future(self._attempt_async(key, send, timeout))]
+        try:
+            delay = self.hedge_delay(key) if hedge else None
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self.budget.spend():
+                        self.stats.add("hedges")
+                        tasks.append(asyncio.ensure_future(self._attempt_async(key, send, timeout)))
+                    else:
+                        self.stats.add("out_of_budget")
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not tasks[0]:
+                        self.stats.add("hedge_wins")
+                    return task.result()
+            raise error
+        finally:
+            # the loser, or every request if the caller was cancelled
+            for task in tasks:
+                task.cancel()
+
+
+def _discard(future):
+    # close a stream nobody is going to read, so its connection goes back to the pool
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), "close", None)
+    if close is not None:
+        close()
@@ -0,0 +1,182 @@
+"""
+Picks the model and reasoning effort for each turn. Most turns are routine (walking between rooms, licking, pressing
+on), so they go to a fast tier; new text goes to the standard tier, and the strong tier is only used once the game
+stops making progress: the same screens or commands coming back, the game rejecting commands, or nothing new for
+a while. After a few turns of progress the router steps back down. Every signal is local and cheap.
+Switching models starts a new prompt cache, so the router holds a tier for a few turns rather than flapping.
+"""
+import re
+from collections import deque
+
+from compressor import fingerprint
+from screen_parser import CombatEnded, ItemAcquired, RoomEntered, ScreenParser
+
+# what the game says when it can't do what was asked
+INVALID_COMMAND = re.compile(r"I don't understand|There is no|You can't|You don't have|nothing here to", re.IGNORECASE)
+# commands that are expected to repeat
+ROUTINE_COMMANDS = ("", "LICK", "LICK_LOOP")
+
+
+class Tier:
+    """
+    A model and reasoning effort. effort is None for models without reasoning.
+    """
+    def __init__(self, name: str, model: str, effort: str | None):
+        self.name = name
+        self.model = model
+        self.effort = effort
+
+    def __repr__(self):
+        return f"Tier({self.name!r}, {self.model!r}, {self.effort!r})"
+
+
+DEFAULT_TIERS = [Tier("fast", "o4-mini", "low"), Tier("standard", "o4-mini", "medium"), Tier("strong", "o3", "high")]
+
+
+def parse_tiers(spec: str) -> list[Tier]:
+    """
+    Tiers from "model:effort,model:effort,...", fastest first, such as "o4-mini:low,o4-mini:medium,o3:high".
+    """
+    names = ["fast", "standard", "strong"]
+    tiers = []
+    for index, part in enumerate(spec.split(",")):
+        model, _, effort = part.strip().partition(":")
+        tiers.append(Tier(names[index] if index < len(names) else f"tier{index}", model, effort or None))
+    return tiers
+
+
+class TierStats:
+    def __init__(self):
+        self.turns = 0
+        self.seconds = 0.0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.seconds / self.turns if self.turns else 0.0
+
+
+class RouterStats:
+    """
+    Turns, latency and tokens per tier, and how often the router moved between tiers.
+    """
+    def __init__(self, tiers: list[Tier]):
+        self.tiers = {tier.name: TierStats() for tier in tiers}
+        self.escalations = 0
+        self.deescalations = 0
+        self.reasons = {}  # why the router escalated -> count
+
+    def record(self, tier: Tier, seconds: float, input_tokens: int, cached_input_tokens: int, output_tokens: int):
+        stats = self.tiers[tier.name]
+        stats.turns += 1
+        stats.seconds += seconds
+        stats.input_tokens += input_tokens
+        stats.cached_input_tokens += cached_input_tokens
+        stats.output_tokens += output_tokens
+
+    def summary(self) -> str:
+        parts = [f"{name}: {stats.turns} turns, {stats.mean_latency:.2f}s mean, "
+                 f"{stats.input_tokens} in ({stats.cached_input_tokens} cached) / {stats.output_tokens} out"
+                 for name, stats in self.tiers.items()]
+        return (f"{'; '.join(parts)}; escalations: {self.escalations}, de-escalations: {self.deescalations}, "
+                f"reasons: {self.reasons}")
+
+
+class ModelRouter:
+    """
+    Call choose with each screen before asking the model, and observe_command with the command it answered.
+    A screen counts as progress if at least novelty_threshold of its lines are new, or it enters a room, gets an
+    item or wins a combat. A turn without progress adds to the stall count, and an invalid command, a screen seen
+    in the last loop_window screens, or the same command sent loop_window times in a row add one more.
+    Once the stall count reaches escalate_after the router moves up a tier, and after deescalate_after turns of
+    progress it moves back down. New text outside combat gets at least the standard tier.
+    On its own the router parses each screen it is given. A game loop that already parses everything the game prints
+    shares its parser with use_parser and passes on the events through observe, so no screen is parsed twice.
+    """
+    def __init__(self, tiers: list[Tier] = None, novelty_threshold: float = 0.5, escalate_after: int = 4,
+                 deescalate_after: int = 3, loop_window: int = 4):
+        self.tiers = tiers or DEFAULT_TIERS
+        self.novelty_threshold = novelty_threshold
+        self.escalate_after = escalate_after
+        self.deescalate_after = deescalate_after
+        self.loop_window = loop_window
+        self.parser = ScreenParser()
+        self.shared_parser = False
+        self.events = []  # events observed since the last choice, with a shared parser
+        self.seen_lines = set()
+        self.recent_screens = deque(maxlen=loop_window)
+        self.recent_commands = deque(maxlen=loop_window)
+        self.level = 0  # how far the stalls have pushed the router up
+        self.stalled = 0
+        self.progress_streak = 0
+        self.signals = {}  # the signals behind the last choice, for display
+        self.stats = RouterStats(self.tiers)
+
+    def novelty(self, screen: str) -> float:
+        prints = [fingerprint(line) for line in screen.split("\n") if line.strip()]
+        if not prints:
+            return 0.0
+        new = sum(1 for line in prints if line not in self.seen_lines)
+        self.seen_lines.update(prints)
+        return new / len(prints)
+
+    def use_parser(self, parser: ScreenParser):
+        self.parser = parser
+        self.shared_parser = True
+
+    def observe(self, events: list):
+        self.events.extend(events)
+
+    def choose(self, screen: str) -> Tier:
+        if self.shared_parser:
+            # whatever the game printed since the last choice, including turns answered without the model
+            events, self.events = self.events, []
+        else:
+            events = list(self.parser.parse(screen))
+        novelty = self.novelty(screen)
+        screen_print = fingerprint(screen)
+        repeated_screen = screen_print in self.recent_screens
+        self.recent_screens.append(screen_print)
+        looping = (len(self.recent_commands) == self.loop_window and len(set(self.recent_commands)) == 1
+                   and self.recent_commands[0] not in ROUTINE_COMMANDS)
+        invalid = bool(INVALID_COMMAND.search(screen))
+        progress = novelty >= self.novelty_threshold or any(
+            isinstance(event, (RoomEntered, ItemAcquired)) or
+            (isinstance(event, CombatEnded) and event.reason == "defeated") for event in events)
+        reasons = [name for name, signal in (("invalid", invalid), ("repeated_screen", repeated_screen),
+                                             ("looping", looping)) if signal]
+        if progress and not reasons:
+            self.stalled = 0
+            self.progress_streak += 1
+            if self.level and self.progress_streak >= self.deescalate_after:
+                self.level -= 1
+                self.progress_streak = 0
+                self.stats.deescalations += 1
+        else:
+            self.progress_streak = 0
+            self.stalled += 1 + len(reasons)
+            if self.stalled >= self.escalate_after:
+                self.stalled = 0
+                if self.level < len(self.tiers) - 1:
+                    self.level += 1
+                    self.stats.escalations += 1
+                    for reason in reasons or ["no_progress"]:
+                        self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+        # licking through a combat is routine, anything else new deserves a closer look
+        floor = 1 if novelty >= self.novelty_threshold and not self.parser.in_combat else 0
+        tier = self.tiers[min(len(self.tiers) - 1, max(self.level, floor))]
+        self.signals = {"novelty": novelty, "combat": self.parser.in_combat, "stalled": self.stalled,
+                        "reasons": reasons, "tier": tier.name}
+        return tier
+
+    def observe_command(self, command: str | None):
+        self.recent_commands.append((command or "").strip().upper())
+
+    def record(self, tier: Tier, seconds: float, usage):
+        if usage is None:
+            self.stats.record(tier, seconds, 0, 0, 0)
+            return
+        cached = usage.input_tokens_details.cached_tokens if usage.input_tokens_details else 0
+        self.stats.record(tier, seconds, usage.input_tokens, cached, usage.output_tokens)
@@ -1,69 +1,20 @@
+import argparse
 import os
-import winpty
-import select
-import re
 import tkinter as tk
 from tkinter.scrolledtext import ScrolledText
 import threading
 
 from assistant import AssistantPlayer
-from terminal_wrapper import TootsieTerminalWrapper
-
-# Helper to read all available output from the process without blocking
-def read_all_available(proc, read_timeout=1):
-    output_lines = []
-    fd = proc.fd
-    while True:
-        rlist, _, _ = select.select([fd], [], [], read_timeout)
-        if not rlist:
-            break  # No data available within the timeout, assume done
-        try:
-            data = proc.read(1024)
-        except Exception:
-            break
-        if not data:
-            break
-        output_lines.append(data.decode(errors="ignore") if isinstance(data, bytes) else data)
-    return ''.join(output_lines)
-
-# Remove ANSI escape sequences (color, cursor, etc.) and empty lines
-def strip_ansi(text):
-    ansi_escape = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1b\][^\x07]*\x07')
-    no_ansi = ansi_escape.sub('', text)
-    # Remove lines that are completely empty (only a newline, no whitespace)
-    lines = no_ansi.splitlines()
-    filtered = [line for line in lines if line.strip() != '']
-    return '\n'.join(filtered)
-
-# Start the tootsie.exe process and keep it open for interaction
-class TootsieWrapper:
-    def __init__(self):
-        env = os.environ.copy()
-        env["DOTNET_Console_UseStdoutRedirection"] = "0"
-        self.proc = winpty.PtyProcess.spawn(
-            "tootsie.exe",
-            cwd=os.getcwd(),
-            dimensions=(30, 120),
-            env=env
-        )
-
-    def get_current_screen(self):
-        raw = read_all_available(self.proc)
-        return strip_ansi(raw)
-
-    def send_text(self, text):
-        self.proc.write(text)
-        raw = self.get_current_screen()
-        return raw
-    
-    def send_command(self, command):
-        return self.send_text(command + "\r\n")
-
-    def close(self):
-        self.proc.close()
+from async_engine import AsyncGameLoop, EngineThread
+from backends import create_async_backend, create_backend
+from game_loop import GameLoop
+from journal import Journal
+from recorder import CachingClient, RecordingBackend, ReplayGame, ResponseCache, SessionRecorder
+from router import ModelRouter, parse_tiers
+from tracing import tracer
 
 class TootsieGUI:
-    def __init__(self, root):
+    def __init__(self, root, max_fps=30):
         self.root = root
         self.root.title("TootsiePopper")
         # Make window larger
@@ -102,14 +53,62 @@ class TootsieGUI:
         self.token_var = tk.StringVar()
         self.token_label = tk.Label(root, textvariable=self.token_var, anchor="e", fg="#555")
         self.token_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0,10))
+        # Turns answered without the model
+        self.reflex_var = tk.StringVar()
+        self.reflex_label = tk.Label(root, textvariable=self.reflex_var, anchor="e", fg="#555")
+        self.reflex_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0,2))
+        # Room, tool belt, pop and sugar, as parsed from the game's output
+        self.state_var = tk.StringVar()
+        self.state_label = tk.Label(root, textvariable=self.state_var, anchor="w", fg="#555")
+        self.state_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0,2))
+        # Rolling stage latencies, only shown while tracing
+        self.trace_var = tk.StringVar()
+        self.trace_label = tk.Label(root, textvariable=self.trace_var, anchor="w", justify=tk.LEFT, fg="#555", font=("Courier", 9))
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.engine = None  # the EngineThread playing the game, stopped before the window closes
+        # updates posted by the game thread, drawn by render on the Tk thread
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.frame_ms = max(1, int(1000 / max_fps))
+        self.shown = {}  # text widget -> the text it shows
+        self.shown_memory = []  # the memory lines shown
+        self.root.after(self.frame_ms, self.render)
+
+    # The game loop runs on another thread, so these methods only post the latest value for each part of the window.
+    # render() applies them from the Tk thread at most max_fps times a second, and only the last value posted
+    # for each part in between is drawn.
+
+    def post(self, name, *args):
+        with self.pending_lock:
+            self.pending[name] = args
+
+    def render(self):
+        self.root.after(self.frame_ms, self.render)
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        for name, args in pending.items():
+            getattr(self, "render_" + name)(*args)
+
+    def set_text(self, widget, text):
+        # only redraw what changed: append when the new text extends the shown text, otherwise replace it
+        shown = self.shown.get(widget, '')
+        if text == shown:
+            return
+        widget.config(state=tk.NORMAL)
+        if text.startswith(shown):
+            widget.insert(tk.END, text[len(shown):])
+        else:
+            widget.delete(1.0, tk.END)
+            widget.insert(tk.END, text)
+        widget.config(state=tk.DISABLED)
+        self.shown[widget] = text
 
     def update_output(self, text):
-        self.text_area.config(state=tk.NORMAL)
-        self.text_area.delete(1.0, tk.END)
-        self.text_area.insert(tk.END, text + '\n')
+        self.post("output", text)
+
+    def render_output(self, text):
+        self.set_text(self.text_area, text + '\n')
         self.text_area.see(tk.END)
-        self.text_area.config(state=tk.DISABLED)
 
     def set_last_command(self, cmd):
         cmd = cmd.strip()
@@ -118,125 +117,244 @@ class TootsieGUI:
         self.set_status(f"Sent command: {cmd}")
 
     def set_status(self, text):
-        self.status_var.set(text)
+        self.post("status", text)
 
     def reset_status(self):
-        self.status_var.set("")
+        self.post("status", "")
+
+    def render_status(self, text):
+        self.status_var.set(text)
 
     def set_llm_message(self, message):
-        self.llm_message.config(state=tk.NORMAL)
-        self.llm_message.delete(1.0, tk.END)
-        self.llm_message.insert(tk.END, message)
-        self.llm_message.config(state=tk.DISABLED)
+        self.post("message", message)
+
+    def render_message(self, message):
+        self.set_text(self.llm_message, message)
 
     def set_reasoning(self, reasoning):
-        self.llm_reasoning.config(state=tk.NORMAL)
-        self.llm_reasoning.delete(1.0, tk.END)
-        self.llm_reasoning.insert(tk.END, reasoning)
-        self.llm_reasoning.config(state=tk.DISABLED)
+        self.post("reasoning", reasoning)
+
+    def render_reasoning(self, reasoning):
+        self.set_text(self.llm_reasoning, reasoning)
 
     def set_memory(self, memory_dict):
+        # copy it, the game thread keeps changing the dict
+        self.post("memory", list(memory_dict.items()))
+
+    def render_memory(self, items):
+        # keep the lines before the first changed memory, usually a new memory is just appended at the end
+        lines = [f"{k}: {v}\n" for k, v in items]
+        shown = self.shown_memory
+        same = 0
+        while same < len(lines) and same < len(shown) and lines[same] == shown[same]:
+            same += 1
+        if same == len(lines) == len(shown):
+            return
         self.memory_area.config(state=tk.NORMAL)
-        self.memory_area.delete(1.0, tk.END)
-        for k, v in memory_dict.items():
-            self.memory_area.insert(tk.END, f"{k}: {v}\n")
+        # a value can span several lines, so count the text lines the kept memories take up
+        kept_lines = sum(line.count("\n") for line in lines[:same])
+        self.memory_area.delete(f"{kept_lines + 1}.0", tk.END)
+        self.memory_area.insert(tk.END, "".join(lines[same:]))
         self.memory_area.config(state=tk.DISABLED)
+        self.shown_memory = lines
 
-    def set_token_usage(self, input_tokens=None, cached_input_tokens=None, output_tokens=None, turns_until_summary=None):
+    def set_token_usage(self, input_tokens=None, cached_input_tokens=None, output_tokens=None, turns_until_summary=None,
+                        average_cache_rate=None, projected_input_tokens=None, token_budget=None, screen_tokens_saved=None,
+                        tier=None):
         if input_tokens is not None and cached_input_tokens is not None and output_tokens is not None:
             token_info = f"input: {input_tokens} ({cached_input_tokens}), output: {output_tokens}"
-            if turns_until_summary is not None:
+            if tier:
+                token_info = f"{tier} | " + token_info
+            if projected_input_tokens is not None:
+                token_info += f" | projected: {projected_input_tokens}"
+                if token_budget:
+                    token_info += f" / {token_budget}"
+            if input_tokens:
+                token_info += f" | cache: {cached_input_tokens / input_tokens:.0%}"
+                if average_cache_rate is not None:
+                    token_info += f" (avg {average_cache_rate:.0%})"
+            if screen_tokens_saved:
+                token_info += f" | screen: -{screen_tokens_saved}"
+            if turns_until_summary == "running":
+                token_info += " | summary: running"
+            elif turns_until_summary is not None:
                 token_info += f" | summary: T-{turns_until_summary}"
-            self.token_var.set(token_info)
+            self.post("tokens", token_info)
         else:
-            self.token_var.set("")
+            self.post("tokens", "")
+
+    def render_tokens(self, token_info):
+        self.token_var.set(token_info)
+
+    def set_reflex_stats(self, stats):
+        self.post("reflex", f"skipped model calls: {stats.skipped} | saved ~{stats.seconds_saved:.1f}s, "
+                            f"~{stats.tokens_saved} tokens")
+
+    def render_reflex(self, text):
+        self.reflex_var.set(text)
+
+    def set_game_state(self, text):
+        self.post("game_state", text)
+
+    def render_game_state(self, text):
+        self.state_var.set(text)
+
+    def show_trace_panel(self, tracer, interval_ms=1000):
+        # poll the tracer from the Tk thread, so the game thread never waits on the panel
+        self.trace_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0,2))
+        def refresh():
+            stats = tracer.stage_stats()
+            input_rate, output_rate = tracer.token_rate()
+            lines = [f"{name:<40} n={stage['count']:<4} mean {stage['mean'] * 1000:8.1f}ms  p95 {stage['p95'] * 1000:8.1f}ms"
+                     for name, stage in sorted(stats.items(), key=lambda item: -item[1]["mean"])[:8]]
+            lines.append(f"tokens/sec: input {input_rate:.0f}, output {output_rate:.1f}")
+            self.trace_var.set("\n".join(lines))
+            self.root.after(interval_ms, refresh)
+        refresh()
 
     def on_close(self):
+        # let the engine stop the game and close the game and the journal first, checking back until it has
+        if self.engine is not None and self.engine.is_alive():
+            self.engine.stop()
+            self.status_var.set("Stopping...")
+            self.root.after(50, self.on_close)
+            return
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Have an OpenAI model play Quest to the Center of a Tootsie Pop")
+    parser.add_argument("--backend", choices=["window", "winpty", "pty", "sim"], default="window",
+                        help="how to drive the game: an open terminal window, winpty, a native Linux PTY, or the built-in simulator")
+    parser.add_argument("--game-command", nargs="+", default=None,
+                        help="command line to start the game with for the pty backend")
+    parser.add_argument("--engine", choices=["async", "thread"], default="thread",
+                        help="play on a plain thread, or on an asyncio event loop that overlaps the model, game and "
+                             "window and stops cleanly when the window closes (can't stream, record, replay or cache "
+                             "responses)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream responses and send the command to the game as soon as it arrives")
+    parser.add_argument("--base-url", default=None,
+                        help="alternative Responses API endpoint, such as a local mock server")
+    parser.add_argument("--chain", action="store_true",
+                        help="chain turns with previous_response_id and only send what's new each turn")
+    parser.add_argument("--blocking-summary", action="store_true",
+                        help="pause the game while summarizing, instead of summarizing in the background")
+    parser.add_argument("--summary-token-budget", type=int, default=50000,
+                        help="summarize once the estimated input tokens reach this budget")
+    parser.add_argument("--summarize-after", type=int, default=None,
+                        help="also summarize after this many turns, regardless of context size")
+    parser.add_argument("--record", default=None,
+                        help="append screens, commands, requests and responses to this JSONL session log")
+    parser.add_argument("--replay", default=None,
+                        help="replay a recorded session log offline, without the game or the API")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory for the on-disk response cache (responses are reused for identical requests)")
+    parser.add_argument("--max-licks", type=int, default=200,
+                        help="stop a LICK_LOOP after this many licks")
+    parser.add_argument("--combat-timeout", type=float, default=300,
+                        help="stop a LICK_LOOP after this many seconds")
+    parser.add_argument("--no-reflex", action="store_true",
+                        help="send every screen to the model, including press enter screens")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="add every screen to the history as it is, without replacing repeated text with references")
+    parser.add_argument("--route", action="store_true",
+                        help="route each turn between model tiers, instead of using o4-mini with medium reasoning for every turn")
+    parser.add_argument("--tiers", default=None,
+                        help="with --route, the model tiers to route between, fastest first, such as o4-mini:low,o4-mini:medium,o3:high")
+    parser.add_argument("--journal", default=None,
+                        help="checkpoint the player's state to this journal file as the game is played")
+    parser.add_argument("--resume", action="store_true",
+                        help="pick up from the state in --journal, against the game that is still running")
+    parser.add_argument("--trace", default=None,
+                        help="trace the game loop, writing spans to this JSONL file and showing stage latencies in the window")
+    parser.add_argument("--chrome-trace", default=None,
+                        help="when the window closes, also write the trace in Chrome trace format to this file")
+    args = parser.parse_args()
+    if args.resume and not args.journal:
+        parser.error("--resume needs --journal")
+    if args.engine == "async" and (args.stream or args.record or args.replay or args.cache_dir):
+        parser.error("--engine async can't stream, record, replay or cache responses")
+    if args.trace or args.chrome_trace:
+        tracer.enable(args.trace)
     root = tk.Tk()
     api_key = ''
-    with open("api_key.txt", "r") as f:
-        api_key = f.read().strip()
+    if args.replay or (args.base_url and not os.path.exists("api_key.txt")):
+        # replays and local endpoints don't need a real key
+        api_key = "local"
+    else:
+        with open("api_key.txt", "r") as f:
+            api_key = f.read().strip()
     if not api_key:
         raise ValueError("API key not found. Please create a file named 'api_key.txt' with your OpenAI API key.")
     system_prompt = ''
     with open("system_prompt.txt", "r") as f:
         system_prompt = f.read().strip()
-    player = AssistantPlayer(api_key=api_key, model_name="o4-mini", system_prompt=system_prompt)
-    game = TootsieTerminalWrapper()
+    player = AssistantPlayer(api_key=api_key, model_name="o4-mini", system_prompt=system_prompt, base_url=args.base_url,
+                             chain_responses=args.chain, clear_summary=not args.resume,
+                             compress_screens=not args.no_compress,
+                             router=ModelRouter(parse_tiers(args.tiers) if args.tiers else None) if args.route else None)
+    journal = None
+    if args.journal:
+        if not args.resume:
+            # start a new journal, an old one would be replayed on the next --resume
+            for path in (args.journal, args.journal + ".snapshot"):
+                if os.path.exists(path):
+                    os.remove(path)
+        # written on a thread of its own, so checkpoints never hold up a turn
+        journal = Journal(args.journal, background=True)
+        if args.resume:
+            print(f"Resumed from {args.journal}, replayed {player.resume(journal)} journal records")
+        else:
+            player.attach_journal(journal)
+    recorder = SessionRecorder(args.record) if args.record else None
+    if args.replay:
+        # background summaries finish at different times on replay, so use --blocking-summary for a faithful replay
+        cache = ResponseCache(args.cache_dir)
+        cache.load_log(args.replay)
+        player.client = CachingClient(player.client, cache, recorder, replay=True)
+        game = ReplayGame(args.replay)
+    elif args.engine == "async":
+        game = create_async_backend(args.backend, args.game_command)
+    else:
+        if args.cache_dir or recorder:
+            # responses are only cached when asked to, recording alone doesn't answer from a cache
+            cache = ResponseCache(args.cache_dir) if args.cache_dir else None
+            player.client = CachingClient(player.client, cache, recorder)
+        game = create_backend(args.backend, args.game_command)
+    if recorder:
+        game = RecordingBackend(game, recorder)
     gui = TootsieGUI(root)
+    loop = (AsyncGameLoop if args.engine == "async" else GameLoop)(
+        player,
+        game,
+        gui,
+        stream=args.stream,
+        blocking_summary=args.blocking_summary,
+        summary_token_budget=args.summary_token_budget,
+        summarize_after=args.summarize_after,
+        max_licks=args.max_licks,
+        combat_timeout=args.combat_timeout,
+        reflex=not args.no_reflex
+    )
 
-    def send_and_refresh(cmd):
-        gui.set_last_command(cmd)
-        if cmd.strip() == '':
-            new_text = game.send_enter()
-        else:
-            new_text = game.send_command(cmd)
-        gui.update_output(new_text)
-        gui.reset_status()
-        return new_text
-    
-    def lick_loop():
-        # repeatedly send the lick command until the combat ends
-        new_text = ''
-        gui.set_status("Licking until combat ends...")
-        while True:
-            new_text = game.send_command("LICK")
-            gui.update_output(new_text)
-            if "center" in new_text or "sugar" in new_text or "Save your licks" in new_text:
-                break
-        gui.reset_status()
-        return new_text
-
-    def finish_game(game_text):
-        gui.update_output(game_text)
-        # Run a final summary
-        gui.set_status("Generating final summary...")
-        player.perform_summary(game_text)
-
-    # Example: programmatically send commands and update the GUI
-    def play_game():
-        # get the initial game state
-        game_text = game.get_current_screen()
-        gui.update_output(game_text)
-
-        summarize_after = 25
-        summary_counter = 0
-        while True:
-            # check if we have finished the game
-            if "Bye!" in game_text or "game is over" in game_text:
-                finish_game(game_text)
-                break
-            # check if we need to summarize the game state
-            if summary_counter >= summarize_after:
-                gui.set_status("Summarizing game state...")
-                player.perform_summary(game_text)
-                summary_counter = 0
-                continue
-            gui.set_status("Player thinking...")
-            response = player.get_response(game_text)
-            gui.set_llm_message(response.message)
-            gui.set_reasoning(response.reasoning)
-            gui.set_memory(player.memory)
-            gui.set_token_usage(
-                input_tokens=response.input_tokens,
-                cached_input_tokens=response.cached_input_tokens,
-                output_tokens=response.output_tokens,
-                turns_until_summary=summarize_after - summary_counter - 1
-            )
-            # execute the command in the game
-            # if command is None, skip. If command is empty, send Enter.
-            if response.command is not None:
-                if response.command.lower() == 'lick_loop':
-                    game_text = lick_loop()
-                else:
-                    game_text = send_and_refresh(response.command)
-                summary_counter += 1
-            else:
-                gui.set_status("No command generated by LLM, waiting for next turn...")
-                game_text = ''
-
-    threading.Thread(target=play_game, daemon=True).start()
+    if tracer.enabled:
+        gui.show_trace_panel(tracer)
+
+    if args.engine == "async":
+        async def play():
+            try:
+                await loop.play_async()
+            finally:
+                await game.close()
+                if journal:
+                    journal.close()
+        gui.engine = EngineThread(play)
+        gui.engine.start()
+    else:
+        threading.Thread(target=loop.play, daemon=True).start()
     root.mainloop()
+    if args.chrome_trace:
+        tracer.export_chrome(args.chrome_trace)
+    tracer.close()
+    if journal:
+        journal.close()
@@ -0,0 +1,158 @@
+"""
+Turns the text the game prints into typed events: a room entered, items listed or acquired, combat starting,
+progressing and ending, the sugar level, the prompt, and the end of the game. Every pattern is folded into one
+precompiled regex, so a screen is scanned once however many kinds of event there are.
+ScreenParser also keeps the state the events add up to (room, tool belt, pop, sugar), for the window to show.
+"""
+import re
+from typing import Iterator, NamedTuple
+
+from backends import GameBackend
+
+
+class RoomEntered(NamedTuple):
+    room: str
+    position: int
+
+
+class ItemsListed(NamedTuple):
+    source: str  # "search" for what's in the room, "tool_belt" for what the player has
+    items: tuple
+    position: int
+
+
+class ItemAcquired(NamedTuple):
+    item: str
+    position: int
+
+
+class CombatStarted(NamedTuple):
+    pop: str
+    licks_left: int
+    position: int
+
+
+class PopHealth(NamedTuple):
+    licks_left: int
+    position: int
+
+
+class CombatEnded(NamedTuple):
+    reason: str  # "defeated", "sugar" (too much sugar to lick), "no_pop", "left_room" or "fallback"
+    position: int
+
+
+class SugarLevel(NamedTuple):
+    percent: int
+    position: int
+
+
+class PromptReady(NamedTuple):
+    position: int
+
+
+class GameOver(NamedTuple):
+    position: int
+
+
+# (group name, pattern); the group name picks the event, and each pattern stays within one line so nothing backtracks
+# across the screen
+PATTERNS = [
+    ("combat_start", r"(?P<pop_name>the BISHOP|a Tootsie Pop) blocks your way! Combat begins\. It has (?P<start_licks>\d+) licks? left"),
+    ("room", r"You are in the (?P<room_name>[A-Z][A-Z ]*[A-Z])\."),
+    ("search", r"You look around and find: (?P<found_items>[^\n]*)"),
+    ("tool_belt", r"Tool belt: (?P<belt_items>[^\n]*)"),
+    ("acquired", r"You add the (?P<item_name>[A-Z][A-Z ]*[A-Z]) to your tool belt"),
+    ("pop_health", r"It has (?P<licks_left>\d+) licks? left"),
+    ("defeated", r"to the center of [^\n.!]*!"),
+    ("too_sweet", r"Save your licks"),
+    ("no_pop", r"nothing here to lick"),
+    ("sugar", r"[Ss]ugar level is (?P<sugar_percent>\d+)%"),
+    ("prompt", re.escape(GameBackend.COMMAND_INPUT_PROMPT)),
+    ("game_over", r"Bye!|[Tt]he game is over"),
+    # the old check for the end of a combat, for wording the patterns above don't know: last, so they win
+    ("end_words", r"center|sugar"),
+]
+SCREEN_EVENTS = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in PATTERNS))
+COMBAT_END_REASONS = {"defeated": "defeated", "too_sweet": "sugar", "no_pop": "no_pop"}
+
+
+def split_items(text: str) -> tuple:
+    return tuple(item.strip() for item in text.split(",") if item.strip() and item.strip() != "empty")
+
+
+class ScreenParser:
+    """
+    Parses each new piece of game text in order. parse is a generator, so a caller waiting for one event can stop
+    scanning as soon as it has it; the state only reflects the events that were consumed.
+    """
+    def __init__(self):
+        self.room = None
+        self.tool_belt = []
+        self.pop_licks = None  # licks left on the pop being fought, None out of combat
+        self.sugar = None
+        self.over = False
+
+    @property
+    def in_combat(self) -> bool:
+        return self.pop_licks is not None
+
+    def parse(self, text: str) -> Iterator[NamedTuple]:
+        ended = False
+        fallback = None  # where the text first names the center or sugar in a combat, outside the patterns
+        for match in SCREEN_EVENTS.finditer(text):
+            kind = match.lastgroup
+            position = match.start()
+            if kind == "room":
+                room = match.group("room_name")
+                if room == self.room:
+                    # the map and a few other screens repeat the room the player is already in
+                    continue
+                if self.in_combat:
+                    self.pop_licks = None
+                    ended = True
+                    yield CombatEnded("left_room", position)
+                self.room = room
+                yield RoomEntered(room, position)
+            elif kind == "combat_start":
+                self.pop_licks = int(match.group("start_licks"))
+                yield CombatStarted(match.group("pop_name"), self.pop_licks, position)
+            elif kind == "search":
+                yield ItemsListed("search", split_items(match.group("found_items")), position)
+            elif kind == "tool_belt":
+                self.tool_belt = list(split_items(match.group("belt_items")))
+                yield ItemsListed("tool_belt", tuple(self.tool_belt), position)
+            elif kind == "acquired":
+                item = match.group("item_name")
+                if item not in self.tool_belt:
+                    self.tool_belt.append(item)
+                yield ItemAcquired(item, position)
+            elif kind == "pop_health":
+                self.pop_licks = int(match.group("licks_left"))
+                yield PopHealth(self.pop_licks, position)
+            elif kind in COMBAT_END_REASONS:
+                self.pop_licks = None
+                ended = True
+                yield CombatEnded(COMBAT_END_REASONS[kind], position)
+            elif kind == "sugar":
+                self.sugar = int(match.group("sugar_percent"))
+                yield SugarLevel(self.sugar, position)
+            elif kind == "prompt":
+                yield PromptReady(position)
+            elif kind == "game_over" and not self.over:
+                # the game can say goodbye more than one way on the same screen
+                self.over = True
+                yield GameOver(position)
+            elif kind == "end_words" and fallback is None and self.in_combat:
+                fallback = position
+        if fallback is not None and not ended:
+            self.pop_licks = None
+            yield CombatEnded("fallback", fallback)
+
+    def summary(self) -> str:
+        parts = [f"room: {self.room or '?'}", f"tool belt: {', '.join(self.tool_belt) or 'empty'}"]
+        if self.in_combat:
+            parts.append(f"pop: {self.pop_licks} licks left")
+        if self.sugar is not None:
+            parts.append(f"sugar: {self.sugar}%")
+        return " | ".join(parts)
@@ -0,0 +1,143 @@
+import time
+
+from tracing import tracer
+
+
+class SettleStats:
+    """
+    Keeps per-command settle latencies so long runs can report where the dead time goes.
+    """
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self.samples = []  # list of (label, seconds, reason)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.reasons = {}
+
+    def record(self, label: str | None, seconds: float, reason: str):
+        self.count += 1
+        self.total_seconds += seconds
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        self.samples.append((label, seconds, reason))
+        if len(self.samples) > self.max_samples:
+            # only keep the most recent samples, the totals still cover everything
+            del self.samples[:len(self.samples) - self.max_samples]
+
+    @property
+    def mean(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(seconds for _, seconds, _ in self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> str:
+        return (f"settles: {self.count}, mean: {self.mean * 1000:.0f}ms, "
+                f"p50: {self.percentile(50) * 1000:.0f}ms, p95: {self.percentile(95) * 1000:.0f}ms, "
+                f"reasons: {self.reasons}")
+
+
+class ScreenSettler:
+    """
+    Waits for the terminal output to settle after a command.
+    Returns as soon as the screen ends with a known marker (such as the command prompt),
+    otherwise falls back to waiting for a quiet period with no changes, polling with backoff.
+    If the screen hasn't changed at all since the command was sent, it waits up to no_change_period instead,
+    since the game is most likely still working. When nothing was sent (no original_text), a screen that already
+    ends with a marker is returned right away.
+    """
+    DEFAULT_MARKERS = ("What do you do?:", "Bye!")
+
+    def __init__(self, grab, markers=DEFAULT_MARKERS, min_interval: float = 0.02, max_interval: float = 0.5,
+                 backoff: float = 1.5, quiet_period: float = 1.0, no_change_period: float = 3.0, timeout: float = 120,
+                 stats: SettleStats | None = None, clock=time.monotonic, sleep=time.sleep):
+        self.grab = grab
+        self.markers = tuple(markers)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.quiet_period = quiet_period
+        self.no_change_period = no_change_period
+        self.timeout = timeout
+        self.stats = stats if stats is not None else SettleStats()
+        self.clock = clock
+        self.sleep = sleep
+
+    def ends_with_marker(self, text: str) -> bool:
+        # text is already stripped of trailing whitespace, so only the tail needs checking
+        return any(text.endswith(marker) for marker in self.markers)
+
+    def settle(self, original_text: str | None = None, label: str | None = None) -> str:
+        """
+        Poll the screen until it settles and return the final (right-stripped) text.
+        original_text is the screen before the command was sent, a marker on that screen doesn't count.
+        """
+        start_time = self.clock()
+        prev_text = (self.grab() or '').rstrip()
+        reading = original_text is None
+        original_text = prev_text if reading else original_text.rstrip()
+        last_change = start_time
+        interval = self.min_interval
+        reason = "timeout"
+        if (reading or prev_text != original_text) and self.ends_with_marker(prev_text):
+            self.stats.record(label, 0.0, "marker")
+            return prev_text
+        while self.clock() - start_time < self.timeout:
+            self.sleep(interval)
+            with tracer.span("settle.poll", interval=interval):
+                current_text = self.grab()
+            if not current_text:
+                # no text at all, so the previous screen is the best we have
+                reason = "empty"
+                break
+            current_text = current_text.rstrip()
+            now = self.clock()
+            if current_text != prev_text:
+                prev_text = current_text
+                last_change = now
+                interval = self.min_interval
+                if current_text != original_text and self.ends_with_marker(current_text):
+                    reason = "marker"
+                    break
+            else:
+                quiet_needed = self.quiet_period if current_text != original_text else self.no_change_period
+                if now - last_change >= quiet_needed:
+                    reason = "quiet"
+                    break
+                interval = min(interval * self.backoff, self.max_interval)
+        self.stats.record(label, self.clock() - start_time, reason)
+        return prev_text
+
+
+class ScriptedScreenSource:
+    """
+    A fake screen driven by a script of (seconds, text) frames on a virtual clock.
+    Pass grab, clock and sleep to a ScreenSettler to exercise it without a real terminal or real waiting.
+    """
+    def __init__(self, frames: list[tuple[float, str]]):
+        self.frames = sorted(frames, key=lambda frame: frame[0])
+        self.now = 0.0
+        self.grabs = 0
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+    def grab(self) -> str:
+        self.grabs += 1
+        text = ''
+        for at, frame in self.frames:
+            if at > self.now:
+                break
+            text = frame
+        return text
+
+    def append(self, delay: float, text: str):
+        # schedule a new frame relative to the current virtual time
+        self.frames.append((self.now + delay, text))
+        self.frames.sort(key=lambda frame: frame[0])
@@ -0,0 +1,212 @@
+"""
+A scripted stand-in for Quest to the Center of a Tootsie Pop. It prints Tootsie-style screens, prompts and combat,
+and ends with "Bye!", so the harness can be exercised without the real game.
+Run it directly (python simulator.py) to play in a console, or use SimulatedGame to drive it in-process.
+"""
+import random
+import sys
+import time
+
+from backends import GameBackend
+from settle import SettleStats
+
+PROMPT = "What do you do?:"
+PRESS_ENTER = "Press enter to continue..."
+
+ROOMS = {
+    "KITCHEN": {
+        "description": "You are in the KITCHEN. The floor is sticky and a utility KNIFE rests on the counter.",
+        "items": ["KNIFE"],
+        "interactables": ["FRIDGE", "SINK", "LIGHT SWITCH"],
+        "pop": None,
+    },
+    "HALL": {
+        "description": "You are in the HALL. Portraits of lollipops stare down at you from the walls.",
+        "items": ["GUARD"],
+        "interactables": ["CLOSET", "LIGHT SWITCH"],
+        "pop": 10,
+    },
+    "LIBRARY": {
+        "description": "You are in the LIBRARY. Dusty books line the walls, and a LADDER leans against a shelf.",
+        "items": ["LADDER"],
+        "interactables": ["BOOKSHELF", "DESK", "LIGHT SWITCH"],
+        "pop": 10,
+    },
+    "BASEMENT": {
+        "description": "You are in the BASEMENT. Something large and round waits in the dark.",
+        "items": [],
+        "interactables": ["FURNACE"],
+        "pop": 20,
+    },
+}
+ITEM_DAMAGE = {"KNIFE": 1, "GUARD": 0, "LADDER": 1}
+
+INTRO = ("Welcome to Quest to the Center of a Tootsie Pop!\n"
+         "Your supplies have been scattered across the house, and the pops are everywhere.\n" + PRESS_ENTER)
+TUTORIAL = ("TUTORIAL: Type commands like MOVE KITCHEN, SEARCH, GET KNIFE, USE FRIDGE or LICK.\n"
+            "Tip: items you GET make your licks stronger.\n" + PRESS_ENTER)
+
+
+class TootsieSimulator:
+    """
+    The game state machine. step takes one line of input and returns the text the game prints in response.
+    """
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.rooms = {name: dict(room, items=list(room["items"])) for name, room in ROOMS.items()}
+        self.room = "KITCHEN"
+        self.inventory = []
+        self.sugar = 0
+        self.pop_health = None
+        self.pending = [TUTORIAL, self.room_screen]  # screens (or functions making them) waiting for an enter press
+        self.over = False
+
+    def opening(self) -> str:
+        return INTRO
+
+    def room_screen(self) -> str:
+        room = self.rooms[self.room]
+        text = room["description"]
+        if room["pop"]:
+            if self.pop_health is None:
+                self.pop_health = room["pop"]
+            name = "the BISHOP" if self.room == "BASEMENT" else "a Tootsie Pop"
+            text += f"\nOh no, {name} blocks your way! Combat begins. It has {self.pop_health} licks left."
+        return text + "\n" + PROMPT
+
+    def damage(self) -> int:
+        return 1 + sum(ITEM_DAMAGE.get(item, 0) for item in self.inventory)
+
+    def step(self, line: str) -> str:
+        if self.over:
+            return ''
+        command = line.strip().upper()
+        if self.pending:
+            # anything typed on a press enter screen is ignored
+            screen = self.pending.pop(0)
+            return screen() if callable(screen) else screen
+        verb, _, target = command.partition(' ')
+        handler = getattr(self, "do_" + verb.lower(), None)
+        if handler is None:
+            return f"I don't understand \"{line.strip()}\".\n{PROMPT}"
+        return handler(target)
+
+    def do_quit(self, target: str) -> str:
+        self.over = True
+        return "Thanks for playing. Bye!"
+
+    def do_move(self, target: str) -> str:
+        if target not in self.rooms:
+            return f"There is no room called {target}.\n{PROMPT}"
+        if self.pop_health:
+            self.rooms[self.room]["pop"] = self.pop_health
+        self.room = target
+        self.pop_health = None
+        return self.room_screen()
+
+    def do_map(self, target: str) -> str:
+        return "MAP: " + " - ".join(self.rooms) + f"\nYou are in the {self.room}.\n{PROMPT}"
+
+    def do_search(self, target: str) -> str:
+        room = self.rooms[self.room]
+        return "You look around and find: " + ", ".join(room["interactables"]) + f"\n{PROMPT}"
+
+    def do_get(self, target: str) -> str:
+        room = self.rooms[self.room]
+        if target in room["items"]:
+            room["items"].remove(target)
+            self.inventory.append(target)
+            return f"You add the {target} to your tool belt.\n{PROMPT}"
+        return f"There is no {target} here.\n{PROMPT}"
+
+    def do_use(self, target: str) -> str:
+        if target == "TOOL BELT":
+            return "Tool belt: " + (", ".join(self.inventory) or "empty") + f"\n{PROMPT}"
+        if target == "LIGHT SWITCH":
+            self.pending = [self.room_screen]
+            return "*Click* You flick the lights off and on again. Nothing happens.\n" + PRESS_ENTER
+        if target in self.rooms[self.room]["interactables"] or target in self.inventory:
+            return f"You use the {target}. " + self.random.choice(
+                ["Nothing happens.", "It's sticky.", "You hear something click in the distance."]) + f"\n{PROMPT}"
+        return f"You can't use {target} here.\n{PROMPT}"
+
+    def do_sugar(self, target: str) -> str:
+        return f"Your sugar level is {self.sugar}%.\n{PROMPT}"
+
+    def do_help(self, target: str) -> str:
+        self.pending = [lambda: PROMPT]
+        return "Commands: MOVE, LICK, SUGAR, MAP, SEARCH, CHECK, USE, GET, HINT, HELP, QUIT\n" + PRESS_ENTER
+
+    def do_hint(self, target: str) -> str:
+        return f"You remember the plan: the BISHOP waits in the BASEMENT.\n{PROMPT}"
+
+    def do_check(self, target: str) -> str:
+        if target in self.inventory:
+            return f"The {target} looks useful in combat.\n{PROMPT}"
+        return f"You don't have a {target}.\n{PROMPT}"
+
+    def do_lick(self, target: str) -> str:
+        if not self.pop_health:
+            return f"There is nothing here to lick.\n{PROMPT}"
+        if self.sugar >= 100:
+            return f"Your sugar level is too high! Save your licks for later.\n{PROMPT}"
+        self.sugar += 1
+        self.pop_health = max(0, self.pop_health - self.damage())
+        if self.pop_health:
+            return f"You lick the pop. It has {self.pop_health} licks left.\n{PROMPT}"
+        self.rooms[self.room]["pop"] = None
+        self.pop_health = None
+        if self.room == "BASEMENT":
+            self.over = True
+            return (f"You lick through to the center of the BISHOP! Your sugar level is {self.sugar}%.\n"
+                    "You have reached the center of the Tootsie Pop. The game is over. Bye!")
+        return f"You made it to the center of the pop! Your sugar level is {self.sugar}%.\n{PROMPT}"
+
+
+# a command list that finishes the simulated game
+WALKTHROUGH = ["", "", "SEARCH", "GET KNIFE", "MOVE HALL", "LICK_LOOP", "GET GUARD", "MOVE LIBRARY", "LICK_LOOP",
+               "GET LADDER", "USE BOOKSHELF", "MAP", "MOVE BASEMENT", "LICK_LOOP"]
+
+
+class SimulatedGame(GameBackend):
+    """
+    Runs TootsieSimulator in-process as a game backend, with an optional delay per command to imitate the real game.
+    The delay is recorded in settle_stats as the time spent waiting for the game, like the other backends do.
+    """
+    def __init__(self, seed: int = 0, latency: float = 0.0):
+        self.sim = TootsieSimulator(seed)
+        self.latency = latency
+        self.started = False
+        self.settle_stats = SettleStats()
+
+    def get_current_screen(self) -> str:
+        if not self.started:
+            self.started = True
+            return self.sim.opening()
+        return ''
+
+    def send_command(self, command: str) -> str:
+        start = time.monotonic()
+        if self.latency:
+            time.sleep(self.latency)
+        # the simulator answers with the prompt right away, the only wait is the imitated latency
+        self.settle_stats.record(command or "<enter>", time.monotonic() - start, "marker")
+        return self.sim.step(command)
+
+    def send_enter(self) -> str:
+        return self.send_command('')
+
+
+def main():
+    # console mode, for use with the pty backend
+    sim = TootsieSimulator(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    print(sim.opening(), end=' ', flush=True)
+    for line in sys.stdin:
+        print(sim.step(line), end=' ', flush=True)
+        if sim.over:
+            print()
+            break
+
+
+if __name__ == "__main__":
+    main()
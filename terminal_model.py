@@ -0,0 +1,132 @@
+import codecs
+import re
+from collections import deque
+
+# a complete escape sequence: CSI (ESC [ ... final), OSC (ESC ] ... BEL or ESC \\) or a two character escape
+ANSI_SEQUENCE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[^\[\]])')
+
+
+class AnsiStripper:
+    """
+    Incremental ANSI/escape sequence remover. A sequence split across chunks is held back
+    until the rest of it arrives, so each call only looks at the new text.
+    """
+    # give up on holding back an unterminated sequence after this many characters
+    MAX_PENDING = 4096
+
+    def __init__(self):
+        self.pending = ''
+
+    def feed(self, text: str) -> str:
+        if self.pending:
+            text = self.pending + text
+            self.pending = ''
+        # an unterminated OSC can contain escapes of its own, so it is checked first
+        incomplete = text.rfind('\x1b]')
+        if incomplete == -1 or ANSI_SEQUENCE.match(text, incomplete):
+            incomplete = text.rfind('\x1b')
+            if incomplete != -1 and ANSI_SEQUENCE.match(text, incomplete):
+                incomplete = -1
+        if incomplete != -1 and len(text) - incomplete < self.MAX_PENDING:
+            # the last sequence is incomplete, keep it for the next chunk
+            self.pending = text[incomplete:]
+            text = text[:incomplete]
+        return ANSI_SEQUENCE.sub('', text).replace('\r', '')
+
+
+class Scrollback:
+    """
+    Bounded ring buffer of plain text, addressed by absolute character offsets since the start of the session.
+    Old text falls off the front once max_chars is exceeded, so memory stays flat on long runs.
+    """
+    def __init__(self, max_chars: int = 1_000_000):
+        self.max_chars = max_chars
+        self.chunks = deque()
+        self.size = 0  # characters currently retained
+        self.end = 0  # absolute offset just past the last character written
+
+    @property
+    def start(self) -> int:
+        return self.end - self.size
+
+    def append(self, text: str):
+        if not text:
+            return
+        self.end += len(text)
+        if len(text) > self.max_chars:
+            text = text[-self.max_chars:]
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size - len(self.chunks[0]) >= self.max_chars:
+            self.size -= len(self.chunks.popleft())
+
+    def text_since(self, offset: int) -> str:
+        """
+        Text from the absolute offset to the end. Only the chunks after the offset are visited.
+        """
+        offset = max(offset, self.start)
+        wanted = self.end - offset
+        if wanted <= 0:
+            return ''
+        parts = []
+        collected = 0
+        for chunk in reversed(self.chunks):
+            parts.append(chunk)
+            collected += len(chunk)
+            if collected >= wanted:
+                break
+        text = ''.join(reversed(parts))
+        return text[len(text) - wanted:]
+
+    def tail(self, count: int) -> str:
+        return self.text_since(self.end - count)
+
+
+class TerminalModel:
+    """
+    Streaming model of the game's terminal output: raw bytes go in, ANSI free text comes out.
+    Tracks the last consumed position, so getting the output of a command only looks at the new text.
+    """
+    def __init__(self, max_chars: int = 1_000_000):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.stripper = AnsiStripper()
+        self.scrollback = Scrollback(max_chars)
+        self.consumed = 0
+
+    def feed(self, data: bytes | str) -> int:
+        """
+        Add raw output and return how many plain characters it produced.
+        """
+        if isinstance(data, bytes):
+            data = self.decoder.decode(data)
+        text = self.stripper.feed(data)
+        self.scrollback.append(text)
+        return len(text)
+
+    @property
+    def offset(self) -> int:
+        return self.scrollback.end
+
+    def text_since(self, offset: int) -> str:
+        return self.scrollback.text_since(offset)
+
+    def ends_with(self, marker: str, since: int = 0) -> bool:
+        # only output after since counts, so an old prompt doesn't match
+        if self.offset <= since:
+            return False
+        tail = self.scrollback.tail(len(marker) + 64)
+        if since > self.offset - len(tail):
+            tail = tail[since - (self.offset - len(tail)):]
+        return tail.rstrip().endswith(marker)
+
+    def consume(self) -> str:
+        """
+        Return the output since the last call, with empty lines removed, and mark it as consumed.
+        """
+        text = self.scrollback.text_since(self.consumed)
+        self.consumed = self.offset
+        return remove_empty_lines(text)
+
+
+def remove_empty_lines(text: str) -> str:
+    return '\n'.join(line for line in text.splitlines() if line.strip() != '')
@@ -1,10 +1,14 @@
 from pywinauto import Application
-import time
 
-class TootsieTerminalWrapper:
-    COMMAND_INPUT_PROMPT = "What do you do?:"
+from backends import GameBackend
+from settle import ScreenSettler, SettleStats
 
-    def __init__(self, window_title_re=r".*tootsie.exe.*", exe_path="tootsie.exe"):        
+class TootsieTerminalWrapper(GameBackend):
+    # how much of the end of the previous screen is used to find where the new text starts
+    ANCHOR_CHARS = 256
+
+    def __init__(self, window_title_re=r".*tootsie.exe.*", exe_path="tootsie.exe",
+                 min_interval: float = 0.02, max_interval: float = 0.5, quiet_period: float = 1.0, no_change_period: float = 3.0, timeout: float = 120):
         # Try UIA backend for Windows Terminal, fallback to classic
         try:
             self.app = Application(backend="uia").connect(title_re=window_title_re)
@@ -12,6 +16,17 @@ class TootsieTerminalWrapper:
         except Exception:
             self.app = Application().connect(title_re=window_title_re)
             self.window = self.app.window(title_re=window_title_re)
+        self.settle_stats = SettleStats()
+        self.settler = ScreenSettler(
+            self.grab_text,
+            markers=(self.COMMAND_INPUT_PROMPT, "Bye!"),
+            min_interval=min_interval,
+            max_interval=max_interval,
+            quiet_period=quiet_period,
+            no_change_period=no_change_period,
+            timeout=timeout,
+            stats=self.settle_stats
+        )
 
     def grab_text(self) -> str:
         # Try to grab text using UIA backend (for Windows Terminal)
@@ -36,7 +51,7 @@ class TootsieTerminalWrapper:
         # Send a command (string) followed by Enter
         current_text = self.grab_text()
         self.window.type_keys(command + "{ENTER}", with_spaces=True)
-        new_screen = self.get_current_screen(current_text)
+        new_screen = self.get_current_screen(current_text, label=command)
         # look backward in the new screen for the command we sent and return the new text after it
         if new_screen:
             lights_index = new_screen.rfind("*Click* You flick the lights")
@@ -59,7 +74,7 @@ class TootsieTerminalWrapper:
         # Send only the Enter key
         current_text = self.grab_text()
         self.window.type_keys("{ENTER}")
-        new_screen = self.get_current_screen(current_text)
+        new_screen = self.get_current_screen(current_text, label="<enter>")
         # check for the text of "What do you do?" prompt and don't go any further back from that
         prompt_index = new_screen.rfind(self.COMMAND_INPUT_PROMPT)
         if prompt_index != -1:
@@ -67,34 +82,21 @@ class TootsieTerminalWrapper:
             new_screen = new_screen[prompt_index + len(self.COMMAND_INPUT_PROMPT):].lstrip()
         return new_screen
 
-    def get_current_screen(self, original_text: str | None= None) -> str:
-        # Wait for output to stop changing for a certain period
+    def get_current_screen(self, original_text: str | None = None, label: str | None = None) -> str:
+        # Wait for the prompt to show up, or for output to stop changing for a quiet period
         # This is useful to ensure we get the final output after a command
-        timeout = 120
-        start_time = time.time()
-        prev_text = self.grab_text()
-        if not original_text:
+        reading = not original_text
+        if reading:
             # If no original text is provided, use the current text as the base
-            original_text = prev_text.rstrip()
-        current_text = prev_text
-        while time.time() - start_time < timeout:
-            time.sleep(1)
-            current_text = self.grab_text()
-            # strip all newlines after the last non-empty line
-            if current_text:
-                current_text = current_text.rstrip()
-            else:
-                # that means there is no new text at all, so we can return the previous one
-                return prev_text
-            if current_text != prev_text:
-                prev_text = current_text
-            else:
-                # If the text hasn't changed for a while, consider it stable
-                output = self.get_new_text(original_text, current_text)
-                if output:
-                    return output
-                # if we would return nothing, then return the current text
-                return current_text
+            original_text = self.grab_text().rstrip()
+        # nothing was sent when just reading the screen, so a prompt already on it means the game is waiting
+        current_text = self.settler.settle(None if reading else original_text, label=label)
+        if not current_text:
+            return current_text
+        output = self.get_new_text(original_text, current_text)
+        if output:
+            return output
+        # if we would return nothing, then return the current text
         return current_text
     
     def close(self):
@@ -107,17 +109,21 @@ class TootsieTerminalWrapper:
     def get_new_text(self, previous_text: str, current_text: str) -> str:
         """
         Returns only the new text that has appeared since previous_text.
-        If previous_text is found as a suffix of the current text, returns the remainder.
-        Otherwise, returns the full current text.
+        If previous_text is a prefix of the current text, returns the remainder.
+        Otherwise looks for the end of previous_text (the anchor) where it can still be, which also works once the
+        console has scrolled.
+        If that isn't found either, returns the full current text.
         """
         if not previous_text:
             return current_text
         if current_text.startswith(previous_text):
             return current_text[len(previous_text):].lstrip("\n")
-        # If previous_text is not a prefix, try to find it anywhere in current_text
-        idx = current_text.find(previous_text)
+        # only search for the tail of the previous text, not all of it. Scrolling only moves the previous text up,
+        # so its end is no further in than it was: the last copy of the tail up to there is the previous screen's end,
+        # not an older copy of repeated text or a new one in the output
+        anchor = previous_text[-self.ANCHOR_CHARS:]
+        idx = current_text.rfind(anchor, 0, len(previous_text))
         if idx != -1:
-            return current_text[idx + len(previous_text):].lstrip("\n")
+            return current_text[idx + len(anchor):].lstrip("\n")
         # If not found, return the full text
         return current_text
-
@@ -0,0 +1,91 @@
+"""
+Local token estimates for the model context, so context size can be tracked every turn without an API call.
+Uses tiktoken when it is installed, otherwise a characters-per-token approximation.
+"""
+import json
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional, and may not have its encoding files available offline
+    _encoding = None
+
+CHARS_PER_TOKEN = 4
+# rough per-item overhead for roles, types and separators
+ITEM_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def item_text(item) -> str:
+    """
+    The text of a history item that counts towards the input: message content, tool call arguments and outputs,
+    and reasoning summaries.
+    """
+    if isinstance(item, dict):
+        content = item.get("content")
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return ''.join(part.get("text", '') for part in content if isinstance(part, dict))
+        if item.get("type") == "function_call_output":
+            return str(item.get("output", ''))
+        return json.dumps(item)
+    item_type = getattr(item, "type", None)
+    if item_type == "message":
+        return ''.join(getattr(part, "text", None) or getattr(part, "refusal", '') for part in item.content)
+    if item_type == "reasoning":
+        return ''.join(summary.text for summary in item.summary)
+    if item_type == "function_call":
+        return item.name + item.arguments
+    return str(item)
+
+
+def estimate_item_tokens(item) -> int:
+    return estimate_text_tokens(item_text(item)) + ITEM_OVERHEAD_TOKENS
+
+
+class ContextTokenEstimator:
+    """
+    Keeps a cached token count for every history item, so each turn only the new items are tokenized.
+    Counts are scaled by a calibration factor learned from the real input token usage.
+    """
+    def __init__(self, fixed_tokens: int = 0):
+        self.fixed_tokens = fixed_tokens  # things sent every turn that aren't in the history, such as tool schemas
+        self.cache = {}  # id(item) -> (item, tokens), the item is kept so its id can't be reused
+        self.calibration = 1.0
+        self.raw_estimate = 0
+
+    def item_tokens(self, item) -> int:
+        cached = self.cache.get(id(item))
+        if cached is not None and cached[0] is item:
+            return cached[1]
+        tokens = estimate_item_tokens(item)
+        self.cache[id(item)] = (item, tokens)
+        return tokens
+
+    def estimate(self, items: list, extra_text: str = '') -> int:
+        """
+        Projected input tokens for the given items plus any extra text (such as the memory snapshot).
+        """
+        raw = self.fixed_tokens + sum(self.item_tokens(item) for item in items)
+        if extra_text:
+            raw += estimate_text_tokens(extra_text) + ITEM_OVERHEAD_TOKENS
+        if len(self.cache) > 2 * len(items) + 64:
+            # drop items that left the history, such as after a summary
+            live = {id(item) for item in items}
+            self.cache = {key: value for key, value in self.cache.items() if key in live}
+        self.raw_estimate = raw
+        return int(raw * self.calibration)
+
+    def calibrate(self, actual_input_tokens: int, weight: float = 0.2):
+        # move the calibration towards the ratio seen on the last request
+        if actual_input_tokens and self.raw_estimate:
+            ratio = actual_input_tokens / self.raw_estimate
+            self.calibration += weight * (ratio - self.calibration)
@@ -0,0 +1,189 @@
+"""
+Lightweight tracing for the game loop. Spans are timed with time.perf_counter and can be exported as JSONL
+or in Chrome trace format (load it in chrome://tracing or Perfetto). When tracing is disabled, span returns
+a shared do-nothing context manager, so instrumented code pays only for a function call.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, tracer: 'Tracer', name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._finish(self, time.perf_counter())
+        return False
+
+    def set(self, **args):
+        # attach extra details once they are known, such as the command a response produced
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    Collects spans and keeps rolling per-stage latency and token throughput for the live GUI panel.
+    """
+    def __init__(self, enabled: bool = False, window: int = 50, max_events: int = 1_000_000):
+        self.enabled = enabled
+        self.window = window
+        self.max_events = max_events
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=max_events)
+        self.recent = {}  # span name -> deque of recent durations
+        self.tokens = deque()  # (time, input tokens, output tokens) for the last minute
+        self.lock = threading.Lock()
+        self.jsonl = None
+
+    def enable(self, jsonl_path: str | None = None):
+        """
+        Turn tracing on, optionally streaming every finished span to a JSONL file as it happens.
+        """
+        self.enabled = True
+        if jsonl_path:
+            self.jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def _finish(self, span: Span, end: float):
+        duration = end - span.start
+        event = {
+            "name": span.name,
+            "start": span.start - self.origin,
+            "duration": duration,
+            "thread": threading.get_ident(),
+            "args": span.args,
+        }
+        with self.lock:
+            self.events.append(event)
+            recent = self.recent.get(span.name)
+            if recent is None:
+                recent = self.recent[span.name] = deque(maxlen=self.window)
+            recent.append(duration)
+            if self.jsonl:
+                self.jsonl.write(json.dumps(event, default=str) + "\n")
+
+    def add_tokens(self, input_tokens: int, output_tokens: int):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.tokens.append((now, input_tokens, output_tokens))
+            while self.tokens and now - self.tokens[0][0] > 60:
+                self.tokens.popleft()
+
+    def stage_stats(self) -> dict:
+        """
+        Rolling mean and p95 of the recent spans of each name, in seconds.
+        """
+        with self.lock:
+            recent = {name: list(durations) for name, durations in self.recent.items()}
+        return {name: {"count": len(durations), "mean": sum(durations) / len(durations), "p95": percentile(durations, 95)}
+                for name, durations in recent.items() if durations}
+
+    def token_rate(self) -> tuple[float, float]:
+        """
+        Input and output tokens per second over the last minute.
+        """
+        with self.lock:
+            tokens = list(self.tokens)
+        if not tokens:
+            return 0.0, 0.0
+        elapsed = max(1.0, time.monotonic() - tokens[0][0])
+        return sum(t[1] for t in tokens) / elapsed, sum(t[2] for t in tokens) / elapsed
+
+    def export_jsonl(self, path: str):
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def export_chrome(self, path: str):
+        with self.lock:
+            events = list(self.events)
+        trace = [{
+            "name": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["duration"] * 1e6,
+            "pid": os.getpid(),
+            "tid": event["thread"],
+            "args": {key: str(value) for key, value in event["args"].items()},
+        } for event in events]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+    def close(self):
+        with self.lock:
+            if self.jsonl:
+                self.jsonl.close()
+                self.jsonl = None
+
+
+# the tracer shared by everything in the process, disabled until enabled from run.py
+tracer = Tracer()
+
+
+def traced(name: str | None = None):
+    """
+    Decorator that runs the function inside a span of the shared tracer, named after the function by default.
+    A coroutine function's span covers the whole await, not just making the coroutine.
+    """
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate